@@ -1,2 +1,8 @@
 from .utils import *
-from .agent import make_graph, make_graph_async_postgresql, make_graph_memory
+from .agent import (
+    make_graph,
+    make_puzzle_graph,
+    make_concurrent_graph,
+    make_graph_async_postgresql,
+    make_graph_memory
+)
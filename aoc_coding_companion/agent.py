@@ -1,13 +1,19 @@
 import asyncio
+from typing import TYPE_CHECKING, Callable, Dict, Optional
 
-from psycopg_pool import AsyncConnectionPool
 from langgraph.graph import END, START, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.checkpoint.base import BaseCheckpointSaver
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
 
-from aoc_coding_companion.utils.state import AOCState
+if TYPE_CHECKING:
+    from psycopg_pool import AsyncConnectionPool
+
+from aoc_coding_companion.utils.state import AOCState, AOCConcurrentState
+from aoc_coding_companion.utils.blobs import BlobExternalizingSerializer
+from aoc_coding_companion.utils.retention import RetentionPolicy, start_checkpoint_retention
+from aoc_coding_companion.utils.constants import CHECKPOINT_RETENTION_INTERVAL
+from aoc_coding_companion.utils.tracing import traced_node
 from aoc_coding_companion.utils.config_schema import ConfigSchema
 from aoc_coding_companion.utils.nodes import (
     start_alert,
@@ -20,16 +26,20 @@ from aoc_coding_companion.utils.nodes import (
     write_code,
     exec_code,
     route_exec_code,
+    route_code_result,
     answer_submit,
     route_answer_correctness,
     check_rules_retry,
     route_check_rules_retry,
     check_pull_backlog,
     route_check_pull_backlog,
+    route_dispatch_puzzles,
+    make_solve_puzzle,
     FIND_ANSWER_ROUTE_NAME,
     ALL_DONE_ROUTE_NAME,
     RETRY_ROUTE_NAME,
     EXEC_CODE_ROUTE_NAME,
+    WRITE_CODE_ROUTE_NAME,
     ANSWER_CORRECTNESS_ROUTE_NAME,
     GET_PUZZLE_ROUTE_NAME,
     MAX_ATTEMPT_NAME,
@@ -39,38 +49,19 @@ from aoc_coding_companion.utils.nodes import (
 )
 
 
-def make_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
-    """Создание компилированного графа"""
-
-    base_builder = StateGraph(AOCState, ConfigSchema)
+def _add_solving_nodes(builder: StateGraph, finish_node: str) -> None:
+    """Добавление цикла решения одной задачи: от взятия задачи до верного ответа или исчерпания попыток"""
 
-    base_builder.add_node(start_alert.__name__, start_alert)
-    base_builder.add_node(end_alert.__name__, end_alert)
-    base_builder.add_node(check_leader_board.__name__, check_leader_board)
-    base_builder.add_node(search_unsolved_puzzles.__name__, search_unsolved_puzzles)
-    base_builder.add_node(get_puzzle.__name__, get_puzzle)
-    base_builder.add_node(download_input.__name__, download_input)
-    base_builder.add_node(write_code.__name__, write_code)
-    base_builder.add_node(exec_code.__name__, exec_code)
-    base_builder.add_node(answer_submit.__name__, answer_submit)
-    base_builder.add_node(check_rules_retry.__name__, check_rules_retry)
-    base_builder.add_node(check_pull_backlog.__name__, check_pull_backlog)
+    builder.add_node(get_puzzle.__name__, traced_node(get_puzzle))
+    builder.add_node(download_input.__name__, traced_node(download_input))
+    builder.add_node(write_code.__name__, traced_node(write_code))
+    builder.add_node(exec_code.__name__, traced_node(exec_code))
+    builder.add_node(answer_submit.__name__, traced_node(answer_submit))
+    builder.add_node(check_rules_retry.__name__, traced_node(check_rules_retry))
 
-    base_builder.add_edge(START, start_alert.__name__)
-    base_builder.add_edge(start_alert.__name__, search_unsolved_puzzles.__name__)
-    base_builder.add_conditional_edges(
-        search_unsolved_puzzles.__name__,
-        route_have_puzzles,
-        {
-            ALL_DONE_ROUTE_NAME: check_leader_board.__name__,
-            GET_PUZZLE_ROUTE_NAME: get_puzzle.__name__
-        }
-    )
-    base_builder.add_edge(check_leader_board.__name__, end_alert.__name__)
-    base_builder.add_edge(end_alert.__name__, END)
-    base_builder.add_edge(get_puzzle.__name__, download_input.__name__)
-    base_builder.add_edge(download_input.__name__, write_code.__name__)
-    base_builder.add_conditional_edges(
+    builder.add_edge(get_puzzle.__name__, download_input.__name__)
+    builder.add_edge(download_input.__name__, write_code.__name__)
+    builder.add_conditional_edges(
         write_code.__name__,
         route_exec_code,
         {
@@ -78,23 +69,56 @@ def make_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
             FIND_ANSWER_ROUTE_NAME: answer_submit.__name__
         }
     )
-    base_builder.add_edge(exec_code.__name__, write_code.__name__)
-    base_builder.add_conditional_edges(
+    builder.add_conditional_edges(
+        exec_code.__name__,
+        route_code_result,
+        {
+            WRITE_CODE_ROUTE_NAME: write_code.__name__,
+            FIND_ANSWER_ROUTE_NAME: answer_submit.__name__
+        }
+    )
+    builder.add_conditional_edges(
         answer_submit.__name__,
         route_answer_correctness,
         {
             RETRY_ROUTE_NAME: check_rules_retry.__name__,
-            ANSWER_CORRECTNESS_ROUTE_NAME: check_pull_backlog.__name__
+            ANSWER_CORRECTNESS_ROUTE_NAME: finish_node
         }
     )
-    base_builder.add_conditional_edges(
+    builder.add_conditional_edges(
         check_rules_retry.__name__,
         route_check_rules_retry,
         {
-            MAX_ATTEMPT_NAME: check_pull_backlog.__name__,
+            MAX_ATTEMPT_NAME: finish_node,
             RULES_PASSED_NAME: write_code.__name__
         }
     )
+
+
+def make_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
+    """Создание компилированного графа"""
+
+    base_builder = StateGraph(AOCState, ConfigSchema)
+
+    base_builder.add_node(start_alert.__name__, traced_node(start_alert))
+    base_builder.add_node(end_alert.__name__, traced_node(end_alert))
+    base_builder.add_node(check_leader_board.__name__, traced_node(check_leader_board))
+    base_builder.add_node(search_unsolved_puzzles.__name__, traced_node(search_unsolved_puzzles))
+    base_builder.add_node(check_pull_backlog.__name__, traced_node(check_pull_backlog))
+    _add_solving_nodes(base_builder, check_pull_backlog.__name__)
+
+    base_builder.add_edge(START, start_alert.__name__)
+    base_builder.add_edge(start_alert.__name__, search_unsolved_puzzles.__name__)
+    base_builder.add_conditional_edges(
+        search_unsolved_puzzles.__name__,
+        route_have_puzzles,
+        {
+            ALL_DONE_ROUTE_NAME: check_leader_board.__name__,
+            GET_PUZZLE_ROUTE_NAME: get_puzzle.__name__
+        }
+    )
+    base_builder.add_edge(check_leader_board.__name__, end_alert.__name__)
+    base_builder.add_edge(end_alert.__name__, END)
     base_builder.add_conditional_edges(
         check_pull_backlog.__name__,
         route_check_pull_backlog,
@@ -108,18 +132,102 @@ def make_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
     return graph
 
 
-async def make_graph_async_postgresql(pool: AsyncConnectionPool, setup: bool = False) -> CompiledStateGraph:
-    """Создание графа с асинхронным подключением к postgresql"""
-    checkpointer = AsyncPostgresSaver(pool)
+def make_puzzle_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
+    """Создание подграфа решения одной задачи со своей историей сообщений"""
+
+    puzzle_builder = StateGraph(AOCState, ConfigSchema)
+    _add_solving_nodes(puzzle_builder, END)
+    puzzle_builder.add_edge(START, get_puzzle.__name__)
+
+    return puzzle_builder.compile(checkpointer=checkpointer)
+
+
+def make_concurrent_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
+    """Создание графа, решающего несколько задач параллельно (не более max_concurrent_puzzles одновременно)"""
+
+    solve_puzzle = make_solve_puzzle(make_puzzle_graph())
+
+    base_builder = StateGraph(AOCConcurrentState, ConfigSchema)
+
+    base_builder.add_node(start_alert.__name__, traced_node(start_alert))
+    base_builder.add_node(end_alert.__name__, traced_node(end_alert))
+    base_builder.add_node(check_leader_board.__name__, traced_node(check_leader_board))
+    base_builder.add_node(search_unsolved_puzzles.__name__, traced_node(search_unsolved_puzzles))
+    base_builder.add_node(solve_puzzle.__name__, traced_node(solve_puzzle))
+
+    base_builder.add_edge(START, start_alert.__name__)
+    base_builder.add_edge(start_alert.__name__, search_unsolved_puzzles.__name__)
+    base_builder.add_conditional_edges(
+        search_unsolved_puzzles.__name__,
+        route_dispatch_puzzles,
+        {
+            ALL_DONE_ROUTE_NAME: check_leader_board.__name__,
+            GET_PUZZLE_ROUTE_NAME: solve_puzzle.__name__
+        }
+    )
+    # Ветки всех задач сходятся, после чего календарь проверяется заново (открылись вторые части)
+    base_builder.add_edge(solve_puzzle.__name__, search_unsolved_puzzles.__name__)
+    base_builder.add_edge(check_leader_board.__name__, end_alert.__name__)
+    base_builder.add_edge(end_alert.__name__, END)
+
+    graph = base_builder.compile(checkpointer=checkpointer)
+    return graph
+
+
+def _make_memory_checkpointer(serde: SerializerProtocol = None) -> BaseCheckpointSaver:
+    from langgraph.checkpoint.memory import MemorySaver
+    return MemorySaver(serde=serde or BlobExternalizingSerializer())
+
+
+def _make_postgres_checkpointer(pool: 'AsyncConnectionPool', serde: SerializerProtocol = None,
+                                externalize_blobs: bool = False) -> BaseCheckpointSaver:
+    """По умолчанию обычный сериализатор LangGraph: вынесенные строки лежат на локальном диске,
+    и без них поток нельзя продолжить на другой машине или после очистки cache/.
+    externalize_blobs включают, только если CHECKPOINT_BLOB_DIRPATH общая для всех процессов графа"""
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    if serde is None and externalize_blobs:
+        serde = BlobExternalizingSerializer()
+    return AsyncPostgresSaver(pool, serde=serde)
+
+
+# Реестр хранилищ состояния по типу. Драйвер базы импортируется только при создании хранилища
+CHECKPOINTER_REGISTRY: Dict[str, Callable[..., BaseCheckpointSaver]] = {
+    'memory': _make_memory_checkpointer,
+    'postgres': _make_postgres_checkpointer,
+}
+
+
+def make_checkpointer(checkpointer_type: str, *args, **kwargs) -> BaseCheckpointSaver:
+    if checkpointer_type not in CHECKPOINTER_REGISTRY:
+        raise ValueError(f'Хранилище состояния "{checkpointer_type}" не поддерживается')
+    return CHECKPOINTER_REGISTRY[checkpointer_type](*args, **kwargs)
+
+
+async def make_graph_async_postgresql(pool: 'AsyncConnectionPool', setup: bool = False,
+                                      concurrent: bool = False, externalize_blobs: bool = False,
+                                      retention: Optional[RetentionPolicy] = None,
+                                      retention_interval: float = CHECKPOINT_RETENTION_INTERVAL) -> CompiledStateGraph:
+    """Создание графа с асинхронным подключением к postgresql.
+
+    С retention в фоне запускается очистка старых контрольных точек раз в retention_interval секунд.
+    Перед закрытием пула ее останавливают через stop_checkpoint_retention().
+    """
+    checkpointer = make_checkpointer('postgres', pool, externalize_blobs=externalize_blobs)
     if setup:
         await checkpointer.setup()
+    if retention is not None:
+        start_checkpoint_retention(checkpointer, retention, retention_interval)
 
+    if concurrent:
+        return make_concurrent_graph(checkpointer)
     return make_graph(checkpointer)
 
 
-async def make_graph_memory() -> CompiledStateGraph:
+async def make_graph_memory(concurrent: bool = False) -> CompiledStateGraph:
     """Создание графа с асинхронным подключением к postgresql"""
-    checkpointer = MemorySaver()
+    checkpointer = make_checkpointer('memory')
+    if concurrent:
+        return make_concurrent_graph(checkpointer)
     return make_graph(checkpointer)
 
 if __name__ == '__main__':
@@ -0,0 +1,171 @@
+"""Режим ожидания открытия задач.
+
+Вместо полного прохода по календарю процесс спит до ближайшего открытия задачи,
+заранее прогревает пул HTTP-соединений, клиент модели и процессы песочницы
+и запускает решение открывшегося дня сразу в момент открытия.
+
+Запуск:
+    python -m aoc_coding_companion.scheduler --model openai-omni --working-dir ./tmp_work_dir
+"""
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import RunnableConfig
+
+from aoc_coding_companion.agent import make_puzzle_graph
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.parser import PuzzleDetail
+from aoc_coding_companion.utils.tracing import finish_run_trace
+from aoc_coding_companion.utils.sandbox import get_sandbox
+from aoc_coding_companion.utils.http_pool import close_parser_pool
+from aoc_coding_companion.utils.notifier import close_telegram_notifiers
+from aoc_coding_companion.utils.constants import (
+    PUZZLE_UNLOCK_HOUR_UTC,
+    PUZZLE_DAYS_BEFORE_2025,
+    PUZZLE_DAYS_SINCE_2025,
+    DEFAULT_PREWARM_SECONDS,
+    PUZZLE_UNLOCK_DELAY,
+)
+from aoc_coding_companion.utils.utils import (
+    get_model_by_config,
+    borrow_parser_by_config,
+    get_parser_config_by_config,
+    send_telegram_message_by_config,
+    flush_telegram_messages_by_config,
+)
+
+
+def get_puzzle_days(year: int) -> int:
+    return PUZZLE_DAYS_BEFORE_2025 if year < 2025 else PUZZLE_DAYS_SINCE_2025
+
+
+def is_day_finished(details: PuzzleDetail, year: int, day: int) -> bool:
+    """Решать больше нечего: обе части решены, или это последний день сезона и решена первая часть
+    (вторая часть последнего дня - не задача, она засчитывается за все остальные звезды)"""
+    return details.complete or (day == get_puzzle_days(year) and details.level > 1)
+
+
+def get_unlock_time(year: int, day: int) -> datetime:
+    return datetime(year, 12, day, PUZZLE_UNLOCK_HOUR_UTC, tzinfo=timezone.utc)
+
+
+def get_next_unlock(now: Optional[datetime] = None) -> Tuple[datetime, int, int]:
+    """Ближайшее открытие задачи после now: (время открытия, год, день)"""
+    now = now or datetime.now(timezone.utc)
+    for year in (now.year, now.year + 1):
+        for day in range(1, get_puzzle_days(year) + 1):
+            unlock_time = get_unlock_time(year, day)
+            if unlock_time > now:
+                return unlock_time, year, day
+    raise RuntimeError(f'Не найдено открытие задачи после {now}')
+
+
+async def sleep_until(moment: datetime) -> None:
+    # Долгий сон делится на части, чтобы переход компьютера в сон или смена часов не сдвигали пробуждение
+    while True:
+        remaining = (moment - datetime.now(timezone.utc)).total_seconds()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, 60))
+
+
+async def prewarm(config: RunnableConfig, year: int) -> None:
+    """Прогрев перед открытием: TCP+TLS соединение с сайтом, клиент модели и процессы песочницы"""
+    logger = get_logger()
+    parser = await borrow_parser_by_config(config)
+    try:
+        await parser.get_page(f"{parser.base_url}/{year}/")
+    except Exception as e:
+        logger.error(f'Не удалось прогреть соединение с сайтом: {e}')
+    get_model_by_config(config)
+    sandbox = get_sandbox()
+    await sandbox.start()
+    await sandbox.run('pass', timeout=10)
+    logger.debug('Прогрев перед открытием задачи завершен')
+
+
+async def solve_day(config: RunnableConfig, year: int, day: int) -> bool:
+    """Решение нерешенных частей дня подграфом решения одной задачи. True, если решены все части.
+
+    Перед каждым запуском подграфа читается страница задачи: после перезапуска процесса
+    уже решенные части не решаются и не отправляются заново.
+    """
+    logger = get_logger()
+    base_url = get_parser_config_by_config(config).base_url.rstrip('/')
+    day_url = f"{base_url}/{year}/day/{day}"
+    puzzle_graph = make_puzzle_graph()
+    parser = await borrow_parser_by_config(config)
+    try:
+        for _ in range(2):
+            details = await parser.parse_puzzle_details(day_url)
+            if is_day_finished(details, year, day):
+                logger.debug(f'День {day} уже решен')
+                return True
+            final_state = await puzzle_graph.ainvoke({'todo_puzzle_links': [day_url], 'messages': []}, config)
+            messages = final_state.get('messages', [])
+            # Как и в route_answer_correctness: ToolMessage в конце означает, что верный ответ не найден
+            if len(messages) == 0 or isinstance(messages[-1], ToolMessage):
+                logger.debug(f'Часть {final_state["current_puzzle_details"].level} дня {day} не решена')
+                return False
+        return is_day_finished(await parser.parse_puzzle_details(day_url), year, day)
+    finally:
+        logger.debug(f'Трасса запуска сохранена в {finish_run_trace(config)}')
+
+
+async def run_scheduler(config: RunnableConfig, prewarm_seconds: float = DEFAULT_PREWARM_SECONDS,
+                        once: bool = False) -> None:
+    """Бесконечный цикл: ожидание открытия, прогрев, решение дня"""
+    logger = get_logger()
+    try:
+        while True:
+            unlock_time, year, day = get_next_unlock()
+            comment = f'Ержан 🙈 ждет открытия задачи {day} декабря {year} в {unlock_time.astimezone()}'
+            logger.debug(comment)
+            send_telegram_message_by_config(comment, config)
+            await flush_telegram_messages_by_config(config)
+
+            await sleep_until(unlock_time - timedelta(seconds=prewarm_seconds))
+            await prewarm(config, year)
+            await sleep_until(unlock_time + timedelta(seconds=PUZZLE_UNLOCK_DELAY))
+
+            try:
+                solved = await solve_day(config, year, day)
+                comment = f'День {day} решен полностью' if solved else f'День {day} решен не полностью'
+            except Exception as e:
+                comment = f'Не удалось решить день {day}: {e}'
+                logger.error(comment)
+            send_telegram_message_by_config(comment, config)
+            await flush_telegram_messages_by_config(config)
+            if once:
+                return
+    finally:
+        await close_telegram_notifiers()
+        await close_parser_pool()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Ожидание открытия задач Advent of Code и их решение')
+    arg_parser.add_argument('--model', default='openai-omni', help='Имя модели из get_model_by_name')
+    arg_parser.add_argument('--working-dir', default='./tmp_work_dir', help='Папка для входных данных')
+    arg_parser.add_argument('--prewarm', type=float, default=DEFAULT_PREWARM_SECONDS,
+                            help='За сколько секунд до открытия начинать прогрев')
+    arg_parser.add_argument('--once', action='store_true', help='Решить ближайший день и завершиться')
+    args = arg_parser.parse_args()
+
+    config = {
+        'configurable': {
+            'thread_id': str(uuid.uuid4()),
+            'model': args.model,
+            'working_dir': args.working_dir,
+        },
+        'recursion_limit': 100,
+    }
+    asyncio.run(run_scheduler(config, prewarm_seconds=args.prewarm, once=args.once))
+
+
+if __name__ == '__main__':
+    main()
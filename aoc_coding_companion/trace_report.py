@@ -0,0 +1,33 @@
+"""Разбивка времени сохраненного запуска по задачам, узлам и вложенным операциям.
+
+Запуск:
+    python -m aoc_coding_companion.trace_report [путь к JSON трассы, по умолчанию последняя]
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from aoc_coding_companion.utils.constants import TRACES_DIRPATH
+from aoc_coding_companion.utils.tracing import RunTrace, format_breakdown
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Разбивка времени запуска по задачам')
+    arg_parser.add_argument('path', nargs='?', help='JSON трассы, по умолчанию последняя сохраненная')
+    arg_parser.add_argument('--metrics', action='store_true', help='Вывести метрики в формате OpenMetrics')
+    args = arg_parser.parse_args()
+
+    if args.path:
+        path = Path(args.path)
+    else:
+        paths = sorted(TRACES_DIRPATH.glob('*.json'), key=lambda path: path.stat().st_mtime)
+        if not paths:
+            sys.exit(f'Трассы не найдены в {TRACES_DIRPATH}')
+        path = paths[-1]
+    trace = RunTrace(**json.loads(path.read_text(encoding='utf-8')))
+    print(trace.to_openmetrics() if args.metrics else format_breakdown(trace))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,10 @@ from .nodes import *
 from .state import *
 from .logger import *
 from .config_schema import *
+from .http_pool import close_parser_pool
+from .retention import (
+    RetentionPolicy,
+    make_checkpoint_retention,
+    start_checkpoint_retention,
+    stop_checkpoint_retention
+)
@@ -0,0 +1,153 @@
+"""Вынос больших строк из контрольных точек графа в хранилище, адресуемое по содержимому.
+
+LangGraph сохраняет значение канала целиком на каждом шаге, поэтому условие задачи, код и вывод
+программ повторяются в каждой контрольной точке. Сериализатор заменяет такие строки ссылкой
+на хэш, а сами строки записываются в хранилище один раз.
+"""
+import os
+import re
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from aoc_coding_companion.utils.constants import (
+    CHECKPOINT_BLOB_DIRPATH,
+    CHECKPOINT_BLOB_MIN_SIZE,
+    CHECKPOINT_BLOB_TOUCH_INTERVAL
+)
+
+
+BLOB_REFERENCE_PREFIX = '\x00blob:sha256:'
+# Ссылка в сериализованной контрольной точке: в msgpack нулевой символ хранится как есть, в JSON - как \u0000
+BLOB_REFERENCE_PATTERN = re.compile(rb'(?:\x00|\\u0000)blob:sha256:([0-9a-f]{64})')
+
+
+def find_blob_references(data: bytes) -> Set[str]:
+    return {match.group(1).decode() for match in BLOB_REFERENCE_PATTERN.finditer(data)}
+
+
+class BlobStore:
+    """Дисковое хранилище строк по sha256. Записи не изменяются, повторная запись пропускается.
+
+    Время изменения файла - время последнего использования: очистка (utils.retention)
+    не удаляет недавно использованные строки, даже если контрольная точка с ними еще не записана.
+    """
+
+    def __init__(self, dirpath: Path = CHECKPOINT_BLOB_DIRPATH,
+                 touch_interval: float = CHECKPOINT_BLOB_TOUCH_INTERVAL):
+        self.dirpath = Path(dirpath)
+        self.touch_interval = touch_interval
+        # Хэши, уже записанные этим процессом, и время последнего обновления их файлов
+        self._known: Dict[str, float] = {}
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.dirpath / digest[:2] / digest
+
+    def put(self, text: str) -> str:
+        data = text.encode('utf-8', 'surrogatepass')
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.monotonic()
+        if now - self._known.get(digest, -self.touch_interval) < self.touch_interval:
+            return digest
+        path = self._blob_path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'{digest}.{os.getpid()}.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        self._known[digest] = now
+        return digest
+
+    def get(self, digest: str) -> str:
+        try:
+            data = self._blob_path(digest).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(f'Строка {digest} не найдена в хранилище {self.dirpath}') from None
+        return data.decode('utf-8', 'surrogatepass')
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._known or self._blob_path(digest).exists()
+
+    def entries(self) -> Iterator[Tuple[str, float, int]]:
+        """Хэш, время последнего использования и размер каждой строки"""
+        if not self.dirpath.exists():
+            return
+        for path in self.dirpath.glob('??/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path.name, stat.st_mtime, stat.st_size
+
+    def delete(self, digest: str) -> None:
+        self._known.pop(digest, None)
+        self._blob_path(digest).unlink(missing_ok=True)
+
+
+class BlobExternalizingSerializer(SerializerProtocol):
+    """Сериализатор контрольных точек, выносящий строки длиннее min_size в BlobStore.
+
+    Обходятся строки, списки, кортежи, словари и pydantic-модели (сообщения, PuzzleDetail),
+    поэтому в контрольной точке остаются только ссылки на условие задачи, код и вывод программ.
+    """
+
+    def __init__(self, inner: Optional[SerializerProtocol] = None, store: Optional[BlobStore] = None,
+                 min_size: int = CHECKPOINT_BLOB_MIN_SIZE):
+        self.inner = inner or JsonPlusSerializer()
+        self.store = store or BlobStore()
+        self.min_size = min_size
+
+    def externalize(self, value: Any) -> Any:
+        if isinstance(value, str):
+            if len(value) < self.min_size:
+                return value
+            return BLOB_REFERENCE_PREFIX + self.store.put(value)
+        return self._walk(value, self.externalize)
+
+    def restore(self, value: Any) -> Any:
+        if isinstance(value, str):
+            if value.startswith(BLOB_REFERENCE_PREFIX):
+                return self.store.get(value[len(BLOB_REFERENCE_PREFIX):])
+            return value
+        return self._walk(value, self.restore)
+
+    @staticmethod
+    def _walk(value: Any, convert) -> Any:
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        if isinstance(value, tuple):
+            items = [convert(item) for item in value]
+            # namedtuple восстанавливается своим типом
+            return type(value)(*items) if hasattr(value, '_fields') else tuple(items)
+        if isinstance(value, BaseModel):
+            update = {}
+            for name in type(value).model_fields:
+                item = getattr(value, name, None)
+                converted = convert(item)
+                if converted is not item:
+                    update[name] = converted
+            return value.model_copy(update=update) if update else value
+        return value
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(self.externalize(obj))
+
+    def loads(self, data: bytes) -> Any:
+        return self.restore(self.inner.loads(data))
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        return self.inner.dumps_typed(self.externalize(obj))
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return self.restore(self.inner.loads_typed(data))
@@ -0,0 +1,163 @@
+import json
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+from aoc_coding_companion.utils.models import PythonREPL, TaskAnswer
+from aoc_coding_companion.utils.constants import DEFAULT_PROMPT_TOKEN_BUDGET, DEFAULT_TOOL_OUTPUT_LIMIT
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+SUPERSEDED_CODE_MARK = '# Superseded attempt #{number}: the code is omitted, see the latest attempt below'
+
+
+class CompactionStats(BaseModel):
+    tokens_before: int = 0
+    tokens_after: int = 0
+    superseded_code: int = 0
+    truncated_outputs: int = 0
+    dropped_messages: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def __str__(self) -> str:
+        return (
+            f"Сжатие контекста(токенов до={self.tokens_before}, после={self.tokens_after}, "
+            f"скрыто старого кода={self.superseded_code}, обрезано выводов={self.truncated_outputs}, "
+            f"удалено сообщений={self.dropped_messages})"
+        )
+
+
+@lru_cache()
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:  # Словарь кодировки может быть недоступен без сети
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Оценка количества токенов: tiktoken, если доступен, иначе ~4 символа на токен"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: AnyMessage) -> int:
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    for tool_call in getattr(message, 'tool_calls', None) or []:
+        text += json.dumps(tool_call['args'], ensure_ascii=False)
+    return count_tokens(text)
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """Сохранение начала и конца длинного текста"""
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f'{text[:head]}\n...[{len(text) - limit} characters omitted]...\n{text[-tail:]}'
+
+
+def _replace_tool_calls(message: AIMessage, tool_calls: list) -> AIMessage:
+    additional_kwargs = dict(message.additional_kwargs)
+    # Сырые вызовы OpenAI дублируют tool_calls и содержат полный код
+    additional_kwargs.pop('tool_calls', None)
+    return message.model_copy(update={'tool_calls': tool_calls, 'additional_kwargs': additional_kwargs})
+
+
+def _split_rounds(messages: List[AnyMessage]) -> List[List[AnyMessage]]:
+    """Разбиение истории на раунды: сообщение модели и ответы инструментов на него"""
+    rounds = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and rounds:
+            rounds[-1].append(message)
+        else:
+            rounds.append([message])
+    return rounds
+
+
+def compact_messages(messages: List[AnyMessage],
+                     token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+                     tool_output_limit: int = DEFAULT_TOOL_OUTPUT_LIMIT,
+                     reserved_tokens: int = 0) -> Tuple[List[AnyMessage], CompactionStats]:
+    """Сжатие истории перед вызовом модели. Исходный список не изменяется.
+
+    Последний код и все выводы остаются, старые попытки кода заменяются пометкой,
+    длинные выводы инструментов обрезаются. Если история все равно не влезает в бюджет
+    (за вычетом reserved_tokens на условие задачи), удаляются самые старые раунды,
+    а отклоненные в них ответы перечисляются в отдельном сообщении.
+    """
+    stats = CompactionStats(
+        tokens_before=sum(count_message_tokens(message) for message in messages)
+    )
+
+    code_positions = [
+        index for index, message in enumerate(messages)
+        if isinstance(message, AIMessage)
+        and any(tool_call['name'] == PythonREPL.__name__ for tool_call in message.tool_calls)
+    ]
+    latest_code_position = code_positions[-1] if code_positions else None
+
+    compacted = []
+    for index, message in enumerate(messages):
+        if isinstance(message, AIMessage) and index in code_positions and index != latest_code_position:
+            tool_calls = []
+            for tool_call in message.tool_calls:
+                if tool_call['name'] == PythonREPL.__name__:
+                    stats.superseded_code += 1
+                    query = SUPERSEDED_CODE_MARK.format(number=code_positions.index(index) + 1)
+                    tool_call = {**tool_call, 'args': {**tool_call['args'], 'query': query}}
+                tool_calls.append(tool_call)
+            message = _replace_tool_calls(message, tool_calls)
+        elif isinstance(message, ToolMessage) and isinstance(message.content, str) \
+                and len(message.content) > tool_output_limit:
+            stats.truncated_outputs += 1
+            message = message.model_copy(update={'content': truncate_text(message.content, tool_output_limit)})
+        compacted.append(message)
+
+    budget = max(token_budget - reserved_tokens, 0)
+    rounds = _split_rounds(compacted)
+    round_tokens = [sum(count_message_tokens(message) for message in round_messages) for round_messages in rounds]
+    dropped_answers = []
+    # Последний раунд остается всегда, иначе модели не на что отвечать
+    while len(rounds) > 1 and sum(round_tokens) > budget:
+        dropped = rounds.pop(0)
+        round_tokens.pop(0)
+        stats.dropped_messages += len(dropped)
+        for message in dropped:
+            for tool_call in getattr(message, 'tool_calls', None) or []:
+                if tool_call['name'] == TaskAnswer.__name__:
+                    dropped_answers.append(str(tool_call['args'].get('answer', '')).strip())
+
+    compacted = [message for round_messages in rounds for message in round_messages]
+    if stats.dropped_messages:
+        note = 'Earlier attempts were omitted to save context.'
+        if dropped_answers:
+            note += f' These answers were already given and are incorrect: {", ".join(dropped_answers)}.'
+        compacted.insert(0, HumanMessage(content=note))
+
+    stats.tokens_after = sum(count_message_tokens(message) for message in compacted)
+    return compacted, stats
+
+
+def compact_messages_for_prompt(messages: List[AnyMessage], *prompt_parts: str,
+                                token_budget: Optional[int] = None) -> Tuple[List[AnyMessage], CompactionStats]:
+    """Сжатие истории с учетом токенов, занятых остальной частью промпта"""
+    reserved_tokens = sum(count_tokens(part) for part in prompt_parts)
+    return compact_messages(
+        messages,
+        token_budget=token_budget if token_budget is not None else DEFAULT_PROMPT_TOKEN_BUDGET,
+        reserved_tokens=reserved_tokens
+    )
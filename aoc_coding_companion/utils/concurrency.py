@@ -0,0 +1,15 @@
+import asyncio
+from typing import Dict, Tuple
+
+
+# Примитивы asyncio привязаны к циклу событий, поэтому храним их отдельно для каждого цикла
+_solving_semaphores: Dict[Tuple[int, int], asyncio.Semaphore] = {}
+
+
+def get_solving_semaphore(limit: int) -> asyncio.Semaphore:
+    """Семафор, ограничивающий количество одновременно решаемых задач"""
+    key = (id(asyncio.get_running_loop()), limit)
+    if key not in _solving_semaphores:
+        _solving_semaphores[key] = asyncio.Semaphore(limit)
+    return _solving_semaphores[key]
+
@@ -6,6 +6,18 @@ class ConfigSchema(TypedDict):
 
     model: Optional[Literal['openai-omni', 'giga-pro', 'giga-max']]
     session_token: str
+    base_url: str
     telegram_id: int
     leaderboard_id: int
     working_dir: str
+    max_concurrent_puzzles: int
+    max_submit_wait: Optional[float]
+    prompt_token_budget: int
+    self_consistency_samples: int
+    self_consistency_min_agreement: float
+    verify_examples: bool
+    prefetch_count: int
+    streaming: bool
+    llm_cache: bool
+    exec_soft_timeout: float
+    solution_library_top_k: int
@@ -10,6 +10,131 @@ LOGGER_NAME = 'aoc_coding_companion'
 LOGGER_LEVEL = logging.DEBUG if 'SIMULATOR_DEBUG' in os.environ else logging.INFO
 LOGGER_DIRPATH = PROJECT_PATH / 'logs'
 LOGGER_FILEPATH = LOGGER_DIRPATH / f'{LOGGER_NAME}.log'
+# Трассы запусков графа (JSON и OpenMetrics)
+TRACES_DIRPATH = LOGGER_DIRPATH / 'traces'
+
+# Папку кэшей можно переопределить, например чтобы бенчмарк не зависел от прошлых запусков
+CACHE_DIRPATH = Path(os.environ.get('AOC_CACHE_DIR', PROJECT_PATH / 'cache'))
 
 DEFAULT_ATTEMPT_COUNT = 5
 DEFAULT_TIMEOUT_EXEC_CODE = 120
+DEFAULT_MAX_CONCURRENT_PUZZLES = 3
+# Бюджет токенов на один вызов модели и лимит символов вывода инструмента в истории
+DEFAULT_PROMPT_TOKEN_BUDGET = 24_000
+DEFAULT_TOOL_OUTPUT_LIMIT = 2_000
+# Самосогласованность: количество независимых решений (1 - режим выключен) и доля голосов для ответа
+DEFAULT_SELF_CONSISTENCY_SAMPLES = 1
+DEFAULT_SELF_CONSISTENCY_MIN_AGREEMENT = 0.5
+# Проверка кода на примерах из условия перед запуском на настоящих входных данных
+DEFAULT_VERIFY_EXAMPLES = True
+DEFAULT_EXAMPLE_TIMEOUT = 10
+
+# Потоковый ответ модели: запуск кода сразу после готовности вызова инструмента и оповещения о ходе ответа
+DEFAULT_STREAMING = False
+STREAM_PROGRESS_INTERVAL = 15
+SPECULATIVE_RUN_MAX_AGE = 10 * 60
+
+# Кэш ответов модели по точному совпадению запроса: время жизни записи и максимум записей.
+# По умолчанию выключен: модели отвечают с temperature=1, и новый поток по нерешенной задаче
+# получал бы из кэша тот же, часто неверный, первый ответ. llm_cache=True включает его
+# для продолжения потока после падения и воспроизведения в бенчмарках
+DEFAULT_LLM_CACHE = False
+LLM_CACHE_FILEPATH = CACHE_DIRPATH / 'llm_cache.sqlite'
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 5000
+
+# Предзагрузка следующих задач из списка, пока решается текущая
+DEFAULT_PREFETCH_COUNT = 2
+PREFETCH_CONCURRENCY = 2
+PREFETCH_MAX_AGE = 10 * 60
+
+# Режим ожидания открытия задач: задачи открываются в полночь UTC-5 (05:00 UTC) с 1 декабря,
+# с 2025 года их 12 вместо 25. Прогрев соединений и процессов начинается заранее
+PUZZLE_UNLOCK_HOUR_UTC = 5
+PUZZLE_DAYS_BEFORE_2025 = 25
+PUZZLE_DAYS_SINCE_2025 = 12
+DEFAULT_PREWARM_SECONDS = 30
+# Запас после открытия на расхождение часов с сайтом
+PUZZLE_UNLOCK_DELAY = 1.0
+
+# Песочница для запуска сгенерированного кода
+DEFAULT_SANDBOX_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_SANDBOX_MEMORY_LIMIT = 2 * 1024 * 1024 * 1024
+DEFAULT_SANDBOX_MAX_TASKS_PER_WORKER = 20
+DEFAULT_EXEC_OUTPUT_LIMIT = 20_000
+# Разобранных форм входных данных в кэше модуля aoc одного рабочего процесса
+INPUT_HELPERS_CACHE_SIZE = 32
+# Мягкий срок запуска кода (0 - совпадает с жестким): по нему код останавливается с профилем для модели.
+# Если код не остановился за SANDBOX_INTERRUPT_GRACE секунд после жесткого срока, процесс убивается.
+# По умолчанию 0: меньший срок сократил бы время на медленные, но верные решения
+DEFAULT_EXEC_SOFT_TIMEOUT = 0
+SANDBOX_INTERRUPT_GRACE = 2
+# Статистический профилировщик песочницы: интервал выборки по процессорному времени, как часто
+# снимать счетчики циклов и сколько их хранить, сколько горячих строк показывать модели
+# и с какого времени работы профиль добавляется к выводу успешного запуска, секунды
+EXEC_PROFILE_INTERVAL = 0.01
+EXEC_PROFILE_SNAPSHOT_INTERVAL = 1.0
+EXEC_PROFILE_MAX_COUNTERS = 50
+EXEC_PROFILE_TOP_LINES = 5
+EXEC_SLOW_RUN_THRESHOLD = 10
+
+# Кэш результатов запуска кода
+EXEC_CACHE_DIRPATH = CACHE_DIRPATH / 'exec'
+EXEC_CACHE_MAX_ENTRIES = 1000
+# Вынесенные из контрольных точек графа большие строки (условия задач, код, вывод программ),
+# хранятся один раз по хэшу содержимого
+CHECKPOINT_BLOB_DIRPATH = CACHE_DIRPATH / 'checkpoint_blobs'
+CHECKPOINT_BLOB_MIN_SIZE = 1024
+# Повторное использование строки обновляет время файла не чаще раза в интервал, секунды
+CHECKPOINT_BLOB_TOUCH_INTERVAL = 10 * 60
+
+# Очистка контрольных точек: сколько последних точек хранить у потока, через сколько секунд
+# без новых точек поток считается завершенным и сжимается до последнего состояния,
+# сколько потоков обрабатывать за раз и как часто запускать очистку в фоне
+CHECKPOINT_KEEP_LAST = 20
+CHECKPOINT_FINISHED_AFTER = 24 * 60 * 60
+CHECKPOINT_RETENTION_BATCH_SIZE = 100
+CHECKPOINT_RETENTION_INTERVAL = 60 * 60
+# Строки из хранилища удаляются, только если не использовались дольше этого времени
+CHECKPOINT_BLOB_GRACE = 60 * 60
+# Библиотека решенных задач: сколько похожих решений показывать модели (0 - не показывать),
+# минимальная близость условий и лимит символов кода одного решения в промпте
+SOLUTION_LIBRARY_FILEPATH = CACHE_DIRPATH / 'solution_library.jsonl'
+DEFAULT_SOLUTION_LIBRARY_TOP_K = 2
+SOLUTION_LIBRARY_MIN_SIMILARITY = 0.2
+SOLUTION_LIBRARY_CODE_LIMIT = 4000
+# Минимальный интервал между отправками ответов одного аккаунта, секунды
+DEFAULT_SUBMIT_INTERVAL = 5
+# Сохраненные блокировки отправки ответов (переживают перезапуск)
+SUBMISSION_STATE_FILEPATH = CACHE_DIRPATH / 'submission_cooldowns.json'
+# Последние снимки приватных лидербордов для подсчета изменений между проверками
+LEADERBOARD_SNAPSHOT_DIRPATH = CACHE_DIRPATH / 'leaderboard'
+
+# Адрес сайта по умолчанию (переопределяется AOC_BASE_URL или base_url в конфигурации, например локальным стендом)
+AOC_BASE_URL = 'https://adventofcode.com'
+
+# Пул HTTP-соединений к adventofcode.com
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 10
+HTTP_POOL_DNS_TTL = 10 * 60
+HTTP_POOL_KEEPALIVE_TIMEOUT = 60
+HTTP_POOL_REQUEST_TIMEOUT = 60
+
+# HTTP-кэш страниц календаря, задач и лидерборда
+HTTP_CACHE_DIRPATH = CACHE_DIRPATH / 'http'
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+HTTP_CACHE_DEFAULT_TTL = 0
+# Время жизни в секундах по шаблону URL. Лидерборд обновляется на сайте раз в 15 минут,
+# страницы задачи и календаря дополнительно сбрасываются после верного ответа
+HTTP_CACHE_TTLS = (
+    (r'/leaderboard/private/view/\d+', 15 * 60),
+    (r'/\d{4}/day/\d+/?$', 60 * 60),
+    (r'/\d{4}/?$', 60),
+)
+
+# Оповещения в телеграм
+TELEGRAM_QUEUE_SIZE = 100
+TELEGRAM_COALESCE_WINDOW = 1.0
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+TELEGRAM_MAX_RETRIES = 5
+TELEGRAM_FLUSH_TIMEOUT = 60
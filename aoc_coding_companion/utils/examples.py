@@ -0,0 +1,82 @@
+import asyncio
+from pathlib import Path
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.parser import PuzzleExample
+from aoc_coding_companion.utils.voting import extract_answer
+from aoc_coding_companion.utils.execution import execute_code
+from aoc_coding_companion.utils.constants import DEFAULT_EXAMPLE_TIMEOUT
+
+
+class ExampleCheck(BaseModel):
+    # None - проверить не удалось (нет примеров с ответом или путь к входным данным не найден в коде)
+    passed: Optional[bool] = None
+    checked: int = 0
+    message: str = ''
+
+    def __str__(self) -> str:
+        return f"Проверка на примерах(пройдена={self.passed}, проверено={self.checked})"
+
+
+def example_filepath(input_filepath: str, index: int) -> Path:
+    input_filepath = Path(input_filepath)
+    return input_filepath.with_name(f'EXAMPLE-{index}-{input_filepath.name}')
+
+
+def substitute_input_path(code: str, input_filepath: str, replacement: str) -> Optional[str]:
+    """Подмена пути к входным данным в коде. None, если путь в коде не найден"""
+    input_filepath = Path(input_filepath)
+    for candidate in (str(input_filepath), input_filepath.as_posix()):
+        if candidate in code:
+            return code.replace(candidate, Path(replacement).as_posix())
+    return None
+
+
+async def check_examples(code: str, input_filepath: str, examples: List[PuzzleExample],
+                         timeout: int = DEFAULT_EXAMPLE_TIMEOUT) -> ExampleCheck:
+    """Запуск кода на примерах из условия вместо настоящих входных данных"""
+    examples = [example for example in examples if example.expected_output]
+    if not examples or not input_filepath:
+        return ExampleCheck()
+
+    runs = []
+    for index, example in enumerate(examples, start=1):
+        path = example_filepath(input_filepath, index)
+        example_code = substitute_input_path(code, input_filepath, str(path))
+        if example_code is None:
+            return ExampleCheck(message='The path to the input file was not found in the code, examples skipped')
+        # Неизменный файл не перезаписывается: модуль aoc в песочнице держит его mmap и разобранные формы
+        if not path.exists() or path.read_text(encoding='utf-8') != example.input:
+            path.write_text(example.input, encoding='utf-8')
+        runs.append((example_code, str(path)))
+
+    outcomes = await asyncio.gather(*[execute_code(example_code, path, timeout) for example_code, path in runs])
+    for example, outcome in zip(examples, outcomes):
+        answer = extract_answer(outcome)
+        if answer == example.expected_output.strip():
+            continue
+        if outcome.timed_out:
+            printed = f'nothing, it runs longer than {timeout} seconds on this tiny input'
+        elif outcome.error:
+            printed = f'an error {outcome.output}'
+        else:
+            printed = f'"{answer}"'
+        return ExampleCheck(
+            passed=False,
+            checked=len(outcomes),
+            message=(
+                f'The program fails the example from the task description. '
+                f'On the example input:\n{example.input[:500]}\n'
+                f'it printed {printed}, but the expected answer is "{example.expected_output}". '
+                f'So the result on the real input is probably wrong too. Fix the code, unless the example '
+                f'uses other parameters than the real input (for example, a smaller grid or fewer steps).'
+                + (f'\n\n{outcome.profile}' if outcome.profile else '')
+            )
+        )
+    return ExampleCheck(
+        passed=True,
+        checked=len(outcomes),
+        message=f'The program passes {len(outcomes)} example(s) from the task description.'
+    )
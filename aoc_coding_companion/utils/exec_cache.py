@@ -0,0 +1,99 @@
+import os
+import ast
+import json
+import time
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.constants import EXEC_CACHE_DIRPATH, EXEC_CACHE_MAX_ENTRIES
+
+
+class ExecCacheEntry(BaseModel):
+    output: str
+    timed_out: bool = False
+    error: bool = False
+    runtime: float = 0.0
+    profile: str = ''
+    created_at: float
+
+
+class ExecResultCache:
+    """Дисковый кэш результатов запуска кода, адресуемый по содержимому.
+
+    Ключ - хэш нормализованного кода (дамп AST, поэтому пробелы и комментарии не важны)
+    и хэш файла входных данных. Самые давно использованные записи вытесняются.
+    """
+
+    def __init__(self, dirpath: Path = EXEC_CACHE_DIRPATH, max_entries: int = EXEC_CACHE_MAX_ENTRIES):
+        self.dirpath = Path(dirpath)
+        self.max_entries = max_entries
+        # Хэши входных файлов по (путь, время изменения, размер), чтобы не перечитывать большие файлы
+        self._file_hashes: Dict[Tuple[str, float, int], str] = {}
+
+    @staticmethod
+    def normalize_code(code: str) -> str:
+        try:
+            return ast.dump(ast.parse(code))
+        except (SyntaxError, ValueError):
+            # Неразбираемый код нормализуем хотя бы по пробелам в концах строк
+            return '\n'.join(line.rstrip() for line in code.strip().splitlines())
+
+    def hash_file(self, filepath: Optional[str]) -> str:
+        if not filepath:
+            return ''
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return ''
+        file_key = (str(filepath), stat.st_mtime, stat.st_size)
+        if file_key not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._file_hashes[file_key] = digest.hexdigest()
+        return self._file_hashes[file_key]
+
+    def make_key(self, code: str, input_filepath: Optional[str] = None) -> str:
+        code_hash = hashlib.sha256(self.normalize_code(code).encode()).hexdigest()
+        return hashlib.sha256(f'{code_hash}:{self.hash_file(input_filepath)}'.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.dirpath / f'{key}.json'
+
+    def get(self, key: str) -> Optional[ExecCacheEntry]:
+        path = self._entry_path(key)
+        try:
+            entry = ExecCacheEntry(**json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError, TypeError):
+            return None
+        # Время изменения файла служит временем последнего доступа для LRU
+        os.utime(path)
+        return entry
+
+    def put(self, key: str, output: str, timed_out: bool = False, error: bool = False, runtime: float = 0.0,
+            profile: str = '') -> None:
+        self.dirpath.mkdir(parents=True, exist_ok=True)
+        entry = ExecCacheEntry(output=output, timed_out=timed_out, error=error, runtime=runtime, profile=profile,
+                               created_at=time.time())
+        tmp_path = self._entry_path(key).with_suffix('.tmp')
+        tmp_path.write_text(entry.model_dump_json(), encoding='utf-8')
+        tmp_path.replace(self._entry_path(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        paths = list(self.dirpath.glob('*.json'))
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=lambda path: path.stat().st_mtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            path.unlink(missing_ok=True)
+
+
+@lru_cache()
+def get_exec_cache() -> ExecResultCache:
+    return ExecResultCache()
@@ -0,0 +1,49 @@
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.sandbox import get_sandbox
+from aoc_coding_companion.utils.profiler import format_profile
+from aoc_coding_companion.utils.constants import EXEC_SLOW_RUN_THRESHOLD
+from aoc_coding_companion.utils.exec_cache import get_exec_cache
+from aoc_coding_companion.utils.tracing import trace_span, record_exec
+
+
+class ExecOutcome(BaseModel):
+    output: str = ''
+    timed_out: bool = False
+    # Код завершился исключением, в output его repr
+    error: bool = False
+    cached: bool = False
+    # Время работы кода в песочнице, секунды (для результата из кэша - время того запуска)
+    runtime: float = 0.0
+    # Сводка профиля для модели, если код остановлен по сроку или работал дольше EXEC_SLOW_RUN_THRESHOLD
+    profile: str = ''
+
+
+async def execute_code(code: str, input_filepath: Optional[str], timeout: int,
+                       soft_timeout: Optional[float] = None) -> ExecOutcome:
+    """Запуск кода в песочнице с кэшем результатов по нормализованному коду и входным данным"""
+    cache = get_exec_cache()
+    key = cache.make_key(code, input_filepath)
+    entry = cache.get(key)
+    # Остановка по сроку зависит от лимита и загрузки машины, а не только от кода: такой запуск повторяется
+    if entry is not None and not entry.timed_out:
+        return ExecOutcome(output=entry.output, timed_out=entry.timed_out, error=entry.error, cached=True,
+                           runtime=entry.runtime, profile=entry.profile)
+
+    start = time.perf_counter()
+    async with trace_span('exec', 'sandbox'):
+        result = await get_sandbox().run(code, timeout, soft_timeout=soft_timeout)
+        record_exec(result.cpu_time, result.max_rss_kb)
+    runtime = time.perf_counter() - start
+    output = result.error if result.error is not None else result.output
+    output = output.strip(' \n')
+    error = result.error is not None
+    profile = ''
+    if result.profile is not None and (result.timed_out or runtime >= EXEC_SLOW_RUN_THRESHOLD):
+        profile = format_profile(result.profile, code)
+    if not result.timed_out:
+        cache.put(key, output, error=error, runtime=runtime, profile=profile)
+    return ExecOutcome(output=output, timed_out=result.timed_out, error=error, runtime=runtime, profile=profile)
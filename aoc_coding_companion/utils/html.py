@@ -0,0 +1,43 @@
+from typing import Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    PARSER_BACKEND = 'lxml'
+except ImportError:
+    PARSER_BACKEND = 'html.parser'
+
+
+def _has_class(attrs: dict, class_name: str) -> bool:
+    # Во время разбора class еще не разделен на список (зависит от парсера)
+    classes = attrs.get('class') or ''
+    if isinstance(classes, str):
+        classes = classes.split()
+    return class_name in classes
+
+
+def _make_strainer(*rules) -> SoupStrainer:
+    """Частичный разбор: в дерево попадают только теги (со всем содержимым), подходящие под одно из правил"""
+
+    def match(name: str, attrs: dict) -> bool:
+        return any(name == tag and (class_name is None or _has_class(attrs, class_name)) for tag, class_name in rules)
+
+    return SoupStrainer(match)
+
+
+# Страница задачи: условия частей и отметка о решенной части
+PUZZLE_STRAINER = _make_strainer(('article', 'day-desc'), ('p', 'day-success'))
+# Календарь года
+CALENDAR_STRAINER = _make_strainer(('pre', 'calendar'))
+# Приватный лидерборд: свое имя, строки участников и форма вступления (если нет доступа)
+LEADERBOARD_STRAINER = _make_strainer(('div', 'user'), ('div', 'privboard-row'), ('form', None))
+# Имя пользователя в шапке любой страницы
+USER_STRAINER = _make_strainer(('div', 'user'))
+# Ответ на отправку решения
+SUBMISSION_STRAINER = _make_strainer(('article', None))
+
+
+def make_soup(html: str, parse_only: Optional[SoupStrainer] = None, backend: Optional[str] = None) -> BeautifulSoup:
+    """Разбор HTML самым быстрым доступным парсером (lxml, если установлен)"""
+    return BeautifulSoup(html, backend or PARSER_BACKEND, parse_only=parse_only)
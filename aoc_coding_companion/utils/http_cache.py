@@ -0,0 +1,182 @@
+import re
+import json
+import time
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.constants import (
+    HTTP_CACHE_DIRPATH,
+    HTTP_CACHE_MAX_BYTES,
+    HTTP_CACHE_TTLS,
+    HTTP_CACHE_DEFAULT_TTL,
+)
+
+
+class CacheEntry(BaseModel):
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float
+    last_access: float
+    size: int
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Статистика HTTP-кэша(попадания={self.hits}, подтверждены 304={self.revalidated}, "
+            f"промахи={self.misses}, вытеснения={self.evictions})"
+        )
+
+
+class HttpCache:
+    """Дисковый кэш ответов с условными запросами (ETag/Last-Modified), TTL по эндпоинтам и LRU-вытеснением.
+
+    Ключ записи - URL и хэш токена сессии, так как страницы AoC персональные.
+    """
+
+    INDEX_FILENAME = 'index.json'
+
+    def __init__(self,
+                 dirpath: Path = HTTP_CACHE_DIRPATH,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES,
+                 ttls: Tuple[Tuple[str, float], ...] = HTTP_CACHE_TTLS,
+                 default_ttl: float = HTTP_CACHE_DEFAULT_TTL):
+        self.dirpath = Path(dirpath)
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._entries: Dict[str, CacheEntry] = self._load_index()
+
+    @property
+    def index_path(self) -> Path:
+        return self.dirpath / self.INDEX_FILENAME
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        try:
+            raw = json.loads(self.index_path.read_text(encoding='utf-8'))
+            entries = {key: CacheEntry(**value) for key, value in raw.items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+        # Записи без файла с телом ответа не нужны
+        return {key: entry for key, entry in entries.items() if self._body_path(key).exists()}
+
+    def _save_index(self) -> None:
+        self.dirpath.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(
+            json.dumps({key: entry.model_dump() for key, entry in self._entries.items()}),
+            encoding='utf-8'
+        )
+        tmp_path.replace(self.index_path)
+
+    def _body_path(self, key: str) -> Path:
+        return self.dirpath / f'{key}.body'
+
+    @staticmethod
+    def make_key(url: str, session_token: str) -> str:
+        session_hash = hashlib.sha256(session_token.encode()).hexdigest()
+        return hashlib.sha256(f'{session_hash}:{url}'.encode()).hexdigest()
+
+    def ttl_for(self, url: str) -> float:
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self._entries.get(key)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl_for(entry.url)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read(self, key: str) -> Optional[str]:
+        """Чтение тела ответа с обновлением времени последнего доступа"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            body = self._body_path(key).read_text(encoding='utf-8')
+        except OSError:
+            self._entries.pop(key, None)
+            return None
+        entry.last_access = time.time()
+        return body
+
+    def refresh(self, key: str) -> None:
+        """Ответ подтвержден сервером (304) - продлеваем срок жизни записи"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.fetched_at = entry.last_access = time.time()
+        self._save_index()
+
+    def store(self, key: str, url: str, body: str,
+              etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        self.dirpath.mkdir(parents=True, exist_ok=True)
+        data = body.encode('utf-8')
+        self._body_path(key).write_bytes(data)
+        now = time.time()
+        self._entries[key] = CacheEntry(
+            url=url,
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=now,
+            last_access=now,
+            size=len(data),
+        )
+        self._evict()
+        self._save_index()
+
+    def invalidate(self, url: str, session_token: str) -> None:
+        key = self.make_key(url, session_token)
+        if self._entries.pop(key, None) is not None:
+            self._body_path(key).unlink(missing_ok=True)
+            self._save_index()
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._body_path(key).unlink(missing_ok=True)
+        self._entries.clear()
+        self._save_index()
+
+    def _evict(self) -> None:
+        total = self.total_bytes
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].last_access):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            del self._entries[key]
+            self._body_path(key).unlink(missing_ok=True)
+            self.stats.evictions += 1
+
+
+@lru_cache()
+def get_http_cache() -> HttpCache:
+    """Общий для процесса HTTP-кэш"""
+    return HttpCache()
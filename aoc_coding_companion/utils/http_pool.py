@@ -0,0 +1,131 @@
+import atexit
+import asyncio
+import hashlib
+import weakref
+from typing import Dict, Tuple
+
+import aiohttp
+
+from aoc_coding_companion.utils.http_cache import get_http_cache
+from aoc_coding_companion.utils.parser import ParserConfig, AdventOfCodeParser
+from aoc_coding_companion.utils.constants import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_POOL_DNS_TTL,
+    HTTP_POOL_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_REQUEST_TIMEOUT,
+)
+
+
+class ParserPool:
+    """Общий для процесса реестр HTTP-клиентов AdventOfCodeParser.
+
+    На каждый токен сессии заводится одна aiohttp.ClientSession с keep-alive пулом соединений
+    и кэшем DNS, поэтому узлы графа не открывают новое TCP+TLS соединение на каждом шаге.
+    """
+
+    def __init__(self,
+                 limit: int = HTTP_POOL_LIMIT,
+                 limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_ttl: int = HTTP_POOL_DNS_TTL,
+                 keepalive_timeout: float = HTTP_POOL_KEEPALIVE_TIMEOUT,
+                 request_timeout: float = HTTP_POOL_REQUEST_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        # Ключ - хэш адреса сайта и токена сессии, значение - (цикл событий, парсер)
+        self._parsers: Dict[str, Tuple[asyncio.AbstractEventLoop, AdventOfCodeParser]] = {}
+        # Замок на каждый цикл событий: закрытие сессий одного запуска не трогает замок, который держит другой
+        self._locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _make_key(config: ParserConfig) -> str:
+        # Токен не храним в открытом виде даже в ключах
+        session_token = str(config.cookies.get('session', ''))
+        return hashlib.sha256(f'{config.base_url}:{session_token}'.encode()).hexdigest()
+
+    def _make_session(self, config: ParserConfig) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=config.headers,
+            cookies=config.cookies,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+        )
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if loop not in self._locks:
+            self._locks[loop] = asyncio.Lock()
+        return self._locks[loop]
+
+    async def get(self, config: ParserConfig) -> AdventOfCodeParser:
+        """Получение общего парсера для токена сессии. Закрывать его не нужно"""
+        loop = asyncio.get_running_loop()
+        key = self._make_key(config)
+        cached = self._parsers.get(key)
+        if cached is not None:
+            cached_loop, parser = cached
+            if cached_loop is loop and not parser.session.closed:
+                return parser
+
+        async with self._get_lock():
+            cached = self._parsers.get(key)
+            if cached is not None:
+                cached_loop, parser = cached
+                if cached_loop is loop and not parser.session.closed:
+                    return parser
+                # Сессия привязана к другому (возможно уже закрытому) циклу событий
+                if cached_loop is loop or cached_loop.is_closed():
+                    await self._close_parser(cached_loop, parser)
+            parser = AdventOfCodeParser(config, session=self._make_session(config), cache=get_http_cache())
+            self._parsers[key] = (loop, parser)
+            return parser
+
+    @staticmethod
+    async def _close_parser(loop: asyncio.AbstractEventLoop, parser: AdventOfCodeParser) -> None:
+        if parser.session is None or parser.session.closed:
+            return
+        if loop is asyncio.get_running_loop():
+            await parser.session.close()
+
+    async def close(self) -> None:
+        """Закрытие всех сессий, созданных в текущем цикле событий"""
+        loop = asyncio.get_running_loop()
+        for key, (parser_loop, parser) in list(self._parsers.items()):
+            if parser_loop is loop or parser_loop.is_closed():
+                await self._close_parser(parser_loop, parser)
+                del self._parsers[key]
+
+    def close_sync(self) -> None:
+        """Закрытие сессий при завершении процесса, если их цикл событий еще жив"""
+        for key, (loop, parser) in list(self._parsers.items()):
+            session = parser.session
+            if session is not None and not session.closed and not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(session.close())
+            del self._parsers[key]
+
+
+_parser_pool = ParserPool()
+atexit.register(_parser_pool.close_sync)
+
+
+def get_parser_pool() -> ParserPool:
+    return _parser_pool
+
+
+async def close_parser_pool() -> None:
+    """Хук корректного завершения работы: закрывает все общие HTTP-сессии.
+
+    Вызывает владелец цикла событий (планировщик, бенчмарки), а не узлы графа:
+    сессии общие для всех запусков в цикле.
+    """
+    await _parser_pool.close()
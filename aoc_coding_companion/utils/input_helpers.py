@@ -0,0 +1,212 @@
+"""Модуль aoc для сгенерированного кода: чтение входных данных через mmap и быстрый разбор.
+
+Рабочий процесс песочницы импортирует модуль заранее и кладет его в глобальные переменные
+запускаемого кода под именем aoc (и в sys.modules, чтобы работал import aoc). Разобранные формы
+кэшируются в процессе по пути, времени изменения и размеру файла, поэтому повторные запуски
+кода той же задачи в этом процессе не разбирают входные данные заново. Из кэша возвращаются
+неизменяемые объекты или копии, чтобы запуск, изменивший результат, не испортил его следующему.
+
+Путь к файлу передается явно: проверка на примерах подменяет путь в коде на файл примера.
+"""
+import os
+import re
+import mmap
+import importlib.util
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aoc_coding_companion.utils.constants import INPUT_HELPERS_CACHE_SIZE
+
+
+# NumPy импортируется только в функциях *_array: модуль импортируется вместе с промптом графа,
+# и импорт NumPy при этом занимал бы время запуска. Без NumPy функции *_array недоступны
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+INT_PATTERN = re.compile(r'-?\d+')
+NODE_PATTERN = r'[A-Za-z0-9_]+'
+
+# Разобранные формы по (вид, путь, время изменения, размер, параметры)
+_cache: 'OrderedDict[tuple, Any]' = OrderedDict()
+_maps: Dict[str, Tuple[tuple, Any]] = {}
+
+
+def _file_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def _cached(kind: str, path: str, parse: Callable[[], Any], *params) -> Any:
+    key = (kind, *_file_key(path), *params)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    value = parse()
+    _cache[key] = value
+    while len(_cache) > INPUT_HELPERS_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return value
+
+
+def data(path: str):
+    """Содержимое файла как mmap только для чтения (bytes-подобный объект). Пустой файл - b''"""
+    key = _file_key(path)
+    mapped = _maps.get(key[0])
+    if mapped is not None and mapped[0] == key:
+        return mapped[1]
+    if mapped is not None and hasattr(mapped[1], 'close'):
+        mapped[1].close()
+    if key[2] == 0:
+        content = b''
+    else:
+        with open(path, 'rb') as file:
+            content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    _maps[key[0]] = (key, content)
+    return content
+
+
+def text(path: str) -> str:
+    """Текст файла без завершающих переводов строки"""
+    return _cached('text', path, lambda: bytes(data(path)).decode('utf-8').rstrip('\n'))
+
+
+def lines(path: str) -> List[str]:
+    return list(_cached('lines', path, lambda: tuple(text(path).splitlines())))
+
+
+def blocks(path: str) -> List[List[str]]:
+    """Блоки строк, разделенные пустой строкой"""
+    parsed = _cached('blocks', path,
+                     lambda: tuple(tuple(block.splitlines()) for block in re.split(r'\n\s*\n', text(path))))
+    return [list(block) for block in parsed]
+
+
+def ints(line: str) -> List[int]:
+    """Все целые числа строки, включая отрицательные"""
+    return [int(value) for value in INT_PATTERN.findall(line)]
+
+
+def int_lines(path: str) -> List[List[int]]:
+    """Целые числа каждой строки файла"""
+    parsed = _cached('int_lines', path, lambda: tuple(tuple(ints(line)) for line in text(path).splitlines()))
+    return [list(row) for row in parsed]
+
+
+class Grid:
+    """Неизменяемая сетка символов: grid[r, c] или grid[(r, c)], вне сетки - None"""
+
+    def __init__(self, rows: Tuple[str, ...]):
+        self.rows = rows
+        self.height = len(rows)
+        self.width = max((len(row) for row in rows), default=0)
+
+    def __getitem__(self, position: Tuple[int, int]) -> Optional[str]:
+        r, c = position
+        if 0 <= r < self.height and 0 <= c < len(self.rows[r]):
+            return self.rows[r][c]
+        return None
+
+    def __contains__(self, position: Tuple[int, int]) -> bool:
+        r, c = position
+        return 0 <= r < self.height and 0 <= c < len(self.rows[r])
+
+    def cells(self) -> Iterator[Tuple[Tuple[int, int], str]]:
+        for r, row in enumerate(self.rows):
+            for c, char in enumerate(row):
+                yield (r, c), char
+
+    def find(self, char: str) -> List[Tuple[int, int]]:
+        return [position for position, value in self.cells() if value == char]
+
+    def neighbors(self, r: int, c: int, diagonal: bool = False) -> List[Tuple[int, int]]:
+        steps = ((-1, 0), (0, 1), (1, 0), (0, -1))
+        if diagonal:
+            steps += ((-1, -1), (-1, 1), (1, 1), (1, -1))
+        return [(r + dr, c + dc) for dr, dc in steps if (r + dr, c + dc) in self]
+
+    def to_lists(self) -> List[List[str]]:
+        """Изменяемая копия: список строк-списков символов"""
+        return [list(row) for row in self.rows]
+
+    def __repr__(self) -> str:
+        return f'Grid(height={self.height}, width={self.width})'
+
+
+def grid(path: str) -> Grid:
+    return _cached('grid', path, lambda: Grid(tuple(text(path).splitlines())))
+
+
+def _numpy():
+    if not HAS_NUMPY:
+        raise ImportError('NumPy is not installed, use aoc.grid(path) instead')
+    import numpy
+    return numpy
+
+
+def grid_array(path: str):
+    """Сетка как массив NumPy символов (dtype '<U1'): grid_array(path) == '#'. Возвращается копия"""
+    np = _numpy()
+
+    def parse():
+        rows = text(path).splitlines()
+        width = max((len(row) for row in rows), default=0)
+        return np.array([row.ljust(width) for row in rows], dtype=f'<U{max(1, width)}') \
+            .view('<U1').reshape(len(rows), max(1, width))
+
+    return _cached('grid_array', path, parse).copy()
+
+
+def digit_grid_array(path: str):
+    """Сетка цифр как целочисленный массив NumPy. Возвращается копия"""
+    np = _numpy()
+
+    def parse():
+        rows = text(path).splitlines()
+        return np.array([[int(char) for char in row] for row in rows], dtype=np.int64)
+
+    return _cached('digit_grid_array', path, parse).copy()
+
+
+def graph(path: str, directed: bool = False, pattern: str = NODE_PATTERN) -> Dict[str, List[str]]:
+    """Граф списками смежности: первое имя в строке - вершина, остальные - ее соседи.
+
+    Подходит для строк вида "a-b", "a: b c d", "a -> b, c" и "AAA = (BBB, CCC)".
+    """
+    def parse():
+        node_pattern = re.compile(pattern)
+        return tuple(tuple(node_pattern.findall(line)) for line in text(path).splitlines())
+
+    adjacency: Dict[str, List[str]] = {}
+    for names in _cached('graph', path, parse, pattern):
+        if not names:
+            continue
+        node, neighbors = names[0], names[1:]
+        adjacency.setdefault(node, [])
+        for neighbor in neighbors:
+            if directed or neighbor not in adjacency[node]:
+                adjacency[node].append(neighbor)
+            reverse = adjacency.setdefault(neighbor, [])
+            # Ребро, записанное в обе стороны ("AAA = (BBB)" и "BBB = (AAA)"), не дублируется
+            if not directed and node not in reverse:
+                reverse.append(node)
+    return adjacency
+
+
+def describe() -> str:
+    """Описание модуля для developer_prompt. Фигурных скобок нет: текст идет в шаблон промпта"""
+    description = (
+        'A helper module `aoc` is already imported in your program (`import aoc` also works). '
+        'It reads the input file through a read-only mmap and caches parsed forms between runs, '
+        'so prefer it to parsing the file by hand. Pass the input file path to it:\n'
+        '- aoc.text(path) -> str, aoc.lines(path) -> list of str, aoc.blocks(path) -> list of line lists '
+        'separated by blank lines, aoc.data(path) -> raw bytes (mmap)\n'
+        '- aoc.ints(line) -> list of all integers in a string, aoc.int_lines(path) -> list of integer lists per line\n'
+        '- aoc.grid(path) -> immutable Grid: grid[r, c] (None outside), grid.height, grid.width, grid.rows, '
+        'grid.cells(), grid.find(char), grid.neighbors(r, c, diagonal=False), grid.to_lists() for a mutable copy\n'
+        '- aoc.graph(path, directed=False) -> adjacency dict from lines like "a-b", "a: b c", "AAA = (BBB, CCC)"'
+    )
+    if HAS_NUMPY:
+        description += (
+            '\n- aoc.grid_array(path) -> NumPy array of characters, aoc.digit_grid_array(path) -> NumPy int array. '
+            'NumPy is available for vectorised grid operations'
+        )
+    return description
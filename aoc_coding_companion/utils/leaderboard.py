@@ -0,0 +1,192 @@
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.parser import AdventOfCodeParser, Leader, LeaderboardResult
+from aoc_coding_companion.utils.constants import LEADERBOARD_SNAPSHOT_DIRPATH
+
+
+class MemberStanding(BaseModel):
+    id: str
+    name: str
+    rank: int
+    local_score: int
+    stars: int
+    last_star_ts: int = 0
+    # Полученные звезды в виде "день.часть", например "6.2"
+    star_keys: List[str] = []
+
+    def __str__(self) -> str:
+        return f"{self.rank}) {self.name} - {self.local_score} очков, {self.stars}⭐"
+
+
+class LeaderboardSnapshot(BaseModel):
+    leaderboard_id: int
+    event: str
+    fetched_at: float
+    members: List[MemberStanding]
+    my_id: Optional[str] = None
+
+    @property
+    def me(self) -> Optional[MemberStanding]:
+        return next((member for member in self.members if member.id == self.my_id), None)
+
+    def to_leaderboard_result(self) -> LeaderboardResult:
+        """Совместимое с разбором HTML представление таблицы"""
+        me = self.me
+        return LeaderboardResult(
+            leaders=[Leader(position=member.rank, name=member.name, points=member.local_score)
+                     for member in self.members],
+            my_position=me.rank if me else None,
+            my_points=me.local_score if me else None,
+        )
+
+
+class MemberDelta(BaseModel):
+    name: str
+    new_stars: List[str] = []
+    score_gained: int = 0
+    rank_before: Optional[int] = None
+    rank_after: int
+
+    def __str__(self) -> str:
+        parts = []
+        if self.new_stars:
+            parts.append(f"+{len(self.new_stars)}⭐ ({', '.join(self.new_stars)})")
+        if self.score_gained:
+            parts.append(f"+{self.score_gained} очков")
+        if self.rank_before is None:
+            parts.append(f"новый участник, место {self.rank_after}")
+        elif self.rank_before != self.rank_after:
+            arrow = '⬆️' if self.rank_after < self.rank_before else '⬇️'
+            parts.append(f"{arrow} {self.rank_before} → {self.rank_after}")
+        return f"{self.name}: {', '.join(parts)}"
+
+
+class LeaderboardDiff(BaseModel):
+    previous_fetched_at: Optional[float] = None
+    deltas: List[MemberDelta] = []
+    left: List[str] = []
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.deltas or self.left)
+
+    def __str__(self) -> str:
+        if self.previous_fetched_at is None:
+            return 'Первый снимок лидерборда, сравнивать не с чем'
+        if not self.has_changes:
+            return 'С прошлой проверки ничего не изменилось'
+        lines = [str(delta) for delta in self.deltas]
+        lines += [f"{name}: покинул лидерборд" for name in self.left]
+        return '\n'.join(lines)
+
+
+def parse_snapshot(raw: dict, leaderboard_id: int, my_name: Optional[str] = None) -> LeaderboardSnapshot:
+    """Снимок лидерборда из JSON сайта. Место - по очкам, при равенстве раньше тот, кто раньше получил звезду"""
+    members = []
+    for member_id, member in raw.get('members', {}).items():
+        star_keys = sorted(
+            (f"{day}.{level}" for day, levels in member.get('completion_day_level', {}).items() for level in levels),
+            key=lambda key: tuple(map(int, key.split('.')))
+        )
+        members.append(MemberStanding(
+            id=str(member_id),
+            name=member.get('name') or f"(anonymous user #{member_id})",
+            rank=0,
+            local_score=member.get('local_score', 0),
+            stars=member.get('stars', 0),
+            last_star_ts=member.get('last_star_ts', 0),
+            star_keys=star_keys,
+        ))
+    members.sort(key=lambda member: (-member.local_score, member.last_star_ts or float('inf'), member.id))
+    for rank, member in enumerate(members, start=1):
+        member.rank = rank
+
+    my_id = None
+    if my_name:
+        my_id = next((member.id for member in members if member.name.lower() == my_name.lower()), None)
+    return LeaderboardSnapshot(
+        leaderboard_id=leaderboard_id,
+        event=str(raw.get('event', '')),
+        fetched_at=time.time(),
+        members=members,
+        my_id=my_id,
+    )
+
+
+def diff_snapshots(previous: Optional[LeaderboardSnapshot], current: LeaderboardSnapshot) -> LeaderboardDiff:
+    """Изменения между двумя снимками: новые звезды, очки и места участников"""
+    if previous is None:
+        return LeaderboardDiff()
+    previous_members: Dict[str, MemberStanding] = {member.id: member for member in previous.members}
+    deltas = []
+    for member in current.members:
+        before = previous_members.pop(member.id, None)
+        if before is None:
+            deltas.append(MemberDelta(name=member.name, new_stars=member.star_keys,
+                                      score_gained=member.local_score, rank_after=member.rank))
+            continue
+        before_stars = set(before.star_keys)
+        new_stars = [key for key in member.star_keys if key not in before_stars]
+        if new_stars or before.rank != member.rank or before.local_score != member.local_score:
+            deltas.append(MemberDelta(
+                name=member.name,
+                new_stars=new_stars,
+                score_gained=member.local_score - before.local_score,
+                rank_before=before.rank,
+                rank_after=member.rank,
+            ))
+    deltas.sort(key=lambda delta: delta.rank_after)
+    return LeaderboardDiff(
+        previous_fetched_at=previous.fetched_at,
+        deltas=deltas,
+        left=[member.name for member in previous_members.values()],
+    )
+
+
+class LeaderboardClient:
+    """Клиент приватного лидерборда через JSON сайта.
+
+    JSON запрашивается не чаще раза в 15 минут (HTTP-кэш парсера), а последний снимок
+    хранится на диске, чтобы каждая проверка сообщала только изменения с прошлой.
+    """
+
+    def __init__(self, parser: AdventOfCodeParser, leaderboard_id: int,
+                 dirpath: Path = LEADERBOARD_SNAPSHOT_DIRPATH):
+        self.parser = parser
+        self.leaderboard_id = leaderboard_id
+        self.snapshot_path = Path(dirpath) / f'{parser.year}-{leaderboard_id}.json'
+
+    def load_snapshot(self) -> Optional[LeaderboardSnapshot]:
+        try:
+            return LeaderboardSnapshot.model_validate_json(self.snapshot_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def save_snapshot(self, snapshot: LeaderboardSnapshot) -> None:
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix('.tmp')
+        tmp_path.write_text(snapshot.model_dump_json(), encoding='utf-8')
+        tmp_path.replace(self.snapshot_path)
+
+    async def fetch(self) -> LeaderboardSnapshot:
+        raw = await self.parser.fetch_leaderboard_json(self.leaderboard_id)
+        try:
+            my_name = await self.parser.parse_user_name()
+        except Exception:
+            my_name = None
+        return parse_snapshot(raw, self.leaderboard_id, my_name)
+
+    async def update(self) -> Tuple[LeaderboardSnapshot, LeaderboardDiff]:
+        """Свежий снимок и его отличия от предыдущего сохраненного"""
+        previous = self.load_snapshot()
+        current = await self.fetch()
+        # Имя в шапке сайта может не совпасть (например, сменилось), тогда берем прошлое определение
+        if current.my_id is None and previous is not None:
+            current.my_id = previous.my_id
+        diff = diff_snapshots(previous, current)
+        self.save_snapshot(current)
+        return current, diff
@@ -0,0 +1,159 @@
+"""Библиотека решенных задач с поиском похожих по условию.
+
+После верного ответа условие, итоговый код, время работы и число попыток дописываются в JSONL-файл.
+Похожие задачи ищутся по TF-IDF условий с косинусной близостью: индекс строится в памяти
+при первом поиске после изменения библиотеки, на сотнях задач построение и поиск занимают миллисекунды.
+"""
+import re
+import json
+import math
+import time
+from pathlib import Path
+from functools import lru_cache
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.constants import (
+    SOLUTION_LIBRARY_FILEPATH,
+    SOLUTION_LIBRARY_MIN_SIMILARITY,
+    SOLUTION_LIBRARY_CODE_LIMIT
+)
+
+
+TOKEN_PATTERN = re.compile(r'[a-z][a-z0-9_]+')
+
+
+class LibraryEntry(BaseModel):
+    day_url: str
+    name: str
+    level: int
+    description: str
+    question: str = ''
+    code: str
+    # Время работы итогового кода, секунды
+    runtime: float = 0.0
+    # Сколько раз запускался код и сколько ответов было дано до верного
+    code_runs: int = 0
+    answers: int = 0
+    created_at: float = 0.0
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.day_url, self.level
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+class SolutionLibrary:
+    """Решенные задачи по (day_url, level). Повторное решение той же задачи заменяет запись"""
+
+    def __init__(self, filepath: Path = SOLUTION_LIBRARY_FILEPATH):
+        self.filepath = Path(filepath)
+        self._entries: Optional[Dict[Tuple[str, int], LibraryEntry]] = None
+        # Частоты термов условий считаются один раз на запись, после добавления пересчитываются только веса
+        self._term_counts: Dict[Tuple[str, int], Counter] = {}
+        # Индекс: idf термов и нормированные векторы условий
+        self._idf: Dict[str, float] = {}
+        self._vectors: List[Tuple[LibraryEntry, Dict[str, float]]] = []
+        self._index_dirty = True
+
+    @property
+    def entries(self) -> Dict[Tuple[str, int], LibraryEntry]:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                lines = self.filepath.read_text(encoding='utf-8').splitlines()
+            except FileNotFoundError:
+                lines = []
+            for line in lines:
+                try:
+                    entry = LibraryEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                self._entries[entry.key] = entry
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: LibraryEntry) -> None:
+        if not entry.created_at:
+            entry = entry.model_copy(update={'created_at': time.time()})
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.filepath, 'a', encoding='utf-8') as file:
+            file.write(entry.model_dump_json() + '\n')
+        self.entries[entry.key] = entry
+        self._term_counts.pop(entry.key, None)
+        self._index_dirty = True
+
+    def build_index(self) -> None:
+        entries = list(self.entries.values())
+        for entry in entries:
+            if entry.key not in self._term_counts:
+                self._term_counts[entry.key] = Counter(tokenize(entry.description))
+        counts = [self._term_counts[entry.key] for entry in entries]
+        document_frequency = Counter(term for count in counts for term in count)
+        total = len(entries)
+        self._idf = {term: math.log((1 + total) / (1 + frequency)) + 1
+                     for term, frequency in document_frequency.items()}
+        self._vectors = [
+            (entry, _normalize({term: (1 + math.log(tf)) * self._idf[term] for term, tf in count.items()}))
+            for entry, count in zip(entries, counts)
+        ]
+        self._index_dirty = False
+
+    def search(self, text: str, top_k: int, exclude: Optional[Tuple[str, int]] = None,
+               min_similarity: float = SOLUTION_LIBRARY_MIN_SIMILARITY) -> List[Tuple[float, LibraryEntry]]:
+        """top_k самых похожих решенных задач с косинусной близостью не меньше min_similarity"""
+        if top_k <= 0 or not self.entries:
+            return []
+        if self._index_dirty:
+            self.build_index()
+        query = _normalize({term: (1 + math.log(tf)) * self._idf[term]
+                            for term, tf in Counter(tokenize(text)).items() if term in self._idf})
+        if not query:
+            return []
+        scored = []
+        for entry, vector in self._vectors:
+            if entry.key == exclude:
+                continue
+            # Перебор по меньшему вектору
+            small, large = (query, vector) if len(query) < len(vector) else (vector, query)
+            similarity = sum(weight * large.get(term, 0.0) for term, weight in small.items())
+            if similarity >= min_similarity:
+                scored.append((similarity, entry))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:top_k]
+
+
+def format_similar_solutions(results: List[Tuple[float, LibraryEntry]],
+                             code_limit: int = SOLUTION_LIBRARY_CODE_LIMIT) -> str:
+    """Текст для developer_prompt. Пустая строка, если похожих задач нет"""
+    if not results:
+        return ''
+    blocks = []
+    for similarity, entry in results:
+        code = entry.code if len(entry.code) <= code_limit else entry.code[:code_limit] + '\n# ... (truncated)'
+        blocks.append(
+            f'<similar_solution puzzle="{entry.name}" part="{entry.level}" similarity="{similarity:.2f}">\n'
+            f'```python\n{code}\n```\n'
+            f'</similar_solution>'
+        )
+    return (
+        '\n\nSolutions of similar puzzles you solved before. They are correct for their own puzzles only, '
+        'reuse the parsing and the approach where they fit:\n' + '\n'.join(blocks)
+    )
+
+
+@lru_cache()
+def get_solution_library() -> SolutionLibrary:
+    return SolutionLibrary()
@@ -0,0 +1,213 @@
+"""Кэш ответов модели по точному совпадению запроса.
+
+Повторный запуск потока (продолжение с контрольной точки после падения, воспроизведение в бенчмарке)
+вызывает модель с теми же сообщениями. Ключ - имя модели, сериализованные сообщения developer_prompt
+без идентификаторов и метаданных ответов и строка параметров модели LangChain, в которую входят
+привязанные инструменты (PythonREPL, TaskAnswer) и tool_choice. Ответы хранятся в SQLite
+со временем жизни и вытеснением давно использованных.
+
+chain.ainvoke обращается к кэшу сам через BaseChatModel.cache. Потоковый ответ (astream) LangChain
+мимо кэша, поэтому stream_tool_calls ищет и сохраняет ответ по тому же ключу через resolve_chain_cache.
+"""
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+from pydantic import BaseModel
+from langchain_core.load import dumps
+from langchain_core.runnables import Runnable, RunnableBinding, RunnableSequence
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.globals import get_llm_cache as get_global_llm_cache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from aoc_coding_companion.utils.constants import LLM_CACHE_FILEPATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+
+
+# Отметка в response_metadata ответа из кэша: его токены не учитываются в трассе
+LLM_CACHE_HIT_KEY = 'llm_cache_hit'
+# Поля сообщений, которые не уходят в модель: идентификаторы сообщений назначает граф заново
+# при каждом запуске, а метаданные ответа содержат отметку кэша и расход токенов
+IGNORED_MESSAGE_FIELDS = ('id', 'response_metadata', 'usage_metadata')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Сериализованные сообщения без полей, не влияющих на ответ модели"""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    for message in messages:
+        kwargs = message.get('kwargs') if isinstance(message, dict) else None
+        if isinstance(kwargs, dict):
+            for field in IGNORED_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+    return json.dumps(messages, ensure_ascii=False, sort_keys=True)
+
+
+class LLMCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Статистика кэша модели(попадания={self.hits}, промахи={self.misses}, "
+            f"записи={self.writes}, вытеснения={self.evictions})"
+        )
+
+
+class SQLiteLLMCache(BaseCache):
+    """Кэш ответов модели в SQLite. Имя модели (namespace) входит в ключ, поэтому модели делят один файл.
+
+    Запись старше ttl не возвращается и удаляется при следующей записи. Сверх max_entries
+    удаляются записи с самым давним обращением.
+    """
+
+    def __init__(self, filepath: Path = LLM_CACHE_FILEPATH, namespace: str = '',
+                 ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.filepath = Path(filepath)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = LLMCacheStats()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Соединение на одну операцию: alookup и aupdate BaseCache выполняются в потоках пула"""
+        if not self._initialized:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.filepath, timeout=30)
+        try:
+            with connection:
+                if not self._initialized:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.execute(
+                        'CREATE TABLE IF NOT EXISTS llm_cache ('
+                        'key TEXT PRIMARY KEY, namespace TEXT NOT NULL, llm_string TEXT NOT NULL, '
+                        'generations TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+                    )
+                    connection.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)')
+                    self._initialized = True
+                yield connection
+        finally:
+            connection.close()
+
+    def make_key(self, prompt: str, llm_string: str) -> str:
+        prompt = normalize_prompt(prompt)
+        return hashlib.sha256(f'{self.namespace}\x00{llm_string}\x00{prompt}'.encode()).hexdigest()
+
+    @staticmethod
+    def _dumps(generations: RETURN_VAL_TYPE) -> str:
+        items = []
+        for generation in generations:
+            item = {'text': generation.text, 'generation_info': generation.generation_info}
+            if isinstance(generation, ChatGeneration):
+                item['message'] = message_to_dict(generation.message)
+            items.append(item)
+        return json.dumps(items, ensure_ascii=False)
+
+    @staticmethod
+    def _loads(data: str) -> RETURN_VAL_TYPE:
+        generations = []
+        for item in json.loads(data):
+            if 'message' not in item:
+                generations.append(Generation(text=item['text'], generation_info=item['generation_info']))
+                continue
+            message = messages_from_dict([item['message']])[0]
+            # Без идентификатора add_messages добавит ответ новым сообщением, а не заменит прошлый с тем же id
+            message.id = None
+            message.response_metadata = {**message.response_metadata, LLM_CACHE_HIT_KEY: True}
+            generations.append(ChatGeneration(message=message, generation_info=item['generation_info']))
+        return generations
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute('SELECT generations, created_at FROM llm_cache WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                row = None
+            if row is not None:
+                connection.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return self._loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)',
+                (self.make_key(prompt, llm_string), self.namespace, llm_string, self._dumps(return_val), now, now)
+            )
+            self.stats.evictions += self._evict(connection, now)
+        self.stats.writes += 1
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> int:
+        evicted = 0
+        if self.ttl:
+            evicted += connection.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,)).rowcount
+        evicted += connection.execute(
+            'DELETE FROM llm_cache WHERE key IN '
+            '(SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        return evicted
+
+    def clear(self, **kwargs) -> None:
+        with self._connect() as connection:
+            connection.execute('DELETE FROM llm_cache WHERE namespace = ?', (self.namespace,))
+
+
+def _make_sqlite_llm_cache(model_name: str) -> BaseCache:
+    return SQLiteLLMCache(namespace=model_name)
+
+
+_llm_cache_factory: Callable[[str], BaseCache] = _make_sqlite_llm_cache
+
+
+def set_llm_cache_factory(factory: Callable[[str], BaseCache]) -> None:
+    """Замена кэша ответов (например, на общий для нескольких машин). Фабрика получает имя модели"""
+    global _llm_cache_factory
+    _llm_cache_factory = factory
+    get_llm_cache.cache_clear()
+
+
+@lru_cache()
+def get_llm_cache(model_name: str) -> BaseCache:
+    return _llm_cache_factory(model_name)
+
+
+async def resolve_chain_cache(chain: Runnable, chain_input: dict) -> Optional[Tuple[BaseCache, str, str]]:
+    """Кэш и ключ (prompt, llm_string), по которым искал бы ответ chain.ainvoke.
+
+    Поддерживается цепочка "промпт | модель с привязанными инструментами", для других цепочек
+    и для модели без кэша - None.
+    """
+    if not isinstance(chain, RunnableSequence) or len(chain.steps) != 2:
+        return None
+    prompt, model = chain.steps
+    kwargs = {}
+    if isinstance(model, RunnableBinding):
+        model, kwargs = model.bound, model.kwargs
+    if not isinstance(model, BaseChatModel) or model.cache is False:
+        return None
+    cache = model.cache if isinstance(model.cache, BaseCache) else get_global_llm_cache()
+    if cache is None:
+        return None
+    prompt_value = await prompt.ainvoke(chain_input)
+    return cache, dumps(prompt_value.to_messages()), model._get_llm_string(**kwargs)
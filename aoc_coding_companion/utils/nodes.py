@@ -1,20 +1,47 @@
+import asyncio
 from pathlib import Path
+from typing import Dict, Optional
 from datetime import datetime
 
-from langchain_core.messages import ToolMessage
+from langgraph.types import Send
+from langchain_core.messages import AIMessage, RemoveMessage, ToolMessage
+from langgraph.graph.state import CompiledStateGraph
 from langchain_core.runnables.config import RunnableConfig
 
-from aoc_coding_companion.utils.state import AOCState
+from aoc_coding_companion.utils.state import AOCState, CodeRun, PuzzleResult
 from aoc_coding_companion.utils.prompts import developer_prompt
+from aoc_coding_companion.utils.http_cache import get_http_cache
+from aoc_coding_companion.utils.prefetch import get_puzzle_prefetcher
+from aoc_coding_companion.utils.leaderboard import LeaderboardClient
+from aoc_coding_companion.utils.tracing import trace_span, record_llm_usage, finish_run_trace
+from aoc_coding_companion.utils.concurrency import get_solving_semaphore
+from aoc_coding_companion.utils.compaction import compact_messages_for_prompt
+from aoc_coding_companion.utils.library import LibraryEntry, get_solution_library, format_similar_solutions
+from aoc_coding_companion.utils.streaming import stream_tool_calls, get_speculative_runs
+from aoc_coding_companion.utils.submission import get_submission_scheduler, SubmissionDeadlineExceeded
 from aoc_coding_companion.utils.models import PythonREPL, TaskAnswer
-from aoc_coding_companion.utils.tools import run_python_code_with_timeout, ExecTimeoutException
+from aoc_coding_companion.utils.execution import execute_code, ExecOutcome
+from aoc_coding_companion.utils.examples import check_examples, ExampleCheck
+from aoc_coding_companion.utils.voting import vote_outcomes, extract_answer, make_answer_message, describe_disagreement
 from aoc_coding_companion.utils.constants import DEFAULT_ATTEMPT_COUNT, DEFAULT_TIMEOUT_EXEC_CODE
 from aoc_coding_companion.utils.utils import (
     get_model_by_config,
     get_logger_by_config,
-    get_parser_by_config,
+    borrow_parser_by_config,
     get_leaderboard_id_by_config,
-    send_telegram_message_by_config
+    get_max_concurrent_puzzles_by_config,
+    get_submit_deadline_by_config,
+    get_prompt_token_budget_by_config,
+    get_self_consistency_samples_by_config,
+    get_self_consistency_min_agreement_by_config,
+    get_verify_examples_by_config,
+    get_prefetch_count_by_config,
+    get_thread_id_by_config,
+    get_streaming_by_config,
+    get_solution_library_top_k_by_config,
+    get_exec_soft_timeout_by_config,
+    send_telegram_message_by_config,
+    flush_telegram_messages_by_config
 )
 
 
@@ -34,13 +61,15 @@ async def check_leader_board(_, config: RunnableConfig):
     leaderboard_id = get_leaderboard_id_by_config(config)
     logger.debug(f'Получен id лидерборда {leaderboard_id}')
     try:
-        async with get_parser_by_config(config) as parser:
-            logger.debug('Создан объект парсера')
-            leaderboard_result = await parser.parse_leaderboard(leaderboard_id)
+        parser = await borrow_parser_by_config(config)
+        logger.debug('Получен объект парсера из пула')
+        snapshot, diff = await LeaderboardClient(parser, leaderboard_id).update()
+        leaderboard_result = snapshot.to_leaderboard_result()
         logger.debug(f'Результат проверки лидерборда: {leaderboard_result}')
         comment = (
             f'<ПРОВЕРКА ЛИДЕРБОРДА>: '
-            f'Твое место - {leaderboard_result.my_position} с очками - {leaderboard_result.my_points}'
+            f'Твое место - {leaderboard_result.my_position} с очками - {leaderboard_result.my_points}\n'
+            f'Изменения:\n{diff}'
         )
     except Exception as e:
         comment = f'Не удалось получить результат проверки лидерборда: {e}'
@@ -53,9 +82,9 @@ check_leader_board.__name__ = 'Проверка списка лидеров 📊
 async def search_unsolved_puzzles(_, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход узла поиска нерешенных задач')
-    async with get_parser_by_config(config) as parser:
-        logger.debug('Создан объект парсера')
-        calendar = await parser.parse_calendar()
+    parser = await borrow_parser_by_config(config)
+    logger.debug('Получен объект парсера из пула')
+    calendar = await parser.parse_calendar()
     logger.debug(calendar)
     comment = (
         f'Количество нерешенных задач: {len(calendar.released.unsolved)} '
@@ -64,6 +93,7 @@ async def search_unsolved_puzzles(_, config: RunnableConfig):
     send_telegram_message_by_config(comment, config)
     todo_puzzle_links = list(calendar.released.partially_solved.values()) + list(calendar.released.unsolved.values())
     logger.debug(f'Задачи для обработки {todo_puzzle_links}')
+    get_puzzle_prefetcher().schedule(parser, todo_puzzle_links[:get_prefetch_count_by_config(config)], get_thread_id_by_config(config))
     return {'todo_puzzle_links': todo_puzzle_links, 'comment': comment}
 
 search_unsolved_puzzles.__name__ = 'Поиск нерешенных задач 🔎'
@@ -83,15 +113,75 @@ async def route_have_puzzles(state: AOCState, config: RunnableConfig):
     return ALL_DONE_ROUTE_NAME
 
 
+SOLVE_PUZZLE_NODE_NAME = 'Решение задачи 🧩'
+
+
+async def route_dispatch_puzzles(state: AOCState, config: RunnableConfig):
+    logger = get_logger_by_config(config)
+    logger.debug('Вход распределения задач по параллельным решателям')
+    todo_puzzle_links = state.get("todo_puzzle_links", [])
+    logger.debug(f'Задачи для обработки {todo_puzzle_links}')
+    if len(todo_puzzle_links) == 0:
+        return ALL_DONE_ROUTE_NAME
+    # Каждая задача решается в своем подграфе со своей историей сообщений
+    return [Send(SOLVE_PUZZLE_NODE_NAME, {'todo_puzzle_links': [link]}) for link in todo_puzzle_links]
+
+
+def make_solve_puzzle(puzzle_graph: CompiledStateGraph):
+    """Создание узла, решающего одну задачу в подграфе с ограничением параллельности"""
+
+    async def solve_puzzle(state: AOCState, config: RunnableConfig):
+        logger = get_logger_by_config(config)
+        logger.debug('Вход узла решения задачи')
+        todo_puzzle_link = state['todo_puzzle_links'][0]
+        limit = get_max_concurrent_puzzles_by_config(config)
+        async with get_solving_semaphore(limit):
+            logger.debug(f'Начато решение задачи {todo_puzzle_link}')
+            try:
+                final_state = await puzzle_graph.ainvoke(
+                    {'todo_puzzle_links': [todo_puzzle_link], 'messages': []},
+                    config
+                )
+            except Exception as e:
+                comment = f'Не удалось решить задачу {todo_puzzle_link}: {e}'
+                logger.error(comment)
+                return {'puzzle_results': [PuzzleResult(day_url=todo_puzzle_link, comment=comment)]}
+
+        current_puzzle_details = final_state['current_puzzle_details']
+        messages = final_state.get('messages', [])
+        # Как и в route_answer_correctness: ToolMessage в конце означает, что верный ответ не найден
+        is_correct = len(messages) > 0 and not isinstance(messages[-1], ToolMessage)
+        result = PuzzleResult(
+            day_url=todo_puzzle_link,
+            name=current_puzzle_details.name,
+            level=current_puzzle_details.level,
+            is_correct=is_correct,
+            tokens_saved=final_state.get('tokens_saved', 0),
+            comment=final_state.get('comment', ''),
+        )
+        logger.debug(str(result))
+        return {'puzzle_results': [result]}
+
+    solve_puzzle.__name__ = SOLVE_PUZZLE_NODE_NAME
+    return solve_puzzle
+
+
 async def get_puzzle(state: AOCState, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход узла распознавания задачи и условий')
     todo_puzzle_links = state['todo_puzzle_links']
     todo_puzzle_link = todo_puzzle_links.pop(0)
     logger.debug(f'Взята ссылка на задачу: {todo_puzzle_link}')
-    async with get_parser_by_config(config) as parser:
-        logger.debug('Создан объект парсера')
+    parser = await borrow_parser_by_config(config)
+    logger.debug('Получен объект парсера из пула')
+    prefetcher = get_puzzle_prefetcher()
+    current_puzzle_details = await prefetcher.get_details(parser, todo_puzzle_link)
+    if current_puzzle_details is None:
         current_puzzle_details = await parser.parse_puzzle_details(todo_puzzle_link)
+    else:
+        logger.debug('Условие задачи взято из предзагрузки')
+    # Следующие задачи скачиваются в фоне, пока модель решает текущую
+    prefetcher.schedule(parser, todo_puzzle_links[:get_prefetch_count_by_config(config)], get_thread_id_by_config(config))
     comment = (f'Взято в работу:\n{current_puzzle_details}')
     logger.debug(comment)
     send_telegram_message_by_config(comment, config)
@@ -99,7 +189,12 @@ async def get_puzzle(state: AOCState, config: RunnableConfig):
         'todo_puzzle_links': todo_puzzle_links,
         'current_puzzle_details': current_puzzle_details,
         'comment': comment,
-        'messages': [],
+        # История прошлой задачи удаляется: сообщения в состоянии накапливаются редьюсером
+        'messages': [RemoveMessage(id=message.id) for message in state.get('messages', [])],
+        'candidate_messages': [],
+        'tokens_saved': 0,
+        'code_runs': {},
+        'refused_answer_ids': [],
     }
 
 get_puzzle.__name__ = 'Взятие задачи 👀'
@@ -116,9 +211,14 @@ async def download_input(state: AOCState, config: RunnableConfig):
     logger.debug(f'Текущая задача: {current_puzzle_details}')
     input_filepath = working_dir / f'INPUT({current_puzzle_details.name}).txt'
     logger.debug(f'Путь до файла {input_filepath}')
-    async with get_parser_by_config(config) as parser:
-        logger.debug('Создан объект парсера')
+    parser = await borrow_parser_by_config(config)
+    logger.debug('Получен объект парсера из пула')
+    content = await get_puzzle_prefetcher().get_input(parser, current_puzzle_details.day_url)
+    if content is None:
         await parser.download_input(current_puzzle_details.input_link, input_filepath)
+    else:
+        logger.debug('Входные данные взяты из предзагрузки')
+        parser.save_input(content, input_filepath)
     comment = (f'Скачены входные данные в файл {input_filepath}')
     logger.debug(comment)
     send_telegram_message_by_config(comment, config)
@@ -140,58 +240,255 @@ async def write_code(state: AOCState, config: RunnableConfig):
         tool_choice = True
     chain = developer_prompt | llm.bind_tools([PythonREPL, TaskAnswer], tool_choice=tool_choice)
 
-    result = await chain.ainvoke(
-        {
-            'input_filepath': state['input_filepath'],
-            'task_description': state['current_puzzle_details'].description,
-            'question': state['current_puzzle_details'].question,
-            'messages': messages
-        }
+    # Решения похожих задач из библиотеки: готовый разбор входных данных и подход сокращают число попыток
+    current_puzzle_details = state['current_puzzle_details']
+    async with trace_span('library', 'search'):
+        similar = get_solution_library().search(
+            current_puzzle_details.description,
+            get_solution_library_top_k_by_config(config),
+            exclude=(current_puzzle_details.day_url, current_puzzle_details.level)
+        )
+    logger.debug(f'Найдено похожих решенных задач: {len(similar)}')
+    similar_solutions = format_similar_solutions(similar)
+
+    # В модель уходит сжатая копия истории, в состоянии остается полная
+    prompt_messages, compaction_stats = compact_messages_for_prompt(
+        messages,
+        current_puzzle_details.description,
+        current_puzzle_details.question,
+        similar_solutions,
+        token_budget=get_prompt_token_budget_by_config(config)
     )
+    logger.debug(compaction_stats)
+    tokens_saved = state.get('tokens_saved', 0) + compaction_stats.tokens_saved
+
+    chain_input = {
+        'input_filepath': state['input_filepath'],
+        'task_description': current_puzzle_details.description,
+        'question': current_puzzle_details.question,
+        'similar_solutions': similar_solutions,
+        'messages': prompt_messages
+    }
+
+    samples = get_self_consistency_samples_by_config(config)
+    # Варианты пишутся только на первом шаге части задачи. Если они не сошлись, дальше модель работает
+    # обычной цепочкой: видит разбор расхождения и может сама дать ответ, иначе варианты писались бы без конца
+    if samples > 1 and len(messages) == 0:
+        # Режим самосогласованности: несколько независимых решений, ответ выберет голосование после запуска.
+        # Запросы одинаковые, поэтому кэш ответов модели вернул бы один и тот же вариант
+        sampling_llm = get_model_by_config(config, cached=False)
+        sampling_chain = developer_prompt | sampling_llm.bind_tools([PythonREPL], tool_choice=PythonREPL.__name__)
+        async with trace_span('llm', 'abatch'):
+            results = await sampling_chain.abatch([chain_input] * samples, return_exceptions=True)
+            record_llm_usage(*[result for result in results if isinstance(result, AIMessage)])
+        candidate_messages = [result for result in results
+                              if isinstance(result, AIMessage) and len(result.tool_calls) > 0]
+        logger.debug(f'Получено вариантов решения: {len(candidate_messages)} из {samples}')
+        if len(candidate_messages) > 0:
+            comment = f'Написано вариантов решения: {len(candidate_messages)}'
+            send_telegram_message_by_config(comment, config)
+            return {'candidate_messages': candidate_messages, 'comment': comment, 'tokens_saved': tokens_saved}
+
+    if get_streaming_by_config(config):
+        # Код запускается, как только готовы аргументы вызова, не дожидаясь конца ответа
+        def dispatch(tool_call: dict) -> None:
+            if tool_call['name'] == PythonREPL.__name__ and tool_call['id']:
+                get_speculative_runs().start(tool_call['id'],
+                                             _exec_checked_code(tool_call['args']['query'], state, config),
+                                             get_thread_id_by_config(config))
+                send_telegram_message_by_config('Код готов, запуск до окончания ответа модели', config)
+
+        async with trace_span('llm', 'astream'):
+            result = await stream_tool_calls(
+                chain,
+                chain_input,
+                on_tool_call=dispatch,
+                on_progress=lambda progress: send_telegram_message_by_config(progress, config)
+            )
+            record_llm_usage(result)
+    else:
+        async with trace_span('llm', 'ainvoke'):
+            result = await chain.ainvoke(chain_input)
+            record_llm_usage(result)
     logger.debug(f'Результат вызова функции:\n{repr(result)[:100]}')
-    messages.append(result)
 
-    if result.tool_calls[0]['name'] == PythonREPL.__name__:
-        code = result.tool_calls[0]['args']['query']
+    code_calls = [tool_call for tool_call in result.tool_calls if tool_call['name'] == PythonREPL.__name__]
+    if len(code_calls) > 1:
+        code = code_calls[0]['args']['query']
+        comment = f'Написано программ: {len(code_calls)}, первая:\n\n{code[:100]}\n...\n'
+    elif code_calls:
+        code = code_calls[0]['args']['query']
         comment = f'Написан код:\n\n{code[:100]}\n...\n'
     else:
         answer = result.tool_calls[0]['args']['answer']
         comment = f'Дан финальный ответ на задачу: {answer}'
     logger.debug(comment)
     send_telegram_message_by_config(comment, config)
-    return {'messages': messages, 'comment': comment}
+    return {'messages': [result], 'comment': comment, 'tokens_saved': tokens_saved}
 
 
 write_code.__name__ = 'Программист 👨🏻‍💻'
 
 
+CACHED_OUTPUT_MARK = '[Cached result: this program was already run on the same input]\n'
+
+
+def _all_tool_calls(messages) -> list:
+    """Вызовы инструментов всех сообщений в порядке истории. В одном ответе модели их может быть несколько"""
+    return [tool_call for message in messages for tool_call in getattr(message, 'tool_calls', None) or []]
+
+
+def _ignored_tool_messages(tool_calls: list, reason: str) -> list[ToolMessage]:
+    """Ответы на вызовы, которые не выполнялись: у каждого вызова в истории должен быть ответ инструмента"""
+    return [ToolMessage(content=reason, tool_call_id=tool_call['id']) for tool_call in tool_calls]
+
+
+def _make_code_tool_message(outcome: ExecOutcome, tool_call_id: str, note: str = '') -> ToolMessage:
+    cached_mark = CACHED_OUTPUT_MARK if outcome.cached else ''
+    if outcome.timed_out:
+        content = (f'{cached_mark}The code works for more than {outcome.runtime:.0f} seconds and was stopped. '
+                   'Check, maybe you made a mistake and there is an infinite loop, '
+                   'or the algorithm is too slow for the input size and must be optimised')
+    else:
+        content = f'{cached_mark}{outcome.output}'
+    if outcome.profile:
+        content = f'{content}\n\n{outcome.profile}'
+    if note:
+        content = f'{content}\n\n{note}'
+    return ToolMessage(content=content, tool_call_id=tool_call_id)
+
+
+async def _check_examples(code: str, state: AOCState, config: RunnableConfig) -> ExampleCheck:
+    """Проверка кода на примерах текущей части задачи, если она включена в конфигурации"""
+    if not get_verify_examples_by_config(config):
+        return ExampleCheck()
+    return await check_examples(code, state.get('input_filepath'), state['current_puzzle_details'].current_examples)
+
+
+async def _exec_checked_code(code: str, state: AOCState, config: RunnableConfig):
+    """Проверка кода на примерах и запуск на настоящих входных данных.
+
+    Пример и ответ на него извлекаются из условия эвристически, поэтому непройденная проверка
+    не отменяет запуск: ее разбор уходит модели вместе с результатом на настоящих данных.
+    """
+    check, outcome = await asyncio.gather(
+        _check_examples(code, state, config),
+        execute_code(code, state.get('input_filepath'), DEFAULT_TIMEOUT_EXEC_CODE,
+                     soft_timeout=get_exec_soft_timeout_by_config(config))
+    )
+    return check, outcome
+
+
+def _make_code_run(check: ExampleCheck, outcome: ExecOutcome) -> CodeRun:
+    return CodeRun(answer=extract_answer(outcome), examples_passed=check.passed, runtime=outcome.runtime)
+
+
+async def _exec_candidates(state: AOCState, config: RunnableConfig):
+    """Параллельный запуск вариантов решения и голосование по их ответам"""
+    logger = get_logger_by_config(config)
+    candidate_messages = state['candidate_messages']
+    checks, outcomes = zip(*await asyncio.gather(*[
+        _exec_checked_code(message.tool_calls[0]['args']['query'], state, config)
+        for message in candidate_messages
+    ]))
+    outcomes = list(outcomes)
+    # Варианты, не прошедшие примеры, считаются упавшими и не голосуют
+    vote = vote_outcomes([outcome if check.passed is not False else ExecOutcome(output=check.message, error=True)
+                          for check, outcome in zip(checks, outcomes)],
+                         get_self_consistency_min_agreement_by_config(config))
+    logger.debug(vote)
+
+    # В историю попадает один вариант (победивший), чтобы модель видела связный диалог
+    winner_index = vote.winner_index if vote.winner_index is not None else 0
+    winner = candidate_messages[winner_index]
+    tool_call_id = winner.tool_calls[0]['id']
+    examples_note = checks[winner_index].message if checks[winner_index].passed is False else ''
+    ignored = _ignored_tool_messages(winner.tool_calls[1:], 'Only the first program of a solution variant was run')
+    if vote.consensus:
+        new_messages = [
+            winner,
+            _make_code_tool_message(outcomes[winner_index], tool_call_id, note=examples_note),
+            *ignored,
+            make_answer_message(vote.answer),
+        ]
+        comment = f'Варианты решения сошлись на ответе "{vote.answer}" ({vote.votes} из {vote.total})'
+    else:
+        new_messages = [
+            winner,
+            _make_code_tool_message(outcomes[winner_index], tool_call_id,
+                                    note='\n\n'.join(filter(None, [examples_note, describe_disagreement(vote)]))),
+            *ignored,
+        ]
+        comment = f'Варианты решения не сошлись: {vote}'
+    logger.debug(comment)
+    send_telegram_message_by_config(comment, config)
+    return {
+        'messages': new_messages,
+        'candidate_messages': [],
+        'code_runs': {**(state.get('code_runs') or {}),
+                      tool_call_id: _make_code_run(checks[winner_index], outcomes[winner_index])},
+        'comment': comment
+    }
+
+
+async def _exec_tool_call(tool_call: dict, state: AOCState, config: RunnableConfig):
+    """Результат вызова PythonREPL: запуск, начатый еще во время ответа модели, или новый"""
+    speculative = await get_speculative_runs().take(tool_call['id'])
+    if speculative is not None:
+        get_logger_by_config(config).debug(f'Код {tool_call["id"]} был запущен еще во время ответа модели')
+        return speculative
+    return await _exec_checked_code(tool_call['args']['query'], state, config)
+
+
+def _describe_exec_result(check: ExampleCheck, outcome: ExecOutcome) -> str:
+    if outcome.timed_out:
+        comment = f'Превышено время ожидания: код остановлен через {outcome.runtime:.0f} секунд'
+    else:
+        comment = f'Результат выполнения кода: "{outcome.output}"'
+    if outcome.cached:
+        comment = f'{comment} (из кэша)'
+    if check.passed is False:
+        comment = f'{comment}\nКод не прошел проверку на примерах из условия ({check.checked} шт.)'
+    return comment
+
+
 async def exec_code(state: AOCState, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход узла запуска кода')
+    if state.get('candidate_messages'):
+        return await _exec_candidates(state, config)
     tool_calls = state["messages"][-1].tool_calls
-    if len(tool_calls) != 1:
-        raise ValueError(f'Вызовов инструмента более 1.\n{tool_calls}')
-    tool_call = tool_calls[0]
-    if tool_call['name'] != PythonREPL.__name__:
-        raise ValueError(f'Вызывают не инструмент по исполнению кода {PythonREPL.__name__}.\n{tool_call}')
-    logger.debug('Получен код для запуска')
-    try:
-        code_output = run_python_code_with_timeout(tool_call['args']['query'], DEFAULT_TIMEOUT_EXEC_CODE).strip(' \n')
-    except ExecTimeoutException:
-        comment = f'Превышено время ожидания {DEFAULT_TIMEOUT_EXEC_CODE} секунд'
-        state['messages'].append(
-            ToolMessage(
-                content='The code works for more than 2 minutes. '
-                        'Check, maybe you made a mistake and there is an infinite loop',
-                tool_call_id=tool_call['id']
-            )
-        )
+    code_calls = [tool_call for tool_call in tool_calls if tool_call['name'] == PythonREPL.__name__]
+    if not code_calls:
+        raise ValueError(f'Вызывают не инструмент по исполнению кода {PythonREPL.__name__}.\n{tool_calls}')
+    logger.debug(f'Получено программ для запуска: {len(code_calls)}')
+    # Программы одного ответа (например, проверка двух гипотез) выполняются в песочнице одновременно
+    results = await asyncio.gather(*[_exec_tool_call(tool_call, state, config) for tool_call in code_calls])
+
+    messages = []
+    comments = []
+    for tool_call, (check, outcome) in zip(code_calls, results):
+        logger.debug(check)
+        messages.append(_make_code_tool_message(outcome, tool_call['id'], note=check.message))
+        comments.append(_describe_exec_result(check, outcome))
+    # Ответ, данный вместе с кодом, не отправляется: модель еще не видела результатов запуска
+    messages.extend(_ignored_tool_messages(
+        [tool_call for tool_call in tool_calls if tool_call['name'] != PythonREPL.__name__],
+        'The answer was not submitted because it was given together with the code. '
+        'Look at the code results first and then give the answer'
+    ))
+
+    code_runs = {**(state.get('code_runs') or {}),
+                 **{tool_call['id']: _make_code_run(check, outcome)
+                    for tool_call, (check, outcome) in zip(code_calls, results)}}
+    if len(comments) == 1:
+        comment = comments[0]
     else:
-        state['messages'].append(ToolMessage(content=code_output, tool_call_id=tool_call['id']))
-        comment = f'Результат выполнения кода: "{code_output}"'
+        comment = f'Запущено программ: {len(comments)}\n' + '\n'.join(
+            f'{index}. {text}' for index, text in enumerate(comments, start=1))
     logger.debug(comment)
     send_telegram_message_by_config(comment, config)
-    return {"messages": state['messages'], 'comment': comment}
+    return {'messages': messages, 'code_runs': code_runs, 'comment': comment}
 
 
 exec_code.__name__ = 'Запуск кода 🚀'
@@ -204,70 +501,148 @@ FIND_ANSWER_ROUTE_NAME = 'Получен финальный ответ'
 async def route_exec_code(state: AOCState, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход выбора следующего узла по запуску кода')
+    if state.get('candidate_messages'):
+        return EXEC_CODE_ROUTE_NAME
     tool_calls = state["messages"][-1].tool_calls
     logger.debug(f'Вызовов инструментов: {tool_calls}')
-    if len(tool_calls) == 1 and tool_calls[0]['name'] == PythonREPL.__name__:
+    if any(tool_call['name'] == PythonREPL.__name__ for tool_call in tool_calls):
         return EXEC_CODE_ROUTE_NAME
     return FIND_ANSWER_ROUTE_NAME
 
 
+WRITE_CODE_ROUTE_NAME = 'Код требует доработки'
+
+
+async def route_code_result(state: AOCState, config: RunnableConfig):
+    logger = get_logger_by_config(config)
+    logger.debug('Вход выбора следующего узла по результату запуска кода')
+    last_message = state['messages'][-1]
+    # Ответ появляется сразу после запуска, только если его выбрало голосование вариантов решения
+    if isinstance(last_message, AIMessage) and any(
+            tool_call['name'] == TaskAnswer.__name__ for tool_call in last_message.tool_calls):
+        return FIND_ANSWER_ROUTE_NAME
+    return WRITE_CODE_ROUTE_NAME
+
+
+def _find_answer_call(code_calls: list, code_runs: Dict[str, CodeRun], answer: str) -> Optional[dict]:
+    """Последний вызов PythonREPL, напечатавший ответ. Если такого нет (ответ посчитан моделью сам),
+    то последний запущенный код"""
+    for tool_call in reversed(code_calls):
+        code_run = code_runs.get(tool_call['id'])
+        if code_run is not None and code_run.answer == answer:
+            return tool_call
+    return code_calls[-1] if code_calls else None
+
+
 async def answer_submit(state: AOCState, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход узла отправки ответа')
 
-    all_tool_call = [message.tool_calls[0] for message in state['messages']
-                            if hasattr(message, 'tool_calls') and
-                            len(message.tool_calls) == 1]
-
+    all_tool_call = _all_tool_calls(state['messages'])
     all_tool_call_answer = [tool_call for tool_call in all_tool_call if tool_call['name'] == TaskAnswer.__name__]
     all_tool_call_code = [tool_call for tool_call in all_tool_call if tool_call['name'] == PythonREPL.__name__]
-    answers = [tool_call['args']['answer'].strip(' \n') for tool_call in all_tool_call_answer]
-    submit_answer = answers.pop(-1)
+    # Отправляется последний ответ. Прочие вызовы того же сообщения тоже получают ответ инструмента
+    answer_tool_call = all_tool_call_answer[-1]
+    ignored = _ignored_tool_messages(
+        [tool_call for tool_call in state['messages'][-1].tool_calls if tool_call['id'] != answer_tool_call['id']],
+        'Only one answer is submitted at a time, this call was ignored'
+    )
+    previous_ids = {tool_call['id'] for tool_call in _all_tool_calls(state['messages'][:-1])}
+    refused_answer_ids = state.get('refused_answer_ids') or []
+    # Отправленные ранее ответы и ответы, отклоненные из-за непройденных примеров
+    answers = [tool_call['args']['answer'].strip(' \n') for tool_call in all_tool_call_answer
+               if tool_call['id'] in previous_ids and tool_call['id'] not in refused_answer_ids]
+    refused_answers = [tool_call['args']['answer'].strip(' \n') for tool_call in all_tool_call_answer
+                       if tool_call['id'] in refused_answer_ids]
+    submit_answer = answer_tool_call['args']['answer'].strip(' \n')
     logger.debug(f'Получен ответ для отправки: {submit_answer}')
+    code_runs = state.get('code_runs') or {}
+    answer_code_call = _find_answer_call(all_tool_call_code, code_runs, submit_answer)
+    answer_code_run = code_runs.get(answer_code_call['id']) if answer_code_call is not None else None
 
     # Если такой ответ ранее был
     if submit_answer in answers:
         comment = f'Данный ответ уже ранее отвечался и был неверным'
         logger.debug(comment)
-        state['messages'].append(
-            ToolMessage(
-                content=f'The answer is incorrect. You have already answered "{submit_answer}" before. '
-                        f'DO NOT REPEAT IT. '
-                        f'Reread the terms carefully and try to find the mistake.',
-                tool_call_id=all_tool_call_answer[-1]['id']
-            )
+        message = ToolMessage(
+            content=f'The answer is incorrect. You have already answered "{submit_answer}" before. '
+                    f'DO NOT REPEAT IT. '
+                    f'Reread the terms carefully and try to find the mistake.',
+            tool_call_id=answer_tool_call['id']
         )
-        return {'messages': state['messages'], 'comment': comment}
+        return {'messages': [message, *ignored], 'comment': comment}
+
+    # Если код, напечатавший ответ, не прошел примеры из условия, ответ, скорее всего, неверный. Но пример
+    # извлекается эвристически и может не подходить к настоящим данным, поэтому повторенный ответ отправляется
+    if (answer_code_run is not None and answer_code_run.examples_passed is False
+            and submit_answer not in refused_answers):
+        comment = f'Ответ "{submit_answer}" не отправлен: код не прошел проверку на примерах'
+        logger.debug(comment)
+        message = ToolMessage(
+            content='The answer was not submitted because the code that printed it fails the examples '
+                    'from the task description. Fix the code and run it again. '
+                    'If you are sure the example does not apply to the real input (for example, it uses '
+                    'other parameters), give the same answer again and it will be submitted.',
+            tool_call_id=answer_tool_call['id']
+        )
+        return {'messages': [message, *ignored], 'comment': comment,
+                'refused_answer_ids': [*refused_answer_ids, answer_tool_call['id']]}
 
     # Отправка ответа
-    async with get_parser_by_config(config) as parser:
-        logger.debug('Создан объект парсера')
-        result = await parser.submit_answer(
-            state['current_puzzle_details'].submit_url,
-            state['current_puzzle_details'].level,
-            submit_answer
+    parser = await borrow_parser_by_config(config)
+    logger.debug('Получен объект парсера из пула')
+    try:
+        # Время отрезка без вложенного HTTP-запроса - ожидание окончания блокировки сайта
+        async with trace_span('submit', 'submission_scheduler'):
+            result = await get_submission_scheduler().submit(
+                parser,
+                state['current_puzzle_details'].submit_url,
+                state['current_puzzle_details'].level,
+                submit_answer,
+                deadline=get_submit_deadline_by_config(config)
+            )
+    except SubmissionDeadlineExceeded as e:
+        comment = f'Ответ "{submit_answer}" не отправлен: {e}'
+        logger.debug(comment)
+        message = ToolMessage(
+            content='The answer could not be submitted because of the site cooldown. '
+                    'Double-check the solution and give the answer again.',
+            tool_call_id=answer_tool_call['id']
         )
+        send_telegram_message_by_config(comment, config)
+        return {'messages': [message, *ignored], 'comment': comment}
     logger.debug(f'Отправка ответа завершена. Результат: {result}')
     # Если ответ верный
     if result.is_correct:
-        final_code = all_tool_call_code[-1]['args']['query']
+        get_puzzle_prefetcher().invalidate(parser, state['current_puzzle_details'].day_url)
+        final_code = answer_code_call['args']['query'] if answer_code_call is not None else ''
+        get_solution_library().add(LibraryEntry(
+            day_url=state['current_puzzle_details'].day_url,
+            name=state['current_puzzle_details'].name,
+            level=state['current_puzzle_details'].level,
+            description=state['current_puzzle_details'].description,
+            question=state['current_puzzle_details'].question,
+            code=final_code,
+            runtime=answer_code_run.runtime if answer_code_run is not None else 0.0,
+            code_runs=len(all_tool_call_code),
+            answers=len(all_tool_call_answer),
+        ))
         comment = f'Ответ "{submit_answer}" верный!\nКОД ДЛЯ РЕШЕНИЯ:\n```python\n{final_code}\n```'
         logger.debug(comment)
+        logger.debug(f'Сжатие контекста сэкономило на задаче {state.get("tokens_saved", 0)} токенов')
         send_telegram_message_by_config(comment, config)
         return {'comment': comment}
 
     # Если ответ неверный
     comment = f'Ответ "{submit_answer}" неверный!\n{result.full_text}'
-    state['messages'].append(
-        ToolMessage(
-            content='The answer is incorrect. '
-                    'There is an error somewhere, read the condition again and rewrite the code',
-            tool_call_id=all_tool_call_answer[-1]['id']
-        )
+    message = ToolMessage(
+        content='The answer is incorrect. '
+                'There is an error somewhere, read the condition again and rewrite the code',
+        tool_call_id=answer_tool_call['id']
     )
     logger.debug(comment)
     send_telegram_message_by_config(comment, config)
-    return {'messages': state['messages'], 'comment': comment}
+    return {'messages': [message, *ignored], 'comment': comment}
 
 
 answer_submit.__name__ = 'Отправка ответа 💌'
@@ -289,10 +664,10 @@ async def route_check_rules_retry(state: AOCState, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход выбора следующего узла по проверки правил перезапуска')
 
-    all_tool_call_answer = [message.tool_calls[0] for message in state['messages']
-                            if hasattr(message, 'tool_calls') and
-                            len(message.tool_calls) == 1 and
-                            message.tool_calls[0]['name'] == TaskAnswer.__name__]
+    # Ответы, отклоненные из-за непройденных примеров, не отправлялись и попытками не считаются
+    refused_answer_ids = state.get('refused_answer_ids') or []
+    all_tool_call_answer = [tool_call for tool_call in _all_tool_calls(state['messages'])
+                            if tool_call['name'] == TaskAnswer.__name__ and tool_call['id'] not in refused_answer_ids]
     logger.debug(f'Всего ответов: {len(all_tool_call_answer)}')
     if len(all_tool_call_answer) >= DEFAULT_ATTEMPT_COUNT:
         return MAX_ATTEMPT_NAME
@@ -339,8 +714,15 @@ async def route_answer_correctness(state: AOCState, config: RunnableConfig):
 async def end_alert(_, config: RunnableConfig):
     logger = get_logger_by_config(config)
     logger.debug('Вход узла оповещение о завершении работы')
+    logger.debug(get_http_cache().stats)
+    get_puzzle_prefetcher().cancel(get_thread_id_by_config(config))
+    get_speculative_runs().cancel(get_thread_id_by_config(config))
+    trace_path = finish_run_trace(config)
+    logger.debug(f'Трасса запуска сохранена в {trace_path}')
     comment = f'Я закончить, начальника!\nВремя {datetime.now()}'
     send_telegram_message_by_config(comment, config)
+    # Общие сессии и оповещатели закрывает владелец цикла событий: в нем могут идти другие запуски
+    await flush_telegram_messages_by_config(config)
     return {'comment': comment}
 
 end_alert.__name__ = 'Оповещение о конце работы 🏁'
@@ -0,0 +1,150 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.constants import (
+    TELEGRAM_QUEUE_SIZE,
+    TELEGRAM_COALESCE_WINDOW,
+    TELEGRAM_MAX_MESSAGE_LENGTH,
+    TELEGRAM_MAX_RETRIES,
+    TELEGRAM_FLUSH_TIMEOUT,
+)
+
+
+MESSAGE_SEPARATOR = '\n\n────────\n\n'
+
+
+class TelegramNotifier:
+    """Асинхронная отправка оповещений в телеграм через фоновую очередь.
+
+    Сообщения, пришедшие за окно склейки, отправляются одним сообщением по одному HTTP-соединению.
+    При переполнении очереди самые старые сообщения отбрасываются, а в следующее уходит сводка.
+    """
+
+    API_URL = 'https://api.telegram.org/bot{token}/sendMessage'
+
+    def __init__(self,
+                 token: str,
+                 chat_id: str,
+                 queue_size: int = TELEGRAM_QUEUE_SIZE,
+                 coalesce_window: float = TELEGRAM_COALESCE_WINDOW,
+                 max_message_length: int = TELEGRAM_MAX_MESSAGE_LENGTH,
+                 max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.url = self.API_URL.format(token=token)
+        self.chat_id = chat_id
+        self.coalesce_window = coalesce_window
+        self.max_message_length = max_message_length
+        self.max_retries = max_retries
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def notify(self, message: str) -> None:
+        """Постановка сообщения в очередь без ожидания"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self, timeout: float = TELEGRAM_FLUSH_TIMEOUT) -> None:
+        """Ожидание отправки всех сообщений из очереди"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            get_logger().error(f'Не удалось отправить все сообщения в телеграм за {timeout} секунд')
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    def _build_batches(self, messages: List[str]) -> List[str]:
+        """Склейка сообщений в пачки, не превышающие лимит телеграма"""
+        if self.dropped:
+            messages = [f'⚠️ Очередь оповещений переполнена, пропущено сообщений: {self.dropped}'] + messages
+            self.dropped = 0
+
+        batches = []
+        current = ''
+        for message in messages:
+            # Слишком длинное сообщение режется на куски
+            chunks = [message[i:i + self.max_message_length]
+                      for i in range(0, max(len(message), 1), self.max_message_length)]
+            for chunk in chunks:
+                candidate = f'{current}{MESSAGE_SEPARATOR}{chunk}' if current else chunk
+                if len(candidate) > self.max_message_length:
+                    batches.append(current)
+                    current = chunk
+                else:
+                    current = candidate
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _send(self, text: str) -> None:
+        for _ in range(self.max_retries):
+            async with self._get_session().post(self.url, json={'chat_id': self.chat_id, 'text': text}) as response:
+                if response.status == 429:
+                    payload = await response.json(content_type=None)
+                    retry_after = payload.get('parameters', {}).get('retry_after', 1)
+                    get_logger().debug(f'Телеграм ограничил частоту отправки, ждем {retry_after} секунд')
+                    await asyncio.sleep(retry_after)
+                    continue
+                response.raise_for_status()
+                return
+        raise RuntimeError(f'Телеграм не принял сообщение после {self.max_retries} попыток')
+
+    async def _run(self) -> None:
+        while True:
+            messages = [await self._queue.get()]
+            # Ждем окно склейки, чтобы собрать всплеск сообщений (например, цикл программист - запуск кода)
+            await asyncio.sleep(self.coalesce_window)
+            while not self._queue.empty():
+                messages.append(self._queue.get_nowait())
+            try:
+                for batch in self._build_batches(messages):
+                    await self._send(batch)
+            except Exception as e:
+                get_logger().error(f'Ошибка отправки сообщения в телеграм: {e}')
+            finally:
+                for _ in messages:
+                    self._queue.task_done()
+
+
+# Очередь и HTTP-сессия привязаны к циклу событий
+_notifiers: Dict[Tuple[int, str, str], TelegramNotifier] = {}
+
+
+def get_telegram_notifier(token: str, chat_id: str) -> TelegramNotifier:
+    key = (id(asyncio.get_running_loop()), token, str(chat_id))
+    if key not in _notifiers:
+        _notifiers[key] = TelegramNotifier(token, chat_id)
+    return _notifiers[key]
+
+
+async def flush_telegram_notifiers() -> None:
+    """Ожидание отправки всех оповещений текущего цикла событий"""
+    loop_id = id(asyncio.get_running_loop())
+    await asyncio.gather(*[notifier.flush() for key, notifier in _notifiers.items() if key[0] == loop_id])
+
+
+async def close_telegram_notifiers() -> None:
+    """Отправка оставшихся оповещений текущего цикла событий и закрытие их HTTP-сессий"""
+    loop_id = id(asyncio.get_running_loop())
+    keys = [key for key in _notifiers if key[0] == loop_id]
+    await asyncio.gather(*[_notifiers.pop(key).close() for key in keys])
@@ -1,4 +1,5 @@
 import re
+import json
 from pathlib import Path
 from typing import List, Dict, Optional
 
@@ -10,13 +11,27 @@ from pydantic import BaseModel
 from urllib.parse import urljoin
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from aoc_coding_companion.utils.http_cache import HttpCache
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.constants import AOC_BASE_URL
+from aoc_coding_companion.utils.tracing import traced, record_download
+from aoc_coding_companion.utils.html import (
+    make_soup,
+    PUZZLE_STRAINER,
+    CALENDAR_STRAINER,
+    LEADERBOARD_STRAINER,
+    SUBMISSION_STRAINER,
+    USER_STRAINER,
+)
+
 
 class ParserConfig(BaseModel):
     headers: dict
     cookies: dict
+    base_url: str = AOC_BASE_URL
 
     def __str__(self) -> str:
-        return f"Config(headers={self.headers}, cookies=HIDDEN_FOR_SECURITY)"
+        return f"Config(headers={self.headers}, cookies=HIDDEN_FOR_SECURITY, base_url={self.base_url})"
 
 
 class Leader(BaseModel):
@@ -69,12 +84,32 @@ class CalendarResults(BaseModel):
         )
 
 
+class PuzzleExample(BaseModel):
+    input: str
+    expected_output: str
+    level: int
+
+    def __str__(self) -> str:
+        return (
+            f"Пример(часть={self.level}, ожидаемый ответ={self.expected_output}, "
+            f"входные данные={repr(self.input[:30])}...)"
+        )
+
+
 class PuzzleDetail(BaseModel):
     name: str
     description: str
     question: str
     day_url: str
     level: int
+    examples: List[PuzzleExample] = []
+    # Обе части решены: на странице нет формы ответа, а level остается 2
+    complete: bool = False
+
+    @property
+    def current_examples(self) -> List[PuzzleExample]:
+        """Примеры для текущей части задачи"""
+        return [example for example in self.examples if example.level == self.level]
 
     @property
     def input_link(self) -> str:
@@ -92,42 +127,100 @@ class PuzzleDetail(BaseModel):
             f"  Описание: {repr(self.description[:100])}...\n"
             f"  Основной вопрос: {self.question}\n"
             f"  Часть задачи: {self.level}\n"
+            f"  Примеров с ответами: {len(self.examples)}\n"
         )
 
 
 class SubmissionResult(BaseModel):
     is_correct: bool = False
     full_text: str
+    # Ответ не был проверен: сайт попросил подождать, отправку нужно повторить
+    rate_limited: bool = False
+    # Сколько секунд сайт просит не отправлять ответы на эту задачу
+    wait_seconds: Optional[int] = None
 
     def __str__(self) -> str:
         return (
             f"Результат проверки(\n"
             f"  Правильность: {self.is_correct}\n"
+            f"  Ожидание до следующей отправки: {self.wait_seconds}\n"
             f"  Полный текст ответа: {self.full_text}\n)"
         )
 
 
 class AdventOfCodeParser:
-    BASE_URL = "https://adventofcode.com"
+    BASE_URL = AOC_BASE_URL
     WAIT_BUFFER = 30
+    NUMBER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'ten': 10}
 
-    def __init__(self, config: ParserConfig, year: Optional[int] = None):
+    def __init__(self, config: ParserConfig, year: Optional[int] = None,
+                 session: Optional[aiohttp.ClientSession] = None, cache: Optional[HttpCache] = None):
         self.config = config
+        self.base_url = config.base_url.rstrip('/')
         self.year = year if year is not None else datetime.now().year
-        self.session = None  # Сессия создается в контекстном менеджере
+        # Сессия либо передается извне (общий пул), либо создается в контекстном менеджере
+        self.session = session
+        self._owns_session = False
+        self.cache = cache
+
+    @property
+    def session_token(self) -> str:
+        return str(self.config.cookies.get('session', ''))
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.config.headers, cookies=self.config.cookies)
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=self.config.headers, cookies=self.config.cookies)
+            self._owns_session = True
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        await self.session.close()
+        # Чужую (общую) сессию не закрываем
+        if self._owns_session:
+            await self.session.close()
+            self.session = None
+            self._owns_session = False
 
+    @traced('http')
     @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=10))
     async def get_page(self, url: str) -> str:
-        async with self.session.get(url) as response:
+        if self.cache is None:
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                body = await response.text()
+            record_download(len(body.encode()))
+            return body
+
+        key = self.cache.make_key(url, self.session_token)
+        cached_body = self.cache.read(key)
+        entry = self.cache.get(key) if cached_body is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.stats.hits += 1
+            return cached_body
+
+        async with self.session.get(url, headers=self.cache.conditional_headers(entry)) as response:
+            if response.status == 304 and entry is not None:
+                self.cache.refresh(key)
+                self.cache.stats.revalidated += 1
+                return cached_body
             response.raise_for_status()
-            return await response.text()
+            body = await response.text()
+            record_download(len(body.encode()))
+            self.cache.store(
+                key,
+                url,
+                body,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+        self.cache.stats.misses += 1
+        return body
+
+    def invalidate_puzzle_pages(self, day_url: str) -> None:
+        """Сброс кэша страниц, которые меняются после верного ответа"""
+        if self.cache is None:
+            return
+        self.cache.invalidate(day_url.rstrip('/'), self.session_token)
+        self.cache.invalidate(f"{self.base_url}/{self.year}/", self.session_token)
 
     @staticmethod
     def _extract_puzzle_details(soup: BeautifulSoup, day_url: str) -> PuzzleDetail:
@@ -138,8 +231,10 @@ class AdventOfCodeParser:
         full_description = []
         name = ""
         question = ""
+        examples = []
+        example_input = None
 
-        for desc in day_descriptions:
+        for part_level, desc in enumerate(day_descriptions, start=1):
             title_tag = desc.find('h2')
             if title_tag and not name:
                 name = title_tag.get_text(strip=True)
@@ -155,24 +250,48 @@ class AdventOfCodeParser:
             if em_tags:
                 question = em_tags[-1].get_text(strip=True)
 
+            # Пример - первый блок <pre><code>; во второй части часто используется пример из первой
+            pre_tag = desc.find('pre')
+            if pre_tag is not None:
+                example_input = pre_tag.get_text().rstrip('\n')
+            expected_output = AdventOfCodeParser._extract_example_answer(desc)
+            if example_input and expected_output:
+                examples.append(PuzzleExample(input=example_input, expected_output=expected_output, level=part_level))
+
         description = "\n\n\n".join(full_description)
 
         level = 1
+        complete = False
 
         success_tag = soup.find('p', class_='day-success')
         if success_tag:
             success_text = success_tag.get_text(strip=True)
             level += success_text.startswith("The first half of this puzzle is complete!")
-            level += success_text.startswith("Both parts of this puzzle are complete!")
+            complete = success_text.startswith("Both parts of this puzzle are complete!")
+            level += complete
 
         return PuzzleDetail(
             name=name,
             description=description,
             question=question,
             day_url=day_url,
-            level=level
+            level=level,
+            examples=examples,
+            complete=complete
         )
 
+    @staticmethod
+    def _extract_example_answer(desc: BeautifulSoup) -> Optional[str]:
+        """Ответ на пример - последний <code><em>...</em></code> в тексте части (вне блоков <pre>)"""
+        answer = None
+        for code_tag in desc.find_all('code'):
+            if code_tag.find_parent('pre') is not None:
+                continue
+            em_tag = code_tag.find('em') or code_tag.find_parent('em')
+            if em_tag is not None:
+                answer = code_tag.get_text(strip=True)
+        return answer
+
     @staticmethod
     def _extract_leaderboard(soup: BeautifulSoup) -> LeaderboardResult:
         user_div = soup.find('div', class_='user')
@@ -199,7 +318,7 @@ class AdventOfCodeParser:
                     try:
                         position = int(position_str)
                     except ValueError:
-                        print(f"Не удалось преобразовать позицию в числовое значение: '{position_str}'")
+                        get_logger().warning(f"Не удалось преобразовать позицию в числовое значение: '{position_str}'")
 
                 points_str = None
                 for text in row.stripped_strings:
@@ -219,7 +338,7 @@ class AdventOfCodeParser:
                     my_points = points
 
             except Exception as e:
-                print(f"Ошибка при обработке участника: {e}")
+                get_logger().warning(f"Ошибка при обработке участника: {e}")
                 continue
 
         return LeaderboardResult(leaders=leaders, my_position=my_position, my_points=my_points)
@@ -238,7 +357,7 @@ class AdventOfCodeParser:
                 day_number = day_number_tag.text.strip()
                 if day_tag.name == 'a':
                     href = day_tag.get('href', '')
-                    link = urljoin(self.BASE_URL, href)
+                    link = urljoin(self.base_url, href)
                     if 'calendar-verycomplete' in day_tag['class']:
                         solved_complete[day_number] = link
                     elif 'calendar-complete' in day_tag['class']:
@@ -259,13 +378,13 @@ class AdventOfCodeParser:
 
     async def parse_puzzle_details(self, day_url: str) -> PuzzleDetail:
         html = await self.get_page(day_url)
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = make_soup(html, PUZZLE_STRAINER)
         return self._extract_puzzle_details(soup, day_url)
 
     async def parse_leaderboard(self, leaderboard_id: int) -> LeaderboardResult:
-        board_url = f"{self.BASE_URL}/{self.year}/leaderboard/private/view/{leaderboard_id}"
+        board_url = f"{self.base_url}/{self.year}/leaderboard/private/view/{leaderboard_id}"
         html = await self.get_page(board_url)
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = make_soup(html, LEADERBOARD_STRAINER)
 
         join_form = soup.find('form', action=f"/{self.year}/leaderboard/private/join")
         if join_form:
@@ -273,12 +392,29 @@ class AdventOfCodeParser:
 
         return self._extract_leaderboard(soup)
 
+    async def fetch_leaderboard_json(self, leaderboard_id: int) -> dict:
+        """Приватный лидерборд в JSON (звезды по дням с временем получения)"""
+        board_url = f"{self.base_url}/{self.year}/leaderboard/private/view/{leaderboard_id}.json"
+        text = await self.get_page(board_url)
+        try:
+            return json.loads(text)
+        except ValueError:
+            # Вместо JSON сайт отдает HTML-страницу, если доступа к лидерборду нет
+            raise RuntimeError("Лидерборд недоступен или вы не являетесь его участником.")
+
+    async def parse_user_name(self) -> Optional[str]:
+        """Имя пользователя из шапки страницы календаря (страница обычно уже в кэше)"""
+        html = await self.get_page(f"{self.base_url}/{self.year}/")
+        user_div = make_soup(html, USER_STRAINER).find('div', class_='user')
+        return "".join(user_div.find_all(string=True, recursive=False)).strip() if user_div else None
+
     async def parse_calendar(self) -> CalendarResults:
-        url = f"{self.BASE_URL}/{self.year}/"
+        url = f"{self.base_url}/{self.year}/"
         html = await self.get_page(url)
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = make_soup(html, CALENDAR_STRAINER)
         return self._extract_calendar(soup)
 
+    @traced('http')
     async def submit_answer(self, submit_url: str, level: int, answer: str) -> SubmissionResult:
         form_data = {
             'level': level,
@@ -288,45 +424,60 @@ class AdventOfCodeParser:
         async with self.session.post(submit_url, data=form_data) as response:
             response.raise_for_status()
             text = await response.text()
+        record_download(len(text.encode()))
 
-        soup = BeautifulSoup(text, 'html.parser')
+        soup = make_soup(text, SUBMISSION_STRAINER)
         article = soup.find('article')
         full_text = article.get_text(strip=True) if article else "Ответ не получен."
 
         if full_text.startswith('You gave an answer too recently'):
-            match = re.search(r'(\d+)m (\d+)s', full_text)
-
-            if match:
-                minutes = int(match.group(1))
-                seconds = int(match.group(2))
-                total_seconds = minutes * 60 + seconds
-                wait_seconds = total_seconds + self.WAIT_BUFFER
-                print(f'Необходимо подождать {wait_seconds} секунд для отправки ответа.')
-
-                await asyncio.sleep(wait_seconds)
-                return await self.submit_answer(submit_url, level, answer)
-        elif full_text.endswith('please wait 10 minutes before trying again.[Return to Day 1]'):
-            wait_seconds = 10 * 60 + self.WAIT_BUFFER
-            print(f'Необходимо подождать {wait_seconds} секунд для отправки ответа.')
-            await asyncio.sleep(wait_seconds)
-            return await self.submit_answer(submit_url, level, answer)
+            # Ответ не проверялся: "You have 4m 30s left to wait" или "You have 33s left to wait"
+            match = re.search(r'(?:(\d+)m\s*)?(\d+)s left', full_text)
+            total_seconds = int(match.group(1) or 0) * 60 + int(match.group(2)) if match else 60
+            return SubmissionResult(
+                full_text=full_text,
+                rate_limited=True,
+                wait_seconds=total_seconds + self.WAIT_BUFFER
+            )
 
         is_correct = full_text.startswith("That's the right answer!")
+        if is_correct:
+            self.invalidate_puzzle_pages(submit_url.rstrip('/').rsplit('/', 1)[0])
 
-        return SubmissionResult(is_correct=is_correct, full_text=full_text)
+        return SubmissionResult(
+            is_correct=is_correct,
+            full_text=full_text,
+            wait_seconds=self._extract_cooldown(full_text)
+        )
 
-    async def download_input(self, input_url: str, save_path: Path) -> None:
+    @classmethod
+    def _extract_cooldown(cls, full_text: str) -> Optional[int]:
+        """Время блокировки после неверного ответа, например "please wait one minute before trying again"""
+        match = re.search(r'[Pp]lease wait (\w+) minutes? before trying again', full_text)
+        if not match:
+            return None
+        amount = match.group(1).lower()
+        minutes = int(amount) if amount.isdigit() else cls.NUMBER_WORDS.get(amount, 1)
+        return minutes * 60 + cls.WAIT_BUFFER
+
+    @traced('http')
+    async def fetch_input(self, input_url: str) -> bytes:
         async with self.session.get(input_url) as response:
             response.raise_for_status()
             content = await response.content.read()
+        record_download(len(content))
+        return content.rstrip(b'\n')
 
+    @staticmethod
+    def save_input(content: bytes, save_path: Path) -> None:
         save_path.parent.mkdir(parents=True, exist_ok=True)
-        content = content.rstrip(b'\n')
-
         with save_path.open('wb') as file:
             file.write(content)
         print(f"Данные успешно сохранены в {save_path}")
 
+    async def download_input(self, input_url: str, save_path: Path) -> None:
+        self.save_input(await self.fetch_input(input_url), save_path)
+
 
 async def main():
     config = ParserConfig(
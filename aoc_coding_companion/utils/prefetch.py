@@ -0,0 +1,111 @@
+import time
+import asyncio
+import hashlib
+from urllib.parse import urljoin
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
+
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.parser import AdventOfCodeParser, PuzzleDetail
+from aoc_coding_companion.utils.constants import PREFETCH_CONCURRENCY, PREFETCH_MAX_AGE
+
+
+class PuzzlePrefetcher:
+    """Фоновая загрузка страниц и входных данных следующих задач из списка.
+
+    Пока модель решает текущую задачу, следующие K задач скачиваются и разбираются заранее,
+    поэтому взятие задачи и скачивание входных данных становятся чтением из памяти.
+    Условие задачи сбрасывается после верного ответа (меняется часть), входные данные остаются.
+    """
+
+    def __init__(self, concurrency: int = PREFETCH_CONCURRENCY, max_age: float = PREFETCH_MAX_AGE):
+        self.max_age = max_age
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Ключ - (хэш токена сессии, ссылка на задачу), значение - (время запуска, задача загрузки)
+        self._details: Dict[Tuple[str, str], Tuple[float, asyncio.Task]] = {}
+        self._inputs: Dict[Tuple[str, str], Tuple[float, asyncio.Task]] = {}
+        # Потоки (thread_id), которым нужна загрузка: цикл событий общий для всех запусков сервера
+        self._owners: Dict[Tuple[str, str], Set[str]] = {}
+
+    @staticmethod
+    def _make_key(parser: AdventOfCodeParser, day_url: str) -> Tuple[str, str]:
+        return hashlib.sha256(parser.session_token.encode()).hexdigest(), day_url.rstrip('/')
+
+    async def _limited(self, coroutine: Awaitable):
+        async with self._semaphore:
+            return await coroutine
+
+    def _schedule_one(self, store: Dict[Tuple[str, str], Tuple[float, asyncio.Task]],
+                      key: Tuple[str, str], coroutine: Awaitable) -> None:
+        cached = store.get(key)
+        if cached is not None and self._is_usable(cached):
+            coroutine.close()
+            return
+        task = asyncio.get_running_loop().create_task(self._limited(coroutine))
+        # Ошибка предзагрузки не критична: задача будет скачана обычным способом
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        store[key] = (time.monotonic(), task)
+
+    def _is_usable(self, cached: Tuple[float, asyncio.Task]) -> bool:
+        created_at, task = cached
+        if time.monotonic() - created_at > self.max_age:
+            return False
+        return not task.done() or (not task.cancelled() and task.exception() is None)
+
+    def schedule(self, parser: AdventOfCodeParser, day_urls: List[str], owner: str) -> None:
+        """Запуск фоновой загрузки условий и входных данных задач для потока owner"""
+        for day_url in day_urls:
+            key = self._make_key(parser, day_url)
+            self._owners.setdefault(key, set()).add(owner)
+            self._schedule_one(self._details, key, parser.parse_puzzle_details(day_url))
+            input_link = urljoin(f"{day_url.rstrip('/')}/", 'input')
+            self._schedule_one(self._inputs, key, parser.fetch_input(input_link))
+
+    async def _take(self, store: Dict[Tuple[str, str], Tuple[float, asyncio.Task]], key: Tuple[str, str]):
+        cached = store.get(key)
+        if cached is None:
+            return None
+        if not self._is_usable(cached):
+            store.pop(key, None)
+            return None
+        try:
+            # Если загрузка еще идет, дожидаемся ее вместо повторного запроса
+            return await asyncio.shield(cached[1])
+        except Exception as e:
+            get_logger().debug(f'Предзагрузка не удалась, данные будут скачаны заново: {e}')
+            store.pop(key, None)
+            return None
+
+    async def get_details(self, parser: AdventOfCodeParser, day_url: str) -> Optional[PuzzleDetail]:
+        return await self._take(self._details, self._make_key(parser, day_url))
+
+    async def get_input(self, parser: AdventOfCodeParser, day_url: str) -> Optional[bytes]:
+        return await self._take(self._inputs, self._make_key(parser, day_url))
+
+    def invalidate(self, parser: AdventOfCodeParser, day_url: str) -> None:
+        """Сброс условия задачи после верного ответа: на странице открылась следующая часть"""
+        cached = self._details.pop(self._make_key(parser, day_url), None)
+        if cached is not None:
+            cached[1].cancel()
+
+    def cancel(self, owner: str) -> None:
+        """Отмена загрузок, которые нужны только завершившемуся потоку owner"""
+        for key, owners in list(self._owners.items()):
+            owners.discard(owner)
+            if owners:
+                continue
+            del self._owners[key]
+            for store in (self._details, self._inputs):
+                cached = store.pop(key, None)
+                if cached is not None:
+                    cached[1].cancel()
+
+
+# Задачи загрузки привязаны к циклу событий
+_prefetchers: Dict[int, PuzzlePrefetcher] = {}
+
+
+def get_puzzle_prefetcher() -> PuzzlePrefetcher:
+    key = id(asyncio.get_running_loop())
+    if key not in _prefetchers:
+        _prefetchers[key] = PuzzlePrefetcher()
+    return _prefetchers[key]
@@ -0,0 +1,152 @@
+"""Статистический профилировщик сгенерированного кода в рабочем процессе песочницы.
+
+Таймер процессорного времени (ITIMER_PROF) вызывает обработчик SIGPROF, который смотрит стек:
+строка самого глубокого кадра решения ('<solution>') получает выборку, а раз в snapshot_interval
+снимаются целые локальные переменные кадров решения - по ним видно, как растут счетчики циклов.
+Вне Unix таймера нет, и профиль не собирается.
+"""
+import time
+import signal
+from collections import Counter
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils.constants import (
+    EXEC_PROFILE_INTERVAL,
+    EXEC_PROFILE_SNAPSHOT_INTERVAL,
+    EXEC_PROFILE_MAX_COUNTERS,
+    EXEC_PROFILE_TOP_LINES,
+)
+
+
+SOLUTION_FILENAME = '<solution>'
+
+
+class CounterSnapshot(BaseModel):
+    # Время от начала запуска, секунды
+    elapsed: float
+    # Целые локальные переменные кадров решения: "функция.переменная" -> значение
+    values: Dict[str, int]
+
+
+class ExecProfile(BaseModel):
+    interval: float
+    samples: int = 0
+    # Выборки по номеру строки самого глубокого кадра решения
+    lines: Dict[int, int] = {}
+    # Наибольшее число кадров решения в стеке (глубина рекурсии)
+    max_depth: int = 0
+    snapshots: List[CounterSnapshot] = []
+
+
+class SamplingProfiler:
+    """Профиль одного запуска: start перед exec, stop после"""
+
+    def __init__(self, interval: float = EXEC_PROFILE_INTERVAL,
+                 snapshot_interval: float = EXEC_PROFILE_SNAPSHOT_INTERVAL,
+                 max_counters: int = EXEC_PROFILE_MAX_COUNTERS):
+        self.interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.max_counters = max_counters
+        self._previous_handler = None
+        self._reset()
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(signal, 'setitimer') and hasattr(signal, 'SIGPROF')
+
+    def _reset(self) -> None:
+        self._samples = 0
+        self._lines: Counter = Counter()
+        self._max_depth = 0
+        self._snapshots: List[CounterSnapshot] = []
+        self._start = time.perf_counter()
+        self._next_snapshot = 0.0
+
+    def start(self) -> None:
+        self._reset()
+        if not self.available():
+            return
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> Optional[ExecProfile]:
+        if not self.available():
+            return None
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        return ExecProfile(interval=self.interval, samples=self._samples, lines=dict(self._lines),
+                           max_depth=self._max_depth, snapshots=self._snapshots)
+
+    def _sample(self, signum, frame) -> None:
+        self._samples += 1
+        solution_frames = []
+        while frame is not None:
+            if frame.f_code.co_filename == SOLUTION_FILENAME:
+                solution_frames.append(frame)
+            frame = frame.f_back
+        if not solution_frames:
+            return
+        self._lines[solution_frames[0].f_lineno] += 1
+        self._max_depth = max(self._max_depth, len(solution_frames))
+
+        elapsed = time.perf_counter() - self._start
+        if elapsed < self._next_snapshot:
+            return
+        self._next_snapshot = elapsed + self.snapshot_interval
+        values: Dict[str, int] = {}
+        # У рекурсии берется самый глубокий вызов функции: по его аргументам видно продвижение рекурсии
+        for solution_frame in solution_frames:
+            for name, value in list(solution_frame.f_locals.items()):
+                if len(values) >= self.max_counters:
+                    break
+                if type(value) is int:
+                    values.setdefault(f'{solution_frame.f_code.co_name}.{name}', value)
+        self._snapshots.append(CounterSnapshot(elapsed=elapsed, values=values))
+
+
+def _is_monotonic(values: List[int]) -> bool:
+    pairs = list(zip(values, values[1:]))
+    return all(left <= right for left, right in pairs) or all(left >= right for left, right in pairs)
+
+
+def _format_counters(snapshots: List[CounterSnapshot], max_counters: int, points: int) -> List[str]:
+    """Счетчики, изменявшиеся за время запуска, с несколькими значениями от начала до конца"""
+    if len(snapshots) < 2:
+        return []
+    history: Dict[str, List[tuple]] = {}
+    for snapshot in snapshots:
+        for name, value in snapshot.values.items():
+            history.setdefault(name, []).append((snapshot.elapsed, value))
+    changing = [(name, values) for name, values in history.items() if len({value for _, value in values}) > 1]
+    # Сначала монотонные счетчики (переменные циклов и аргументы рекурсии), затем по числу разных значений
+    changing.sort(key=lambda item: (not _is_monotonic([value for _, value in item[1]]),
+                                    -len({value for _, value in item[1]})))
+    lines = []
+    for name, values in changing[:max_counters]:
+        step = max(1, (len(values) - 1) / (points - 1))
+        chosen = sorted({round(index * step) for index in range(points)} | {len(values) - 1})
+        chosen = [values[index] for index in chosen if index < len(values)]
+        lines.append(f'  {name}: ' + ' -> '.join(f'{value} ({elapsed:.0f} s)' for elapsed, value in chosen))
+    return lines
+
+
+def format_profile(profile: ExecProfile, code: str, top_lines: int = EXEC_PROFILE_TOP_LINES) -> str:
+    """Краткая сводка профиля для модели (на английском, как и остальные сообщения инструмента)"""
+    if profile.samples == 0:
+        return ''
+    source = code.splitlines()
+    lines = [f'Profile of the run ({profile.samples * profile.interval:.1f} s of CPU time sampled):']
+    if profile.lines:
+        lines.append('Hot lines of your code (share of CPU time, including the functions called there):')
+        for lineno, count in sorted(profile.lines.items(), key=lambda item: -item[1])[:top_lines]:
+            text = source[lineno - 1].strip() if 0 < lineno <= len(source) else ''
+            lines.append(f'  line {lineno} ({count / profile.samples:.0%}): {text[:120]}')
+    counters = _format_counters(profile.snapshots, max_counters=3, points=5)
+    if counters:
+        lines.append('Loop counters over time:')
+        lines.extend(counters)
+    if profile.max_depth > 10:
+        lines.append(f'Recursion depth of your functions reached {profile.max_depth}.')
+    return '\n'.join(lines)
@@ -1,5 +1,7 @@
 from langchain_core.prompts import ChatPromptTemplate
 
+from aoc_coding_companion.utils.input_helpers import HAS_NUMPY, describe
+
 
 developer_prompt = ChatPromptTemplate(
     [
@@ -12,7 +14,11 @@ developer_prompt = ChatPromptTemplate(
             'Finally output the working Python code for your solution, ensuring to fix any errors uncovered while writing pseudocode.\n'
             'Your code must print the answer using print(). There MUST be only one print. Typically, it outputs 1 number\n'
             'When you write the solution, be sure to use the input data. DO NOT OUTPUT them, they are very large\n'
-            'No outside libraries are allowed'
+            + ('No outside libraries are allowed except NumPy\n' if HAS_NUMPY
+               else 'No outside libraries are allowed\n')
+            + 'To check several hypotheses at once (for example, two readings of the task), '
+            'call the Python tool several times in one reply: the programs run in parallel\n'
+            + describe()
         ),
         (
             'user',
@@ -23,6 +29,7 @@ developer_prompt = ChatPromptTemplate(
             'The input file is located at: "{input_filepath}" use it.\n\n'
             'Answer the question: {question}\n\n'
             'Write the code in full at once'
+            '{similar_solutions}'
         ),
         (
             'placeholder',
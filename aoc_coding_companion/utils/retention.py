@@ -0,0 +1,354 @@
+"""Очистка контрольных точек графа.
+
+У каждого потока (thread_id) остаются последние keep_last контрольных точек. Поток без новых точек
+дольше finished_after секунд считается завершенным и сжимается до последнего состояния без
+промежуточных записей. Затем удаляются значения каналов, на которые не ссылается ни одна оставшаяся
+точка, и строки BlobStore без ссылок. Значения каналов удаляются только у потоков, простаивающих
+дольше blob_grace: у активного потока значение записывается раньше ссылающейся на него точки.
+
+Потоки обрабатываются пачками по batch_size, между пачками цикл событий отпускается.
+Поддерживаются AsyncPostgresSaver и MemorySaver (для проверки без базы).
+"""
+import abc
+import time
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.base.id import UUID
+from langgraph.checkpoint.memory import MemorySaver
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.postgres._ainternal import Conn
+
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.blobs import BlobExternalizingSerializer, BlobStore, find_blob_references
+from aoc_coding_companion.utils.constants import (
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_FINISHED_AFTER,
+    CHECKPOINT_RETENTION_BATCH_SIZE,
+    CHECKPOINT_RETENTION_INTERVAL,
+    CHECKPOINT_BLOB_GRACE
+)
+
+
+# Сотни наносекунд между началом григорианского календаря (отсчет времени uuid6) и 1970 годом
+UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Время создания контрольной точки по ее идентификатору (uuid6 хранит время в старших битах)"""
+    return (UUID(checkpoint_id).time - UUID_EPOCH_OFFSET) / 10_000_000
+
+
+class RetentionPolicy(BaseModel):
+    keep_last: int = CHECKPOINT_KEEP_LAST
+    finished_after: float = CHECKPOINT_FINISHED_AFTER
+    batch_size: int = CHECKPOINT_RETENTION_BATCH_SIZE
+    blob_grace: float = CHECKPOINT_BLOB_GRACE
+
+
+class RetentionReport(BaseModel):
+    threads: int = 0
+    finished_threads: int = 0
+    checkpoints: int = 0
+    writes: int = 0
+    channel_blobs: int = 0
+    file_blobs: int = 0
+    # Размер удаленных строк таблиц и файлов хранилища
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (f'Очистка контрольных точек: потоков {self.threads} (завершенных {self.finished_threads}), '
+                f'удалено точек {self.checkpoints}, записей {self.writes}, значений каналов {self.channel_blobs}, '
+                f'строк хранилища {self.file_blobs}, освобождено {self.bytes / 1024:.1f} КиБ '
+                f'за {self.elapsed:.1f} с')
+
+
+class CheckpointRetention(abc.ABC):
+    """Общий порядок очистки. Наследники работают с конкретным хранилищем"""
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None, blob_store: Optional[BlobStore] = None):
+        self.policy = policy or RetentionPolicy()
+        self.blob_store = blob_store
+
+    @abc.abstractmethod
+    def _thread_batches(self) -> AsyncIterator[List[Tuple[str, str]]]:
+        """Пачки (thread_id, идентификатор последней контрольной точки)"""
+
+    @abc.abstractmethod
+    async def _prune(self, thread_ids: List[str], finished: List[str], idle: List[str],
+                     report: RetentionReport) -> None:
+        """Удаление лишних точек, записей и значений каналов пачки потоков с подсчетом в report"""
+
+    @abc.abstractmethod
+    async def _blob_references(self) -> Set[str]:
+        """Хэши строк BlobStore, на которые ссылаются оставшиеся точки и записи"""
+
+    async def run(self) -> RetentionReport:
+        start = time.perf_counter()
+        report = RetentionReport()
+        now = time.time()
+        async for batch in self._thread_batches():
+            thread_ids = [thread_id for thread_id, _ in batch]
+            finished = [thread_id for thread_id, last_id in batch
+                        if now - checkpoint_time(last_id) > self.policy.finished_after]
+            idle = [thread_id for thread_id, last_id in batch
+                    if now - checkpoint_time(last_id) > self.policy.blob_grace]
+            await self._prune(thread_ids, finished, idle, report)
+            report.threads += len(thread_ids)
+            report.finished_threads += len(finished)
+            await asyncio.sleep(0)
+        if self.blob_store is not None:
+            referenced = await self._blob_references()
+            await asyncio.to_thread(self._delete_unreferenced_blobs, referenced, report)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _delete_unreferenced_blobs(self, referenced: Set[str], report: RetentionReport) -> None:
+        # Время файла обновляется при каждом использовании строки, поэтому строки, записанные
+        # после поиска ссылок, не удаляются
+        cutoff = time.time() - self.policy.blob_grace
+        for digest, used_at, size in list(self.blob_store.entries()):
+            if digest not in referenced and used_at < cutoff:
+                self.blob_store.delete(digest)
+                report.file_blobs += 1
+                report.bytes += size
+
+
+_THREADS_SQL = """
+SELECT thread_id, max(checkpoint_id)
+FROM checkpoints
+WHERE thread_id > %s
+GROUP BY thread_id
+ORDER BY thread_id
+LIMIT %s
+"""
+
+_PRUNE_CHECKPOINTS_SQL = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position
+    FROM checkpoints
+    WHERE thread_id = ANY(%(thread_ids)s)
+), deleted AS (
+    DELETE FROM checkpoints AS cp
+    USING ranked
+    WHERE cp.thread_id = ranked.thread_id
+      AND cp.checkpoint_ns = ranked.checkpoint_ns
+      AND cp.checkpoint_id = ranked.checkpoint_id
+      AND ranked.position > CASE WHEN ranked.thread_id = ANY(%(finished)s) THEN 1 ELSE %(keep_last)s END
+    RETURNING pg_column_size(cp.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+# Записи удаленных точек и все записи завершенных потоков (незавершенный шаг не будет продолжен)
+_PRUNE_WRITES_SQL = """
+WITH deleted AS (
+    DELETE FROM checkpoint_writes AS cw
+    WHERE cw.thread_id = ANY(%(thread_ids)s)
+      AND (cw.thread_id = ANY(%(finished)s) OR NOT EXISTS (
+          SELECT 1 FROM checkpoints AS cp
+          WHERE cp.thread_id = cw.thread_id
+            AND cp.checkpoint_ns = cw.checkpoint_ns
+            AND cp.checkpoint_id = cw.checkpoint_id))
+    RETURNING pg_column_size(cw.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+_PRUNE_BLOBS_SQL = """
+WITH deleted AS (
+    DELETE FROM checkpoint_blobs AS cb
+    WHERE cb.thread_id = ANY(%(idle)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints AS cp
+          WHERE cp.thread_id = cb.thread_id
+            AND cp.checkpoint_ns = cb.checkpoint_ns
+            AND cp.checkpoint -> 'channel_versions' ->> cb.channel = cb.version)
+    RETURNING pg_column_size(cb.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+_BLOB_REFERENCES_SQL = """
+SELECT blob FROM checkpoint_blobs WHERE position(%(marker)s IN blob) > 0
+UNION ALL
+SELECT blob FROM checkpoint_writes WHERE position(%(marker)s IN blob) > 0
+"""
+
+_VACUUM_SQL = 'VACUUM (ANALYZE) checkpoints, checkpoint_blobs, checkpoint_writes'
+
+
+class PostgresCheckpointRetention(CheckpointRetention):
+    """Очистка таблиц AsyncPostgresSaver. Соединения должны быть в режиме autocommit, как у самого хранилища.
+
+    Освобожденное место таблиц переиспользуется после VACUUM, файлы таблиц при этом не уменьшаются.
+    """
+
+    def __init__(self, conn: 'Conn', policy: Optional[RetentionPolicy] = None,
+                 blob_store: Optional[BlobStore] = None, vacuum: bool = True):
+        super().__init__(policy, blob_store)
+        self.conn = conn
+        self.vacuum = vacuum
+
+    def _connection(self):
+        from langgraph.checkpoint.postgres._ainternal import get_connection
+        return get_connection(self.conn)
+
+    async def _fetchall(self, conn, query: str, params) -> list:
+        from psycopg.rows import tuple_row
+        async with conn.cursor(row_factory=tuple_row) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+    async def _thread_batches(self) -> AsyncIterator[List[Tuple[str, str]]]:
+        last_thread_id = ''
+        while True:
+            async with self._connection() as conn:
+                batch = await self._fetchall(conn, _THREADS_SQL, (last_thread_id, self.policy.batch_size))
+            if not batch:
+                return
+            yield batch
+            last_thread_id = batch[-1][0]
+
+    async def _prune(self, thread_ids: List[str], finished: List[str], idle: List[str],
+                     report: RetentionReport) -> None:
+        params = {'thread_ids': thread_ids, 'finished': finished, 'idle': idle, 'keep_last': self.policy.keep_last}
+        async with self._connection() as conn:
+            async with conn.transaction():
+                (checkpoints, checkpoints_size), = await self._fetchall(conn, _PRUNE_CHECKPOINTS_SQL, params)
+                (writes, writes_size), = await self._fetchall(conn, _PRUNE_WRITES_SQL, params)
+                (blobs, blobs_size), = await self._fetchall(conn, _PRUNE_BLOBS_SQL, params)
+        report.checkpoints += checkpoints
+        report.writes += writes
+        report.channel_blobs += blobs
+        report.bytes += checkpoints_size + writes_size + blobs_size
+
+    async def _blob_references(self) -> Set[str]:
+        from psycopg.rows import tuple_row
+        referenced = set()
+        async with self._connection() as conn:
+            # Именованный курсор читает строки порциями и требует транзакции
+            async with conn.transaction():
+                async with conn.cursor(name='aoc_blob_references', row_factory=tuple_row) as cursor:
+                    cursor.itersize = self.policy.batch_size
+                    await cursor.execute(_BLOB_REFERENCES_SQL, {'marker': b'blob:sha256:'})
+                    async for row in cursor:
+                        referenced |= find_blob_references(bytes(row[0]))
+        return referenced
+
+    async def run(self) -> RetentionReport:
+        report = await super().run()
+        if self.vacuum and (report.checkpoints or report.writes or report.channel_blobs):
+            async with self._connection() as conn:
+                await conn.execute(_VACUUM_SQL)
+        return report
+
+
+class MemoryCheckpointRetention(CheckpointRetention):
+    """Очистка MemorySaver. Значения каналов хранятся в самих точках, поэтому channel_blobs всегда 0"""
+
+    def __init__(self, saver: MemorySaver, policy: Optional[RetentionPolicy] = None,
+                 blob_store: Optional[BlobStore] = None):
+        super().__init__(policy, blob_store)
+        self.saver = saver
+
+    async def _thread_batches(self) -> AsyncIterator[List[Tuple[str, str]]]:
+        batch = []
+        for thread_id in sorted(self.saver.storage):
+            checkpoint_ids = [checkpoint_id for namespace in list(self.saver.storage[thread_id].values())
+                              for checkpoint_id in list(namespace)]
+            if not checkpoint_ids:
+                continue
+            batch.append((thread_id, max(checkpoint_ids)))
+            if len(batch) == self.policy.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _prune(self, thread_ids: List[str], finished: List[str], idle: List[str],
+                     report: RetentionReport) -> None:
+        finished = set(finished)
+        for thread_id in thread_ids:
+            keep_last = 1 if thread_id in finished else self.policy.keep_last
+            for namespace in list(self.saver.storage[thread_id].values()):
+                for checkpoint_id in sorted(namespace, reverse=True)[keep_last:]:
+                    (_, checkpoint), (_, metadata), _ = namespace.pop(checkpoint_id)
+                    report.checkpoints += 1
+                    report.bytes += len(checkpoint) + len(metadata)
+
+        thread_ids = set(thread_ids)
+        for key in list(self.saver.writes):
+            thread_id, checkpoint_ns, checkpoint_id = key
+            if thread_id not in thread_ids:
+                continue
+            if thread_id in finished or checkpoint_id not in self.saver.storage[thread_id].get(checkpoint_ns, {}):
+                writes = self.saver.writes.pop(key)
+                report.writes += len(writes)
+                report.bytes += sum(len(value) for _, _, (_, value) in writes.values())
+
+    async def _blob_references(self) -> Set[str]:
+        referenced = set()
+        for namespaces in list(self.saver.storage.values()):
+            for namespace in list(namespaces.values()):
+                for (_, checkpoint), (_, metadata), _ in list(namespace.values()):
+                    referenced |= find_blob_references(checkpoint)
+                    referenced |= find_blob_references(metadata)
+        for writes in list(self.saver.writes.values()):
+            for _, _, (_, value) in list(writes.values()):
+                referenced |= find_blob_references(value)
+        return referenced
+
+
+def make_checkpoint_retention(checkpointer: BaseCheckpointSaver, policy: Optional[RetentionPolicy] = None,
+                              blob_store: Optional[BlobStore] = None) -> CheckpointRetention:
+    """Очистка для хранилища графа. Хранилище строк по умолчанию берется из его сериализатора"""
+    if blob_store is None and isinstance(checkpointer.serde, BlobExternalizingSerializer):
+        blob_store = checkpointer.serde.store
+    if isinstance(checkpointer, MemorySaver):
+        return MemoryCheckpointRetention(checkpointer, policy, blob_store)
+    try:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    except ImportError:
+        AsyncPostgresSaver = None
+    if AsyncPostgresSaver is not None and isinstance(checkpointer, AsyncPostgresSaver):
+        return PostgresCheckpointRetention(checkpointer.conn, policy, blob_store)
+    raise ValueError(f'Очистка не поддерживается для хранилища {type(checkpointer).__name__}')
+
+
+async def run_checkpoint_retention(retention: CheckpointRetention,
+                                   interval: float = CHECKPOINT_RETENTION_INTERVAL) -> None:
+    """Очистка раз в interval секунд. Ошибка одного прохода пишется в лог и не останавливает цикл"""
+    logger = get_logger()
+    while True:
+        try:
+            logger.info(str(await retention.run()))
+        except Exception as e:
+            logger.error(f'Очистка контрольных точек не удалась: {e}')
+        await asyncio.sleep(interval)
+
+
+# Фоновая очистка привязана к циклу событий, как и пул соединений хранилища
+_retention_tasks: Dict[int, asyncio.Task] = {}
+
+
+def start_checkpoint_retention(checkpointer: BaseCheckpointSaver, policy: Optional[RetentionPolicy] = None,
+                               interval: float = CHECKPOINT_RETENTION_INTERVAL) -> asyncio.Task:
+    """Фоновая очистка хранилища графа. Прежняя очистка этого цикла событий отменяется"""
+    stop_checkpoint_retention()
+    retention = make_checkpoint_retention(checkpointer, policy)
+    task = asyncio.get_running_loop().create_task(run_checkpoint_retention(retention, interval))
+    _retention_tasks[id(asyncio.get_running_loop())] = task
+    return task
+
+
+def stop_checkpoint_retention() -> None:
+    """Отмена фоновой очистки текущего цикла событий (до закрытия пула соединений хранилища)"""
+    task = _retention_tasks.pop(id(asyncio.get_running_loop()), None)
+    if task is not None:
+        task.cancel()
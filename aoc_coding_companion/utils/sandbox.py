@@ -0,0 +1,355 @@
+import os
+import sys
+import math
+import time
+import atexit
+import signal
+import asyncio
+import multiprocessing
+from io import StringIO
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from aoc_coding_companion.utils import input_helpers
+from aoc_coding_companion.utils.tools import ExecTimeoutException
+from aoc_coding_companion.utils.profiler import ExecProfile, SamplingProfiler
+from aoc_coding_companion.utils.constants import (
+    DEFAULT_SANDBOX_WORKERS,
+    DEFAULT_SANDBOX_MEMORY_LIMIT,
+    DEFAULT_SANDBOX_MAX_TASKS_PER_WORKER,
+    DEFAULT_EXEC_OUTPUT_LIMIT,
+    SANDBOX_INTERRUPT_GRACE,
+)
+
+try:
+    import resource
+except ImportError:  # Windows: лимиты ресурсов недоступны, остается только принудительное завершение
+    resource = None
+
+
+TRUNCATED_OUTPUT_MARK = '\n...[output truncated]'
+# Сигнал остановки кода по мягкому сроку. Вне Unix его нет, и код только убивается по жесткому сроку
+INTERRUPT_SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+
+class SandboxResult(BaseModel):
+    output: str = ''
+    error: Optional[str] = None
+    timed_out: bool = False
+    truncated: bool = False
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    max_rss_kb: int = 0
+    profile: Optional[ExecProfile] = None
+
+    def __str__(self) -> str:
+        return (
+            f"Результат запуска(время={self.wall_time:.2f}с, cpu={self.cpu_time:.2f}с, "
+            f"память={self.max_rss_kb}КБ, таймаут={self.timed_out}, ошибка={self.error})"
+        )
+
+
+class _CappedStringIO(StringIO):
+    """Буфер вывода, который перестает накапливать данные после достижения лимита"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+
+    def write(self, s: str) -> int:
+        if self.size >= self.limit:
+            self.truncated = True
+            return len(s)
+        chunk = s[:self.limit - self.size]
+        self.size += len(chunk)
+        if len(chunk) < len(s):
+            self.truncated = True
+        super().write(chunk)
+        return len(s)
+
+
+def _cpu_time() -> float:
+    if resource is None:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _max_rss_kb() -> int:
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux в килобайтах
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+class _JobInterrupted(BaseException):
+    """Остановка кода по мягкому сроку или лимиту процессорного времени. BaseException, чтобы
+    сгенерированный код не перехватил ее через except Exception"""
+
+
+# Сигналы остановки приходят и между запусками, тогда их нужно пропустить
+_job_running = False
+
+
+def _interrupt_job(signum, frame) -> None:
+    if _job_running:
+        raise _JobInterrupted()
+
+
+def _run_job(code: str, cpu_limit: Optional[float], output_limit: int) -> dict:
+    global _job_running
+    cpu_before = _cpu_time()
+    if resource is not None and cpu_limit is not None:
+        # Лимит процессорного времени накопительный, поэтому сдвигаем его относительно уже потраченного.
+        # Жесткий лимит не трогаем: понизив его, процесс уже не сможет поднять мягкий для следующей задачи
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(cpu_before + cpu_limit)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    old_stdout, old_stdin = sys.stdout, sys.stdin
+    stdout = _CappedStringIO(output_limit)
+    sys.stdout = stdout
+    sys.stdin = StringIO('')
+    profiler = SamplingProfiler()
+    start = time.perf_counter()
+    error = None
+    timed_out = False
+    try:
+        compiled = compile(code, '<solution>', 'exec')
+        _job_running = True
+        profiler.start()
+        exec(compiled, {'__name__': '__main__', 'aoc': input_helpers})
+    except _JobInterrupted:
+        timed_out = True
+    except BaseException as e:  # SystemExit и KeyboardInterrupt из сгенерированного кода тоже не должны ронять воркер
+        error = repr(e)
+    finally:
+        _job_running = False
+        profile = profiler.stop()
+        sys.stdout, sys.stdin = old_stdout, old_stdin
+
+    return {
+        'output': stdout.getvalue(),
+        'error': error,
+        'timed_out': timed_out,
+        'truncated': stdout.truncated,
+        'wall_time': time.perf_counter() - start,
+        'cpu_time': _cpu_time() - cpu_before,
+        'max_rss_kb': _max_rss_kb(),
+        'profile': profile.model_dump() if profile is not None else None,
+    }
+
+
+def _worker_main(conn, memory_limit: Optional[int]) -> None:
+    """Цикл рабочего процесса песочницы"""
+    if resource is not None and memory_limit:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            pass
+    # Мягкий срок и превышение лимита процессорного времени останавливают код, а не процесс
+    for signum in (INTERRUPT_SIGNAL, getattr(signal, 'SIGXCPU', None)):
+        if signum is not None:
+            signal.signal(signum, _interrupt_job)
+    # Модуль разбора входных данных доступен коду и через import aoc, его кэш живет между запусками
+    sys.modules['aoc'] = input_helpers
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        code, cpu_limit, output_limit = message
+        conn.send(_run_job(code, cpu_limit, output_limit))
+
+
+class _SandboxWorker:
+    def __init__(self, context, memory_limit: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def interrupt(self) -> None:
+        """Остановка текущего кода: рабочий процесс вернет вывод и профиль на момент остановки"""
+        if INTERRUPT_SIGNAL is None:
+            return
+        try:
+            os.kill(self.process.pid, INTERRUPT_SIGNAL)
+        except ProcessLookupError:
+            pass
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        self.kill()
+
+
+class SandboxExecutor:
+    """Пул прогретых процессов для запуска сгенерированного кода вне процесса агента.
+
+    Каждый запуск ограничен по процессорному времени и памяти (rlimit), по реальному времени
+    и по объему вывода. По мягкому сроку код останавливается сигналом и возвращает вывод и профиль,
+    а не ответивший процесс убивается по жесткому сроку и заменяется новым.
+    """
+
+    def __init__(self,
+                 workers: int = DEFAULT_SANDBOX_WORKERS,
+                 memory_limit: Optional[int] = DEFAULT_SANDBOX_MEMORY_LIMIT,
+                 output_limit: int = DEFAULT_EXEC_OUTPUT_LIMIT,
+                 max_tasks_per_worker: int = DEFAULT_SANDBOX_MAX_TASKS_PER_WORKER,
+                 interrupt_grace: float = SANDBOX_INTERRUPT_GRACE):
+        self.workers = max(1, workers)
+        self.memory_limit = memory_limit
+        self.output_limit = output_limit
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.interrupt_grace = interrupt_grace
+        self._context = multiprocessing.get_context('spawn')
+        self._all: List[_SandboxWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    def _spawn(self) -> _SandboxWorker:
+        worker = _SandboxWorker(self._context, self.memory_limit)
+        self._all.append(worker)
+        return worker
+
+    def _retire(self, worker: _SandboxWorker, kill: bool = False) -> None:
+        if worker in self._all:
+            self._all.remove(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    async def start(self) -> None:
+        """Прогрев пула: запуск всех рабочих процессов"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        workers = await asyncio.gather(*[loop.run_in_executor(None, self._spawn) for _ in range(self.workers)])
+        for worker in workers:
+            self._idle.put_nowait(worker)
+
+    async def _replace(self, worker: _SandboxWorker, kill: bool) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._retire, worker, kill)
+        self._idle.put_nowait(await loop.run_in_executor(None, self._spawn))
+
+    @staticmethod
+    async def _wait_readable(conn, timeout: Optional[float]) -> bool:
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        loop.add_reader(conn.fileno(), lambda: readable.done() or readable.set_result(True))
+        try:
+            await asyncio.wait_for(readable, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(conn.fileno())
+
+    async def run(self, code: str, timeout: Optional[float], cpu_limit: Optional[float] = None,
+                  soft_timeout: Optional[float] = None) -> SandboxResult:
+        """Запуск кода в свободном рабочем процессе.
+
+        Код останавливается по soft_timeout (по умолчанию и если он не меньше - по timeout),
+        процесс убивается, если не ответил к timeout, но не раньше interrupt_grace после остановки.
+        """
+        await self.start()
+        worker = await self._idle.get()
+        if not worker.alive:
+            await self._replace(worker, kill=True)
+            worker = await self._idle.get()
+
+        start = time.perf_counter()
+        try:
+            worker.conn.send((code, cpu_limit if cpu_limit is not None else timeout, self.output_limit))
+            stop_after = timeout
+            if soft_timeout is not None and (timeout is None or soft_timeout < timeout):
+                stop_after = soft_timeout
+            finished = await self._wait_readable(worker.conn, stop_after)
+            if not finished and INTERRUPT_SIGNAL is not None:
+                worker.interrupt()
+                kill_after = None if timeout is None else max(timeout - stop_after, self.interrupt_grace)
+                finished = await self._wait_readable(worker.conn, kill_after)
+            if not finished:
+                await self._replace(worker, kill=True)
+                return SandboxResult(timed_out=True, wall_time=time.perf_counter() - start)
+            try:
+                payload = worker.conn.recv()
+            except (EOFError, OSError):
+                # Процесс убит по лимиту процессорного времени или упал сам
+                await self._replace(worker, kill=True)
+                return SandboxResult(timed_out=True, wall_time=time.perf_counter() - start)
+        except BaseException:
+            await self._replace(worker, kill=True)
+            raise
+
+        worker.tasks_done += 1
+        if worker.tasks_done >= self.max_tasks_per_worker:
+            # Перезапуск процесса, чтобы не копить память, оставленную сгенерированным кодом
+            await self._replace(worker, kill=False)
+        else:
+            self._idle.put_nowait(worker)
+
+        result = SandboxResult(**payload)
+        if result.truncated:
+            result.output += TRUNCATED_OUTPUT_MARK
+        return result
+
+    def close(self) -> None:
+        for worker in list(self._all):
+            self._retire(worker)
+        self._idle = None
+
+
+# Очередь свободных процессов привязана к циклу событий, поэтому пул заводится на каждый цикл
+_sandboxes: Dict[int, SandboxExecutor] = {}
+
+
+def get_sandbox() -> SandboxExecutor:
+    key = id(asyncio.get_running_loop())
+    if key not in _sandboxes:
+        _sandboxes[key] = SandboxExecutor()
+    return _sandboxes[key]
+
+
+def close_sandboxes() -> None:
+    for sandbox in _sandboxes.values():
+        sandbox.close()
+    _sandboxes.clear()
+
+
+atexit.register(close_sandboxes)
+
+
+async def run_python_code_in_sandbox(code: str, timeout: int) -> str:
+    """Асинхронный аналог run_python_code_with_timeout: вывод кода либо repr исключения"""
+    result = await get_sandbox().run(code, timeout)
+    if result.timed_out:
+        raise ExecTimeoutException("Execution timed out")
+    if result.error is not None:
+        return result.error
+    return result.output
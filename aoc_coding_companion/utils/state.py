@@ -1,13 +1,54 @@
+import operator
+from typing import Annotated, Optional
+
+from pydantic import BaseModel
 from typing_extensions import TypedDict
 
 from langchain_core.messages import AnyMessage
+from langgraph.graph.message import add_messages
 
 from aoc_coding_companion.utils.parser import PuzzleDetail
 
 
+class CodeRun(BaseModel):
+    # Ответ программы - последняя непустая строка вывода (None - ошибка или остановка по сроку)
+    answer: Optional[str] = None
+    # Результат проверки на примерах из условия (None - не проверялся)
+    examples_passed: Optional[bool] = None
+    # Время работы на настоящих входных данных, секунды
+    runtime: float = 0.0
+
+
 class AOCState(TypedDict):
-    messages: list[AnyMessage]
+    # Узлы возвращают только новые сообщения, редьюсер дописывает их к истории
+    messages: Annotated[list[AnyMessage], add_messages]
     todo_puzzle_links: list[str]
     current_puzzle_details: PuzzleDetail
     input_filepath: str
     comment: str
+    # Сколько токенов сэкономило сжатие контекста на текущей задаче
+    tokens_saved: int
+    # Независимые варианты решения, ожидающие запуска и голосования
+    candidate_messages: list[AnyMessage]
+    # Запуски кода текущей задачи по tool_call_id: по ним проверяется программа, напечатавшая ответ
+    code_runs: dict[str, CodeRun]
+    # Вызовы TaskAnswer, не отправленные из-за непройденных примеров (повторенный ответ отправляется)
+    refused_answer_ids: list[str]
+
+
+class PuzzleResult(BaseModel):
+    day_url: str
+    name: str = ''
+    level: int = 0
+    is_correct: bool = False
+    tokens_saved: int = 0
+    comment: str = ''
+
+    def __str__(self) -> str:
+        status = 'решена' if self.is_correct else 'не решена'
+        return f"Задача {self.name or self.day_url} (часть {self.level}) {status}"
+
+
+class AOCConcurrentState(AOCState):
+    # Результаты параллельно решаемых задач собираются со всех веток
+    puzzle_results: Annotated[list[PuzzleResult], operator.add]
@@ -0,0 +1,137 @@
+"""Потоковый ответ модели с выделением вызовов инструментов по мере их готовности.
+
+Ответ читается через astream, а аргументы вызова инструмента собираются из фрагментов.
+Как только JSON аргументов вызова завершен, вызывается on_tool_call, поэтому запуск кода
+начинается, не дожидаясь конца ответа. Результаты таких ранних запусков хранит SpeculativeRuns,
+а узел запуска кода забирает их по идентификатору вызова инструмента.
+Ответ ищется в кэше ответов модели по тому же ключу, что и у chain.ainvoke, и сохраняется в него.
+"""
+import json
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+from langchain_core.outputs import ChatGeneration
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.llm_cache import resolve_chain_cache
+from aoc_coding_companion.utils.tracing import record_stream_timing
+from aoc_coding_companion.utils.constants import STREAM_PROGRESS_INTERVAL, SPECULATIVE_RUN_MAX_AGE
+
+
+def _parse_complete_args(args: Optional[str]) -> Optional[dict]:
+    """Аргументы вызова, если их JSON уже завершен (незавершенный JSON не разбирается)"""
+    if not args:
+        return None
+    try:
+        parsed = json.loads(args)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+async def stream_tool_calls(chain: Runnable, chain_input: dict,
+                            on_tool_call: Callable[[dict], None],
+                            on_progress: Callable[[str], None],
+                            progress_interval: float = STREAM_PROGRESS_INTERVAL) -> AIMessage:
+    """Потоковый вызов цепочки. on_tool_call вызывается один раз на каждый завершенный вызов инструмента"""
+    start = time.perf_counter()
+    time_to_first_token = None
+    time_to_tool_call = None
+    last_progress = start
+    dispatched = set()
+    result: Optional[AIMessageChunk] = None
+
+    cache_key = await resolve_chain_cache(chain, chain_input)
+    if cache_key is not None:
+        cache, prompt, llm_string = cache_key
+        cached = await cache.alookup(prompt, llm_string)
+        if cached:
+            message = cached[0].message
+            elapsed = time.perf_counter() - start
+            for tool_call in message.tool_calls:
+                on_tool_call(tool_call)
+            record_stream_timing(elapsed, elapsed if message.tool_calls else None)
+            return message
+
+    async for chunk in chain.astream(chain_input):
+        now = time.perf_counter()
+        result = chunk if result is None else result + chunk
+        if time_to_first_token is None and (chunk.content or chunk.tool_call_chunks):
+            time_to_first_token = now - start
+
+        for tool_call_chunk in result.tool_call_chunks:
+            index = tool_call_chunk.get('index')
+            if index in dispatched or not tool_call_chunk.get('name'):
+                continue
+            args = _parse_complete_args(tool_call_chunk.get('args'))
+            if args is None:
+                continue
+            dispatched.add(index)
+            if time_to_tool_call is None:
+                time_to_tool_call = now - start
+            on_tool_call({'name': tool_call_chunk['name'], 'args': args, 'id': tool_call_chunk.get('id')})
+
+        if now - last_progress >= progress_interval:
+            last_progress = now
+            size = len(result.content) + sum(len(item.get('args') or '') for item in result.tool_call_chunks)
+            on_progress(f'Модель пишет ответ: {size} символов за {now - start:.0f} с')
+
+    if result is None:
+        raise ValueError('Модель не вернула ни одного фрагмента ответа')
+    record_stream_timing(time_to_first_token, time_to_tool_call)
+    message = message_chunk_to_message(result)
+    if cache_key is not None:
+        await cache.aupdate(prompt, llm_string, [ChatGeneration(message=message)])
+    return message
+
+
+class SpeculativeRuns:
+    """Запуски кода, начатые во время потокового ответа модели, по идентификатору вызова инструмента"""
+
+    def __init__(self, max_age: float = SPECULATIVE_RUN_MAX_AGE):
+        self.max_age = max_age
+        # Значение - (время запуска, поток (thread_id), задача): цикл событий общий для всех запусков сервера
+        self._runs: Dict[str, Tuple[float, str, asyncio.Task]] = {}
+
+    def start(self, tool_call_id: str, coroutine: Awaitable, owner: str) -> None:
+        now = time.monotonic()
+        # Запуски, которые так и не забрали (например, граф упал), выбрасываются по возрасту
+        for key, (created_at, _, task) in list(self._runs.items()):
+            if now - created_at > self.max_age:
+                task.cancel()
+                del self._runs[key]
+        task = asyncio.get_running_loop().create_task(coroutine)
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._runs[tool_call_id] = (now, owner, task)
+
+    async def take(self, tool_call_id: str):
+        """Результат раннего запуска или None, если его не было или он упал"""
+        cached = self._runs.pop(tool_call_id, None)
+        if cached is None:
+            return None
+        try:
+            return await cached[2]
+        except Exception as e:
+            get_logger().debug(f'Ранний запуск кода не удался, код будет запущен заново: {e}')
+            return None
+
+    def cancel(self, owner: str) -> None:
+        """Отмена незабранных запусков завершившегося потока owner"""
+        for key, (_, run_owner, task) in list(self._runs.items()):
+            if run_owner == owner:
+                task.cancel()
+                del self._runs[key]
+
+
+# Задачи запуска привязаны к циклу событий
+_speculative_runs: Dict[int, SpeculativeRuns] = {}
+
+
+def get_speculative_runs() -> SpeculativeRuns:
+    key = id(asyncio.get_running_loop())
+    if key not in _speculative_runs:
+        _speculative_runs[key] = SpeculativeRuns()
+    return _speculative_runs[key]
@@ -0,0 +1,149 @@
+import json
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.parser import AdventOfCodeParser, SubmissionResult
+from aoc_coding_companion.utils.constants import DEFAULT_SUBMIT_INTERVAL, SUBMISSION_STATE_FILEPATH
+
+
+class SubmissionDeadlineExceeded(Exception):
+    pass
+
+
+class SubmissionScheduler:
+    """Планировщик отправки ответов с учетом ограничений сайта.
+
+    Для каждого аккаунта действует токен-бакет на один токен, пополняемый раз в min_interval секунд,
+    поэтому отправки одного аккаунта идут по одной. Для каждой задачи хранится время окончания
+    блокировки, которую сообщил сайт. Пока задача ждет окончания блокировки, ни сессия, ни очередь
+    аккаунта не заняты, а время блокировок сохраняется на диск, чтобы перезапуск не получил новый штраф.
+    """
+
+    def __init__(self, state_path: Path = SUBMISSION_STATE_FILEPATH, min_interval: float = DEFAULT_SUBMIT_INTERVAL):
+        self.state_path = Path(state_path)
+        self.min_interval = min_interval
+        # Ключ - аккаунт или аккаунт с задачей, значение - unix-время, раньше которого отправлять нельзя
+        self._ready_at: Dict[str, float] = self._load()
+        self._conditions: Dict[str, asyncio.Condition] = {}
+        # Очереди ожидающих отправок аккаунта, упорядоченные по дедлайну: (дедлайн, номер в очереди)
+        self._waiters: Dict[str, List[Tuple[float, int]]] = {}
+        self._counter = itertools.count()
+
+    def _load(self) -> Dict[str, float]:
+        try:
+            raw = json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {key: float(ready_at) for key, ready_at in raw.items() if float(ready_at) > now}
+
+    def _save(self) -> None:
+        now = time.time()
+        self._ready_at = {key: ready_at for key, ready_at in self._ready_at.items() if ready_at > now}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._ready_at), encoding='utf-8')
+        tmp_path.replace(self.state_path)
+
+    @staticmethod
+    def _account_key(parser: AdventOfCodeParser) -> str:
+        return hashlib.sha256(parser.session_token.encode()).hexdigest()
+
+    @staticmethod
+    def _puzzle_key(account_key: str, submit_url: str) -> str:
+        return f'{account_key}:{submit_url.rstrip("/")}'
+
+    def ready_at(self, parser: AdventOfCodeParser, submit_url: str) -> float:
+        """Ближайшее время, когда по задаче можно отправить ответ"""
+        account_key = self._account_key(parser)
+        return max(
+            self._ready_at.get(account_key, 0.0),
+            self._ready_at.get(self._puzzle_key(account_key, submit_url), 0.0)
+        )
+
+    def _get_condition(self, account_key: str) -> asyncio.Condition:
+        if account_key not in self._conditions:
+            self._conditions[account_key] = asyncio.Condition()
+            self._waiters[account_key] = []
+        return self._conditions[account_key]
+
+    async def _acquire_token(self, account_key: str, deadline: float) -> None:
+        """Ожидание токена аккаунта. Первым его получает запрос с самым ранним дедлайном"""
+        condition = self._get_condition(account_key)
+        waiters = self._waiters[account_key]
+        entry = (deadline, next(self._counter))
+        async with condition:
+            heapq.heappush(waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if waiters[0] is entry:
+                        timeout = self._ready_at.get(account_key, 0.0) - time.time()
+                        if timeout <= 0:
+                            heapq.heappop(waiters)
+                            return
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in waiters:
+                    waiters.remove(entry)
+                    heapq.heapify(waiters)
+                condition.notify_all()
+                raise
+
+    async def _release_token(self, account_key: str) -> None:
+        condition = self._get_condition(account_key)
+        async with condition:
+            condition.notify_all()
+
+    async def submit(self, parser: AdventOfCodeParser, submit_url: str, level: int, answer: str,
+                     deadline: Optional[float] = None) -> SubmissionResult:
+        """Отправка ответа, как только это разрешит сайт. deadline - unix-время, после которого ждать нельзя"""
+        logger = get_logger()
+        account_key = self._account_key(parser)
+        puzzle_key = self._puzzle_key(account_key, submit_url)
+        deadline = deadline if deadline is not None else float('inf')
+
+        while True:
+            # Блокировку задачи ждем, не занимая очередь аккаунта: другие задачи тем временем отправляются
+            wait_seconds = self._ready_at.get(puzzle_key, 0.0) - time.time()
+            if time.time() + max(wait_seconds, 0.0) > deadline:
+                raise SubmissionDeadlineExceeded(
+                    f'Ответ на {submit_url} нельзя отправить раньше чем через {wait_seconds:.0f} секунд'
+                )
+            if wait_seconds > 0:
+                logger.debug(f'Необходимо подождать {wait_seconds:.0f} секунд для отправки ответа на {submit_url}')
+                await asyncio.sleep(wait_seconds)
+
+            await self._acquire_token(account_key, deadline)
+            result = None
+            try:
+                result = await parser.submit_answer(submit_url, level, answer)
+            finally:
+                self._ready_at[account_key] = time.time() + self.min_interval
+                if result is not None and result.wait_seconds:
+                    self._ready_at[puzzle_key] = time.time() + result.wait_seconds
+                self._save()
+                await self._release_token(account_key)
+
+            if not result.rate_limited:
+                return result
+
+
+# Примитивы asyncio привязаны к циклу событий, состояние блокировок общее через файл
+_schedulers: Dict[int, SubmissionScheduler] = {}
+
+
+def get_submission_scheduler() -> SubmissionScheduler:
+    key = id(asyncio.get_running_loop())
+    if key not in _schedulers:
+        _schedulers[key] = SubmissionScheduler()
+    return _schedulers[key]
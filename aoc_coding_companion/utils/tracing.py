@@ -0,0 +1,344 @@
+"""Трассировка запусков графа: время узлов, вызовов модели, запуска кода и HTTP-запросов.
+
+Каждый узел графа оборачивается в traced_node, а вложенные операции (HTTP, модель, песочница,
+ожидание блокировки отправки) открывают дочерние отрезки через trace_span. По завершении
+запуска трасса сохраняется в JSON и в текстовом формате OpenMetrics.
+Разбор сохраненной трассы по задачам - aoc_coding_companion.trace_report.
+"""
+import os
+import time
+import uuid
+import functools
+import contextvars
+from pathlib import Path
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+from langchain_core.runnables.config import RunnableConfig
+
+from aoc_coding_companion.utils.constants import TRACES_DIRPATH
+from aoc_coding_companion.utils.llm_cache import LLM_CACHE_HIT_KEY
+
+
+class Span(BaseModel):
+    id: int
+    parent_id: Optional[int] = None
+    kind: str
+    name: str
+    puzzle: str = ''
+    start: float
+    duration: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Ответы модели из кэша: их токены не тратились и не учитываются
+    llm_cache_hits: int = 0
+    exec_cpu_time: float = 0.0
+    exec_max_rss_kb: int = 0
+    bytes_downloaded: int = 0
+    # Потоковый ответ модели: время до первого фрагмента и до готового вызова инструмента
+    time_to_first_token: Optional[float] = None
+    time_to_tool_call: Optional[float] = None
+    # Память процесса после узла и ее прирост за время узла (только для узлов графа)
+    rss_kb: int = 0
+    rss_delta_kb: int = 0
+    error: Optional[str] = None
+
+
+def format_labels(labels: tuple) -> str:
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class RunTrace(BaseModel):
+    run_id: str
+    started_at: float
+    finished_at: Optional[float] = None
+    spans: List[Span] = []
+
+    def start_span(self, kind: str, name: str, puzzle: str = '', parent_id: Optional[int] = None) -> Span:
+        span = Span(id=len(self.spans), parent_id=parent_id, kind=kind, name=name, puzzle=puzzle,
+                    start=time.time() - self.started_at)
+        self.spans.append(span)
+        return span
+
+    def to_openmetrics(self) -> str:
+        """Сводные метрики запуска в текстовом формате OpenMetrics"""
+        durations: Dict[tuple, List[float]] = defaultdict(list)
+        totals: Dict[str, Dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        for span in self.spans:
+            labels = (('kind', span.kind), ('name', span.name))
+            durations[labels].append(span.duration)
+            totals['aoc_llm_prompt_tokens'][labels] += span.prompt_tokens
+            totals['aoc_llm_completion_tokens'][labels] += span.completion_tokens
+            totals['aoc_llm_cache_hits'][labels] += span.llm_cache_hits
+            totals['aoc_exec_cpu_seconds'][labels] += span.exec_cpu_time
+            totals['aoc_http_downloaded_bytes'][labels] += span.bytes_downloaded
+
+        lines = [
+            '# TYPE aoc_span_duration_seconds summary',
+            '# HELP aoc_span_duration_seconds Wall time of graph nodes and nested operations.',
+        ]
+        for labels, values in durations.items():
+            lines.append(f'aoc_span_duration_seconds_sum{format_labels(labels)} {sum(values):.6f}')
+            lines.append(f'aoc_span_duration_seconds_count{format_labels(labels)} {len(values)}')
+        for metric, field in (('aoc_llm_time_to_first_token_seconds', 'time_to_first_token'),
+                              ('aoc_llm_time_to_tool_call_seconds', 'time_to_tool_call')):
+            timings = [getattr(span, field) for span in self.spans if getattr(span, field) is not None]
+            if timings:
+                lines.append(f'# TYPE {metric} summary')
+                lines.append(f'{metric}_sum {sum(timings):.6f}')
+                lines.append(f'{metric}_count {len(timings)}')
+        for metric, values in totals.items():
+            lines.append(f'# TYPE {metric} counter')
+            for labels, value in values.items():
+                if value:
+                    lines.append(f'{metric}_total{format_labels(labels)} {value:g}')
+        lines.append('# TYPE aoc_exec_max_rss_bytes gauge')
+        max_rss_kb = max((span.exec_max_rss_kb for span in self.spans), default=0)
+        lines.append(f'aoc_exec_max_rss_bytes {max_rss_kb * 1024}')
+        lines.append('# TYPE aoc_process_max_rss_bytes gauge')
+        process_rss_kb = max((span.rss_kb for span in self.spans), default=0)
+        lines.append(f'aoc_process_max_rss_bytes {process_rss_kb * 1024}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, dirpath: Path = TRACES_DIRPATH) -> Path:
+        dirpath = Path(dirpath)
+        dirpath.mkdir(parents=True, exist_ok=True)
+        json_path = dirpath / f'{self.run_id}.json'
+        json_path.write_text(self.model_dump_json(indent=1), encoding='utf-8')
+        (dirpath / f'{self.run_id}.prom').write_text(self.to_openmetrics(), encoding='utf-8')
+        return json_path
+
+
+# Трассы по идентификатору потока графа; текущий отрезок и задача - в контексте асинхронной задачи
+_traces: Dict[str, RunTrace] = {}
+_current_trace: contextvars.ContextVar[Optional[RunTrace]] = contextvars.ContextVar('current_trace', default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+def _get_thread_id(config: Optional[RunnableConfig]) -> str:
+    if not config:
+        return 'default'
+    return str(config.get('configurable', {}).get('thread_id', 'default'))
+
+
+def get_run_trace(config: Optional[RunnableConfig] = None) -> RunTrace:
+    thread_id = _get_thread_id(config)
+    if thread_id not in _traces:
+        _traces[thread_id] = RunTrace(run_id=f'{int(time.time())}-{thread_id}-{uuid.uuid4().hex[:6]}',
+                                      started_at=time.time())
+    return _traces[thread_id]
+
+
+def finish_run_trace(config: Optional[RunnableConfig] = None) -> Optional[Path]:
+    """Сохранение трассы запуска. Следующий запуск в том же потоке начнет новую трассу"""
+    trace = _traces.pop(_get_thread_id(config), None)
+    if trace is None:
+        return None
+    trace.finished_at = time.time()
+    return trace.save()
+
+
+def get_rss_kb() -> int:
+    """Текущая резидентная память процесса. Вне Linux не измеряется (0)"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def _get_puzzle_name(state) -> str:
+    if not isinstance(state, dict):
+        return ''
+    details = state.get('current_puzzle_details')
+    if details is not None:
+        return f'{details.name} (часть {details.level})'
+    links = state.get('todo_puzzle_links') or []
+    return links[0] if len(links) == 1 else ''
+
+
+@asynccontextmanager
+async def trace_span(kind: str, name: str):
+    """Дочерний отрезок текущего узла. Вне трассируемого узла ничего не записывает"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    span = trace.start_span(kind, name, puzzle=parent.puzzle if parent else '',
+                            parent_id=parent.id if parent else None)
+    token = _current_span.set(span)
+    start = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.error = repr(e)
+        raise
+    finally:
+        span.duration = time.perf_counter() - start
+        _current_span.reset(token)
+
+
+def traced(kind: str):
+    """Декоратор асинхронной функции или метода, записывающий его вызов как отрезок"""
+
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with trace_span(kind, func.__name__):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_node(node: Callable) -> Callable:
+    """Обертка узла графа: время узла и всех вложенных операций попадает в трассу запуска"""
+
+    @functools.wraps(node)
+    async def wrapper(state, config: RunnableConfig):
+        trace = get_run_trace(config)
+        parent = _current_span.get() if _current_trace.get() is trace else None
+        span = trace.start_span('node', node.__name__, puzzle=_get_puzzle_name(state),
+                                parent_id=parent.id if parent else None)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(span)
+        rss_before = get_rss_kb()
+        start = time.perf_counter()
+        try:
+            return await node(state, config)
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            span.rss_kb = get_rss_kb()
+            span.rss_delta_kb = span.rss_kb - rss_before
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+    return wrapper
+
+
+def record_llm_usage(*messages) -> None:
+    """Токены запроса и ответа модели (usage_metadata сообщений) в текущий отрезок. Ответы из кэша - отдельно"""
+    span = _current_span.get()
+    if span is None:
+        return
+    for message in messages:
+        if (getattr(message, 'response_metadata', None) or {}).get(LLM_CACHE_HIT_KEY):
+            span.llm_cache_hits += 1
+            continue
+        usage = getattr(message, 'usage_metadata', None) or {}
+        span.prompt_tokens += usage.get('input_tokens', 0)
+        span.completion_tokens += usage.get('output_tokens', 0)
+
+
+def record_stream_timing(time_to_first_token: Optional[float], time_to_tool_call: Optional[float]) -> None:
+    span = _current_span.get()
+    if span is None:
+        return
+    span.time_to_first_token = time_to_first_token
+    span.time_to_tool_call = time_to_tool_call
+
+
+def record_exec(cpu_time: float, max_rss_kb: int) -> None:
+    span = _current_span.get()
+    if span is None:
+        return
+    span.exec_cpu_time += cpu_time
+    span.exec_max_rss_kb = max(span.exec_max_rss_kb, max_rss_kb)
+
+
+def record_download(size: int) -> None:
+    span = _current_span.get()
+    if span is None:
+        return
+    span.bytes_downloaded += size
+
+
+def _aggregate(spans: List[Span]) -> Dict[int, Dict[str, float]]:
+    """Суммарные метрики отрезков вместе со всеми потомками"""
+    children: Dict[Optional[int], List[Span]] = defaultdict(list)
+    for span in spans:
+        children[span.parent_id].append(span)
+
+    totals = {}
+
+    def visit(span: Span) -> Dict[str, float]:
+        total = {
+            'prompt_tokens': span.prompt_tokens,
+            'completion_tokens': span.completion_tokens,
+            'exec_cpu_time': span.exec_cpu_time,
+            'bytes_downloaded': span.bytes_downloaded,
+        }
+        for child in children[span.id]:
+            for key, value in visit(child).items():
+                total[key] += value
+        totals[span.id] = total
+        return total
+
+    for root in children[None]:
+        visit(root)
+    return totals
+
+
+def format_breakdown(trace: RunTrace, width: int = 40) -> str:
+    """Разбивка времени запуска по задачам, узлам и вложенным операциям в виде полос"""
+    totals = _aggregate(trace.spans)
+    children: Dict[Optional[int], List[Span]] = defaultdict(list)
+    for span in trace.spans:
+        children[span.parent_id].append(span)
+
+    by_puzzle: Dict[str, List[Span]] = defaultdict(list)
+    for span in children[None]:
+        by_puzzle[span.puzzle or 'вне задач'].append(span)
+
+    lines = []
+    run_time = (trace.finished_at or time.time()) - trace.started_at
+    lines.append(f'Запуск {trace.run_id}: {run_time:.1f} с')
+    for puzzle, roots in by_puzzle.items():
+        puzzle_time = sum(span.duration for span in roots) or 1e-9
+        lines.append(f'\n{puzzle}: {puzzle_time:.1f} с')
+
+        def walk(group: List[Span], depth: int) -> None:
+            merged: Dict[tuple, List[Span]] = defaultdict(list)
+            for span in group:
+                merged[(span.kind, span.name)].append(span)
+            for (kind, name), spans in sorted(merged.items(), key=lambda item: -sum(s.duration for s in item[1])):
+                duration = sum(span.duration for span in spans)
+                bar = '█' * max(1, round(width * duration / puzzle_time))
+                details = []
+                prompt_tokens = sum(totals[span.id]['prompt_tokens'] for span in spans)
+                completion_tokens = sum(totals[span.id]['completion_tokens'] for span in spans)
+                if prompt_tokens or completion_tokens:
+                    details.append(f'токены {prompt_tokens}+{completion_tokens}')
+                cpu_time = sum(totals[span.id]['exec_cpu_time'] for span in spans)
+                if cpu_time:
+                    details.append(f'cpu {cpu_time:.2f} с')
+                downloaded = sum(totals[span.id]['bytes_downloaded'] for span in spans)
+                if downloaded:
+                    details.append(f'{downloaded / 1024:.1f} КиБ')
+                first_token = [span.time_to_first_token for span in spans if span.time_to_first_token is not None]
+                if first_token:
+                    details.append(f'первый токен {sum(first_token) / len(first_token):.2f} с')
+                tool_call = [span.time_to_tool_call for span in spans if span.time_to_tool_call is not None]
+                if tool_call:
+                    details.append(f'вызов инструмента {sum(tool_call) / len(tool_call):.2f} с')
+                suffix = f' [{", ".join(details)}]' if details else ''
+                lines.append(
+                    f'{"  " * depth}{bar} {duration:7.2f} с  {kind}: {name} x{len(spans)}{suffix}'
+                )
+                walk([child for span in spans for child in children[span.id]], depth + 1)
+
+        walk(roots, 1)
+    return '\n'.join(lines)
+
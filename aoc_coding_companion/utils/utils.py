@@ -1,71 +1,182 @@
 import os
+import time
+import asyncio
 from logging import Logger
+from typing import Callable, Dict, Optional
 from functools import lru_cache
 
-import telepot
-from langchain_openai import ChatOpenAI
+from langchain_core.caches import BaseCache
 from langchain_core.runnables.config import RunnableConfig
-from langchain_gigachat.chat_models.gigachat import GigaChat
 from langchain_core.language_models.chat_models import BaseChatModel
 
 from aoc_coding_companion.utils.logger import get_logger
+from aoc_coding_companion.utils.constants import (
+    DEFAULT_MAX_CONCURRENT_PUZZLES,
+    DEFAULT_PROMPT_TOKEN_BUDGET,
+    DEFAULT_SELF_CONSISTENCY_SAMPLES,
+    DEFAULT_SELF_CONSISTENCY_MIN_AGREEMENT,
+    DEFAULT_VERIFY_EXAMPLES,
+    DEFAULT_PREFETCH_COUNT,
+    DEFAULT_STREAMING,
+    DEFAULT_LLM_CACHE,
+    DEFAULT_EXEC_SOFT_TIMEOUT,
+    DEFAULT_SOLUTION_LIBRARY_TOP_K,
+    AOC_BASE_URL,
+)
+from aoc_coding_companion.utils.http_pool import get_parser_pool
+from aoc_coding_companion.utils.llm_cache import get_llm_cache, set_llm_cache_factory
+from aoc_coding_companion.utils.notifier import get_telegram_notifier, flush_telegram_notifiers
 from aoc_coding_companion.utils.parser import ParserConfig, AdventOfCodeParser
 
 
-@lru_cache(maxsize=4)
-def get_model_by_name(model_name: str) -> BaseChatModel:
-    if model_name == 'openai-omni':
-        model = ChatOpenAI(
-            temperature=1,
-            request_timeout=90.0,
-            model='gpt-4o'
-        )
-    elif model_name == 'giga-pro':
-        model = GigaChat(
-            model='GigaChat-Pro',
-            temperature=1,
-            top_p=1,
-            timeout=90.0,
-            verify_ssl_certs=False,
-            profanity_check=False,
-        )
-    elif model_name == 'giga-max':
-        model = GigaChat(
-            model='GigaChat-Max',
-            temperature=1,
-            top_p=1,
-            timeout=90.0,
-            verify_ssl_certs=False,
-            profanity_check=False,
-        )
-    else:
+def _make_openai_omni() -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        temperature=1,
+        request_timeout=90.0,
+        model='gpt-4o'
+    )
+
+
+def _make_gigachat(model: str) -> BaseChatModel:
+    from langchain_gigachat.chat_models.gigachat import GigaChat
+    return GigaChat(
+        model=model,
+        temperature=1,
+        top_p=1,
+        timeout=90.0,
+        verify_ssl_certs=False,
+        profanity_check=False,
+    )
+
+
+# Реестр моделей по имени из ConfigSchema.model. Модуль провайдера импортируется только при создании модели
+MODEL_REGISTRY: Dict[str, Callable[[], BaseChatModel]] = {
+    'openai-omni': _make_openai_omni,
+    'giga-pro': lambda: _make_gigachat('GigaChat-Pro'),
+    'giga-max': lambda: _make_gigachat('GigaChat-Max'),
+}
+
+
+def register_model(model_name: str, factory: Callable[[], BaseChatModel]) -> None:
+    """Добавление своей модели в реестр (например, локальной или тестовой)"""
+    MODEL_REGISTRY[model_name] = factory
+    get_model_by_name.cache_clear()
+
+
+def register_llm_cache(factory: Callable[[str], BaseCache]) -> None:
+    """Замена кэша ответов моделей (по умолчанию SQLiteLLMCache). Фабрика получает имя модели"""
+    set_llm_cache_factory(factory)
+    get_model_by_name.cache_clear()
+
+
+@lru_cache(maxsize=8)
+def get_model_by_name(model_name: str, cached: bool = False) -> BaseChatModel:
+    """Модель из реестра. С cached=True одинаковые запросы отвечаются из кэша ответов модели"""
+    if model_name not in MODEL_REGISTRY:
         raise ValueError(f'Модель с именем "{model_name}" не поддерживается')
+    model = MODEL_REGISTRY[model_name]()
+    # cache=False отключает и глобальный кэш LangChain
+    model.cache = get_llm_cache(model_name) if cached else False
     return model
 
 
 def send_telegram_message(token: str, chat_id: str, message: str) -> None:
+    import telepot
     bot = telepot.Bot(token)
     bot.sendMessage(chat_id, message)
 
 
 def send_telegram_message_by_config(message: str, config: RunnableConfig) -> None:
+    """Оповещение в телеграм. Внутри цикла событий сообщение ставится в фоновую очередь и не блокирует узел"""
     try:
         chat_id = config['configurable'].get('chat_id', os.getenv('TELEGRAM_CHAT_ID'))
         if chat_id is None:
             return
         token = os.environ['TELEGRAM_BOT_TOKEN']
-        send_telegram_message(token, chat_id, message)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            send_telegram_message(token, chat_id, message)
+        else:
+            get_telegram_notifier(token, chat_id).notify(message)
     except Exception as e:
         logger = get_logger_by_config(config)
         logger.error(f'Ошибка отправки сообщения в телеграм: {e}')
 
 
-def get_model_by_config(config: RunnableConfig) -> BaseChatModel:
-    return get_model_by_name(config['configurable'].get('model', 'openai-omni'))
+async def flush_telegram_messages_by_config(config: RunnableConfig) -> None:
+    """Дожидается отправки накопленных оповещений (вызывается в конце графа)"""
+    try:
+        await flush_telegram_notifiers()
+    except Exception as e:
+        logger = get_logger_by_config(config)
+        logger.error(f'Ошибка отправки сообщений в телеграм: {e}')
+
+
+def get_model_by_config(config: RunnableConfig, cached: Optional[bool] = None) -> BaseChatModel:
+    """Модель из конфигурации. cached=None - кэш ответов по ключу llm_cache конфигурации"""
+    if cached is None:
+        cached = get_llm_cache_by_config(config)
+    return get_model_by_name(config['configurable'].get('model', 'openai-omni'), cached)
 
 
 def get_leaderboard_id_by_config(config: RunnableConfig) -> BaseChatModel:
-    return config['configurable'].get('leaderboard_id', os.environ['AOC_LEADERBOARD_ID'])
+    return config['configurable'].get('leaderboard_id') or os.environ['AOC_LEADERBOARD_ID']
+
+
+def get_max_concurrent_puzzles_by_config(config: RunnableConfig) -> int:
+    return max(1, int(config['configurable'].get('max_concurrent_puzzles', DEFAULT_MAX_CONCURRENT_PUZZLES)))
+
+
+def get_prompt_token_budget_by_config(config: RunnableConfig) -> int:
+    return int(config['configurable'].get('prompt_token_budget', DEFAULT_PROMPT_TOKEN_BUDGET))
+
+
+def get_self_consistency_samples_by_config(config: RunnableConfig) -> int:
+    return max(1, int(config['configurable'].get('self_consistency_samples', DEFAULT_SELF_CONSISTENCY_SAMPLES)))
+
+
+def get_self_consistency_min_agreement_by_config(config: RunnableConfig) -> float:
+    return float(config['configurable'].get('self_consistency_min_agreement', DEFAULT_SELF_CONSISTENCY_MIN_AGREEMENT))
+
+
+def get_verify_examples_by_config(config: RunnableConfig) -> bool:
+    return bool(config['configurable'].get('verify_examples', DEFAULT_VERIFY_EXAMPLES))
+
+
+def get_prefetch_count_by_config(config: RunnableConfig) -> int:
+    return max(0, int(config['configurable'].get('prefetch_count', DEFAULT_PREFETCH_COUNT)))
+
+
+def get_streaming_by_config(config: RunnableConfig) -> bool:
+    return bool(config['configurable'].get('streaming', DEFAULT_STREAMING))
+
+
+def get_llm_cache_by_config(config: RunnableConfig) -> bool:
+    return bool(config['configurable'].get('llm_cache', DEFAULT_LLM_CACHE))
+
+
+def get_exec_soft_timeout_by_config(config: RunnableConfig) -> Optional[float]:
+    """Мягкий срок запуска кода на настоящих входных данных, None - только жесткий срок"""
+    soft_timeout = float(config['configurable'].get('exec_soft_timeout', DEFAULT_EXEC_SOFT_TIMEOUT) or 0)
+    return soft_timeout if soft_timeout > 0 else None
+
+
+def get_solution_library_top_k_by_config(config: RunnableConfig) -> int:
+    return max(0, int(config['configurable'].get('solution_library_top_k', DEFAULT_SOLUTION_LIBRARY_TOP_K)))
+
+
+def get_submit_deadline_by_config(config: RunnableConfig) -> Optional[float]:
+    """Крайний срок отправки ответа (unix-время), если задано максимальное ожидание блокировки сайта"""
+    max_submit_wait = config['configurable'].get('max_submit_wait')
+    if max_submit_wait is None:
+        return None
+    return time.time() + float(max_submit_wait)
+
+
+def get_thread_id_by_config(config: RunnableConfig) -> str:
+    return str(config['configurable'].get('thread_id', 'default'))
 
 
 def get_logger_by_config(config: RunnableConfig) -> Logger:
@@ -75,14 +186,24 @@ def get_logger_by_config(config: RunnableConfig) -> Logger:
     return logger
 
 
-def get_parser_by_config(config: RunnableConfig) -> AdventOfCodeParser:
-    session_token = config['configurable'].get('session_token', os.environ['AOC_SESSION_TOKEN'])
-    config = ParserConfig(
+def get_parser_config_by_config(config: RunnableConfig) -> ParserConfig:
+    session_token = config['configurable'].get('session_token') or os.environ['AOC_SESSION_TOKEN']
+    return ParserConfig(
         headers={
             'User-Agent': os.environ.get('AOC_USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0) Gecko/20100101 Firefox/92.0'),
         },
         cookies={
             'session': session_token,
-        }
+        },
+        base_url=config['configurable'].get('base_url', os.environ.get('AOC_BASE_URL', AOC_BASE_URL)),
     )
-    return AdventOfCodeParser(config)
+
+
+def get_parser_by_config(config: RunnableConfig) -> AdventOfCodeParser:
+    """Отдельный парсер со своей сессией (используется как асинхронный контекстный менеджер)"""
+    return AdventOfCodeParser(get_parser_config_by_config(config))
+
+
+async def borrow_parser_by_config(config: RunnableConfig) -> AdventOfCodeParser:
+    """Парсер из общего пула соединений процесса. Закрывать его не нужно"""
+    return await get_parser_pool().get(get_parser_config_by_config(config))
@@ -0,0 +1,77 @@
+import math
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage
+
+from aoc_coding_companion.utils.models import TaskAnswer
+from aoc_coding_companion.utils.execution import ExecOutcome
+
+
+class VoteResult(BaseModel):
+    answer: Optional[str] = None
+    votes: int = 0
+    total: int = 0
+    counts: dict = {}
+    failed: int = 0
+    consensus: bool = False
+    # Индекс кандидата, чей код считается победившим
+    winner_index: Optional[int] = None
+
+    def __str__(self) -> str:
+        counts = ', '.join(f'"{answer}": {votes}' for answer, votes in self.counts.items()) or 'нет'
+        return (
+            f"Голосование(ответ={self.answer}, голосов={self.votes} из {self.total}, "
+            f"ошибок={self.failed}, согласие={self.consensus}, распределение: {counts})"
+        )
+
+
+def extract_answer(outcome: ExecOutcome) -> Optional[str]:
+    """Ответ программы - последняя непустая строка вывода. Ошибки и таймауты не голосуют"""
+    if outcome.timed_out or outcome.error:
+        return None
+    lines = [line.strip() for line in outcome.output.splitlines() if line.strip()]
+    return lines[-1] if lines else None
+
+
+def vote_outcomes(outcomes: List[ExecOutcome], min_agreement: float) -> VoteResult:
+    """Выбор ответа большинством (или относительным большинством) голосов независимых решений"""
+    answers = [extract_answer(outcome) for outcome in outcomes]
+    counts = Counter(answer for answer in answers if answer is not None)
+    result = VoteResult(total=len(outcomes), counts=dict(counts.most_common()), failed=answers.count(None))
+    if not counts:
+        return result
+
+    ranking = counts.most_common(2)
+    result.answer, result.votes = ranking[0]
+    result.winner_index = answers.index(result.answer)
+    required = max(1, math.ceil(len(outcomes) * min_agreement))
+    # Ничья между лидерами - это несогласие, а не ответ
+    unique_leader = len(ranking) == 1 or ranking[1][1] < result.votes
+    result.consensus = unique_leader and result.votes >= required
+    return result
+
+
+def make_answer_message(answer: str) -> AIMessage:
+    """Сообщение модели с финальным ответом, выбранным голосованием"""
+    return AIMessage(
+        content='',
+        tool_calls=[{
+            'name': TaskAnswer.__name__,
+            'args': {'answer': answer},
+            'id': f'vote_{uuid.uuid4().hex}',
+            'type': 'tool_call',
+        }]
+    )
+
+
+def describe_disagreement(vote: VoteResult) -> str:
+    """Подсказка модели, когда независимые решения не сошлись"""
+    outputs = '; '.join(f'"{answer}" from {votes} solution(s)' for answer, votes in vote.counts.items())
+    return (
+        f'{vote.total} independent solutions were run and they do not agree. '
+        f'Outputs: {outputs or "none"}. Failed or timed out: {vote.failed}. '
+        f'Reread the task carefully, find the mistake and write a corrected solution.'
+    )
@@ -0,0 +1,352 @@
+"""Локальный стенд Advent of Code для бенчмарков без обращения к настоящему сайту.
+
+Отдает календарь, условия задач, входные данные, ответы на отправку и приватный лидерборд
+(HTML и JSON) синтетического сезона с детерминированными задачами. Разметка страниц повторяет
+сохраненные страницы из data/fixtures, поэтому их разбирает тот же AdventOfCodeParser.
+Блокировка после неверного ответа и задержка ответов сервера настраиваются.
+
+Запуск отдельно (например, чтобы направить на него граф через AOC_BASE_URL):
+    python -m benchmarks.aoc_server --port 8080 --days 25 --cooldown 60
+"""
+import math
+import time
+import random
+import asyncio
+import argparse
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+from pydantic import BaseModel
+
+
+# Место для пути к файлу входных данных в записанных решениях
+INPUT_FILEPATH_PLACEHOLDER = '{input_filepath}'
+EXAMPLE_INPUT = '5 1 9 5\n7 5 3\n2 4 6 8'
+NUMBER_WORDS = {1: 'one', 2: 'two', 3: 'three', 4: 'four', 5: 'five', 10: 'ten'}
+
+READ_ROWS_CODE = (
+    f"with open(r'{INPUT_FILEPATH_PLACEHOLDER}') as file:\n"
+    "    rows = [list(map(int, line.split())) for line in file if line.strip()]\n"
+)
+
+
+def solve_part_one(rows: List[List[int]], day: int) -> int:
+    return sum(max(row) - min(row) for row in rows) * day
+
+
+def solve_part_two(rows: List[List[int]], day: int) -> int:
+    return sum(sum(row) % (day + 6) for row in rows)
+
+
+def parse_rows(text: str) -> List[List[int]]:
+    return [list(map(int, line.split())) for line in text.splitlines() if line.strip()]
+
+
+class SeasonDay(BaseModel):
+    day: int
+    name: str
+    input: str
+    # Ответы и ответы на пример по частям: [первая, вторая]
+    answers: List[str]
+    example_answers: List[str]
+    # Верные решения частей с INPUT_FILEPATH_PLACEHOLDER вместо пути к входным данным
+    solutions: List[str]
+
+
+class Season(BaseModel):
+    year: int
+    days: List[SeasonDay]
+
+    def get_day(self, day: int) -> Optional[SeasonDay]:
+        return self.days[day - 1] if 1 <= day <= len(self.days) else None
+
+
+def make_season(year: int = 2024, days: int = 25, rows: int = 1000, seed: int = 0) -> Season:
+    """Синтетический сезон: в каждой задаче строки чисел, части отличаются формулой и зависят от номера дня"""
+    rng = random.Random(seed)
+    example_rows = parse_rows(EXAMPLE_INPUT)
+    season_days = []
+    for day in range(1, days + 1):
+        input_rows = [[rng.randint(1, 999) for _ in range(rng.randint(3, 12))] for _ in range(rows)]
+        season_days.append(SeasonDay(
+            day=day,
+            name=f'Synthetic Checksum {day}',
+            input='\n'.join(' '.join(map(str, row)) for row in input_rows) + '\n',
+            answers=[str(solve_part_one(input_rows, day)), str(solve_part_two(input_rows, day))],
+            example_answers=[str(solve_part_one(example_rows, day)), str(solve_part_two(example_rows, day))],
+            solutions=[
+                READ_ROWS_CODE + f'print(sum(max(row) - min(row) for row in rows) * {day})\n',
+                READ_ROWS_CODE + f'print(sum(sum(row) % {day + 6} for row in rows))\n',
+            ],
+        ))
+    return Season(year=year, days=season_days)
+
+
+class StandInStats(BaseModel):
+    requests: int = 0
+    inputs: int = 0
+    submissions: int = 0
+    wrong_answers: int = 0
+    rate_limited: int = 0
+
+
+class Member(BaseModel):
+    id: int
+    name: str
+    # Время получения звезд по (день, часть)
+    stars: Dict[Tuple[int, int], float] = {}
+
+
+class AdventOfCodeStandIn:
+    """Сервер стенда с состоянием одного пользователя и несколькими соперниками в лидерборде.
+
+    cooldown - сколько секунд после неверного ответа сайт не принимает ответы по задаче
+    (0 - без блокировки), latency - искусственная задержка каждого ответа сервера.
+    """
+
+    def __init__(self, season: Season, cooldown: float = 0.0, latency: float = 0.0,
+                 user_name: str = 'Benchmark User', leaderboard_id: int = 1, rivals: int = 5):
+        self.season = season
+        self.cooldown = cooldown
+        self.latency = latency
+        self.leaderboard_id = leaderboard_id
+        self.stats = StandInStats()
+        self.me = Member(id=1, name=user_name)
+        self.rivals = self._make_rivals(rivals)
+        self._blocked_until: Dict[int, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    def _make_rivals(self, count: int) -> List[Member]:
+        rivals = []
+        season_start = time.time() - 30 * 24 * 60 * 60
+        for index in range(count):
+            stars = {}
+            # Каждый следующий соперник решил на несколько дней меньше и медленнее
+            for day in range(1, max(0, len(self.season.days) - 3 * index) + 1):
+                solved_at = season_start + day * 24 * 60 * 60 + (index + 1) * 600
+                stars[(day, 1)] = solved_at
+                stars[(day, 2)] = solved_at + (index + 1) * 300
+            rivals.append(Member(id=index + 2, name=f'rival-{index + 1}', stars=stars))
+        return rivals
+
+    @property
+    def stars(self) -> int:
+        return len(self.me.stars)
+
+    def level_of(self, day: int) -> int:
+        """Текущая нерешенная часть задачи (3 - решены обе)"""
+        return 1 + sum((day, level) in self.me.stars for level in (1, 2))
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        year = self.season.year
+        app.router.add_get(f'/{year}/', self.calendar)
+        app.router.add_get(f'/{year}', self.calendar)
+        app.router.add_get(f'/{year}/day/{{day:\\d+}}', self.day_page)
+        app.router.add_get(f'/{year}/day/{{day:\\d+}}/input', self.day_input)
+        app.router.add_post(f'/{year}/day/{{day:\\d+}}/answer', self.answer)
+        app.router.add_get(f'/{year}/leaderboard/private/view/{{board:\\d+}}', self.leaderboard)
+        app.router.add_get(f'/{year}/leaderboard/private/view/{{board:\\d+}}.json', self.leaderboard_json)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запуск в текущем цикле событий. Возвращает адрес для base_url (port=0 - свободный порт)"""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        return f'http://{bound_host}:{bound_port}'
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.stats.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _page(self, main: str, title: str) -> web.Response:
+        return web.Response(
+            text=(
+                f'<!DOCTYPE html>\n<html lang="en-us">\n<head>\n<meta charset="utf-8"/>\n<title>{escape(title)}</title>\n'
+                f'</head><body>\n<header><div><h1 class="title-global"><a href="/">Advent of Code</a></h1>'
+                f'<div class="user">{escape(self.me.name)} <span class="star-count">{self.stars}*</span></div></div>'
+                f'</header>\n<main>\n{main}\n</main>\n</body>\n</html>'
+            ),
+            content_type='text/html',
+        )
+
+    def _get_day(self, request: web.Request) -> SeasonDay:
+        season_day = self.season.get_day(int(request.match_info['day']))
+        if season_day is None:
+            raise web.HTTPNotFound(text='404 Not Found')
+        return season_day
+
+    async def calendar(self, request: web.Request) -> web.Response:
+        year = self.season.year
+        lines = []
+        for day in range(len(self.season.days), 0, -1):
+            level = self.level_of(day)
+            status = {1: '', 2: 'calendar-complete', 3: 'calendar-verycomplete'}[level]
+            lines.append(
+                f'<a aria-label="Day {day}" href="/{year}/day/{day}" class="calendar-day{day} {status}">'
+                f'<span class="calendar-color-g">.~~~.</span>  <span class="calendar-day">{day:>2}</span> '
+                f'<span class="calendar-mark-complete">*</span><span class="calendar-mark-verycomplete">*</span></a>'
+            )
+        calendar = '\n'.join(lines)
+        return self._page(f'<pre class="calendar">{calendar}\n</pre>', f'Advent of Code {year}')
+
+    def _render_part(self, season_day: SeasonDay, level: int) -> str:
+        title = f'--- Day {season_day.day}: {season_day.name} ---' if level == 1 else '--- Part Two ---'
+        formula = (
+            f'the difference between the largest and the smallest number of each row, '
+            f'summed over all rows and multiplied by {season_day.day}'
+            if level == 1 else
+            f'the sum of each row modulo {season_day.day + 6}, summed over all rows'
+        )
+        example = f'<pre><code>{escape(EXAMPLE_INPUT)}\n</code></pre>' if level == 1 else ''
+        heading_id = ' id="part2"' if level == 2 else ''
+        return (
+            f'<article class="day-desc"><h2{heading_id}>{title}</h2>'
+            f'<p>Each line of the puzzle input is a row of numbers. The checksum is {formula}.</p>'
+            f'<p>For example:</p>{example}'
+            f'<p>In this example, the checksum is <code><em>{season_day.example_answers[level - 1]}</em></code>.</p>'
+            f'<p><em>What is the checksum of your puzzle input?</em></p></article>'
+        )
+
+    async def day_page(self, request: web.Request) -> web.Response:
+        season_day = self._get_day(request)
+        level = self.level_of(season_day.day)
+        parts = [self._render_part(season_day, 1)]
+        if level >= 2:
+            parts.append(f'<p>Your puzzle answer was <code>{season_day.answers[0]}</code>.</p>')
+            parts.append(self._render_part(season_day, 2))
+        if level == 3:
+            parts.append(f'<p>Your puzzle answer was <code>{season_day.answers[1]}</code>.</p>')
+            parts.append('<p class="day-success">Both parts of this puzzle are complete! '
+                         'They provide two gold stars: **</p>')
+        else:
+            if level == 2:
+                parts.append('<p class="day-success">The first half of this puzzle is complete! '
+                             'It provides one gold star: *</p>')
+            parts.append(
+                f'<form method="post" action="{season_day.day}/answer"><input type="hidden" name="level" '
+                f'value="{level}"/><p>Answer: <input type="text" name="answer" autocomplete="off"/> '
+                f'<input type="submit" value="[Submit]"/></p></form>'
+            )
+        return self._page('\n'.join(parts), f'Day {season_day.day} - Advent of Code {self.season.year}')
+
+    async def day_input(self, request: web.Request) -> web.Response:
+        season_day = self._get_day(request)
+        if 'session' not in request.cookies:
+            raise web.HTTPBadRequest(text='Puzzle inputs differ by user.  Please log in to get your puzzle input.\n')
+        self.stats.inputs += 1
+        return web.Response(text=season_day.input, content_type='text/plain')
+
+    def _answer_page(self, season_day: SeasonDay, text: str) -> web.Response:
+        return self._page(
+            f'<article><p>{text} <a href="/{self.season.year}/day/{season_day.day}">'
+            f'[Return to Day {season_day.day}]</a></p></article>',
+            f'Day {season_day.day} - Advent of Code {self.season.year}'
+        )
+
+    async def answer(self, request: web.Request) -> web.Response:
+        season_day = self._get_day(request)
+        form = await request.post()
+        self.stats.submissions += 1
+        level = int(form.get('level', 0))
+        answer = str(form.get('answer', '')).strip()
+
+        wait_seconds = self._blocked_until.get(season_day.day, 0.0) - time.time()
+        if wait_seconds > 0:
+            self.stats.rate_limited += 1
+            minutes, seconds = divmod(math.ceil(wait_seconds), 60)
+            left = f'{minutes}m {seconds}s' if minutes else f'{seconds}s'
+            return self._answer_page(
+                season_day,
+                'You gave an answer too recently; you have to wait after submitting an answer before trying '
+                f'again.  You have {left} left to wait.'
+            )
+        if level != self.level_of(season_day.day):
+            return self._answer_page(
+                season_day, "You don't seem to be solving the right level.  Did you already complete it?"
+            )
+        if answer == season_day.answers[level - 1]:
+            self.me.stars[(season_day.day, level)] = time.time()
+            return self._answer_page(season_day, "That's the right answer!  You are one gold star closer.")
+
+        self.stats.wrong_answers += 1
+        text = "That's not the right answer.  If you're stuck, make sure you're using the full input data."
+        if self.cooldown > 0:
+            self._blocked_until[season_day.day] = time.time() + self.cooldown
+            minutes = math.ceil(self.cooldown / 60)
+            amount = f'{NUMBER_WORDS.get(minutes, minutes)} minute{"s" if minutes > 1 else ""}'
+            text += f'  Please wait {amount} before trying again.'
+        return self._answer_page(season_day, text)
+
+    def _scores(self) -> List[Tuple[Member, int]]:
+        """Очки как на сайте: за каждую звезду столько очков, сколько участников получили ее не раньше"""
+        members = [self.me] + self.rivals
+        scores = {member.id: 0 for member in members}
+        for key in {key for member in members for key in member.stars}:
+            solvers = sorted((member.stars[key], member.id) for member in members if key in member.stars)
+            for place, (_, member_id) in enumerate(solvers):
+                scores[member_id] += len(members) - place
+        ranked = sorted(members, key=lambda member: (-scores[member.id], max(member.stars.values(), default=0)))
+        return [(member, scores[member.id]) for member in ranked]
+
+    async def leaderboard(self, request: web.Request) -> web.Response:
+        if int(request.match_info['board']) != self.leaderboard_id:
+            return self._page(f'<form method="post" action="/{self.season.year}/leaderboard/private/join">'
+                              f'<input type="text" name="code"/></form>', 'Private Leaderboard')
+        rows = []
+        for position, (member, score) in enumerate(self._scores(), start=1):
+            rows.append(
+                f'<div class="privboard-row"><span class="privboard-position">{position:>3})</span> {score} '
+                f'<span class="privboard-name">{escape(member.name)}</span></div>'
+            )
+        return self._page('<article>' + '\n'.join(rows) + '</article>', 'Private Leaderboard')
+
+    async def leaderboard_json(self, request: web.Request) -> web.Response:
+        if int(request.match_info['board']) != self.leaderboard_id:
+            return self._page('<p>You are not a member of this leaderboard.</p>', 'Private Leaderboard')
+        members = {}
+        for member, score in self._scores():
+            completion: Dict[str, Dict[str, dict]] = {}
+            for (day, level), solved_at in member.stars.items():
+                completion.setdefault(str(day), {})[str(level)] = {'get_star_ts': int(solved_at)}
+            members[str(member.id)] = {
+                'id': member.id,
+                'name': member.name,
+                'stars': len(member.stars),
+                'local_score': score,
+                'last_star_ts': int(max(member.stars.values(), default=0)),
+                'completion_day_level': completion,
+            }
+        return web.json_response({'event': str(self.season.year), 'owner_id': self.me.id, 'members': members})
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--year', type=int, default=2024)
+    arg_parser.add_argument('--days', type=int, default=25, help='Количество задач в сезоне')
+    arg_parser.add_argument('--rows', type=int, default=1000, help='Строк во входных данных каждой задачи')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--cooldown', type=float, default=0.0, help='Блокировка после неверного ответа, секунды')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Задержка каждого ответа, секунды')
+    args = arg_parser.parse_args()
+
+    season = make_season(args.year, args.days, args.rows, args.seed)
+    stand_in = AdventOfCodeStandIn(season, cooldown=args.cooldown, latency=args.latency)
+    web.run_app(stand_in.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
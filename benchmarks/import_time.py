@@ -0,0 +1,84 @@
+"""Бенчмарк времени импорта графа (холодный старт langgraph и коротких запусков по расписанию).
+
+Импортирует модуль в отдельных процессах с `python -X importtime`, печатает медиану и самые
+тяжелые модули и завершается с ошибкой, если превышен бюджет времени или загружен модуль,
+который должен импортироваться лениво (провайдеры моделей, драйвер postgres, telepot).
+
+Запуск из корня репозитория:
+    python -m benchmarks.import_time --budget 2.0
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+
+# Модули, которые не должны загружаться при импорте графа
+LAZY_MODULES = (
+    'langchain_openai',
+    'langchain_gigachat',
+    'telepot',
+    'psycopg',
+    'psycopg_pool',
+    'langgraph.checkpoint.postgres',
+)
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def measure(module: str) -> Tuple[float, Dict[str, Tuple[int, int]], List[str]]:
+    """Один холодный импорт: общее время в секундах, времена модулей (свое, суммарное) в мкс, загруженные ленивые"""
+    code = (
+        f'import sys, {module}\n'
+        f'print(",".join(name for name in {LAZY_MODULES!r} if name in sys.modules))'
+    )
+    env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=env, check=True
+    )
+    timings = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us))
+    loaded_lazy = [name for name in process.stdout.strip().split(',') if name]
+    return timings[module][1] / 1_000_000, timings, loaded_lazy
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--module', default='aoc_coding_companion.agent', help='Импортируемый модуль')
+    arg_parser.add_argument('--budget', type=float, default=2.0, help='Бюджет на медиану времени импорта, секунды')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='Количество замеров')
+    arg_parser.add_argument('--top', type=int, default=15, help='Сколько самых тяжелых модулей показать')
+    args = arg_parser.parse_args()
+
+    totals = []
+    timings = {}
+    loaded_lazy = []
+    for _ in range(args.repeat):
+        total, timings, loaded_lazy = measure(args.module)
+        totals.append(total)
+
+    median = statistics.median(totals)
+    print(f'{args.module}: медиана {median:.3f} с, минимум {min(totals):.3f} с, бюджет {args.budget:.3f} с')
+    print('\nСамые тяжелые модули по собственному времени (последний замер):')
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {self_us / 1000:8.1f} мс (всего {cumulative_us / 1000:8.1f} мс)  {name}')
+
+    failed = False
+    if loaded_lazy:
+        print(f'\nОШИБКА: при импорте загружены модули, которые должны импортироваться лениво: {loaded_lazy}')
+        failed = True
+    if median > args.budget:
+        print(f'\nОШИБКА: время импорта {median:.3f} с превышает бюджет {args.budget:.3f} с')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Микробенчмарк библиотеки решенных задач: построение TF-IDF индекса и поиск похожих.
+
+Условия задач собираются из случайных слов словаря, близкого к текстам Advent of Code.
+Библиотека пишется во временный файл и не затрагивает кэш проекта.
+
+Запуск из корня репозитория:
+    python -m benchmarks.library --entries 300
+"""
+import random
+import timeit
+import argparse
+import tempfile
+from pathlib import Path
+
+from aoc_coding_companion.utils.library import LibraryEntry, SolutionLibrary
+
+
+VOCABULARY = (
+    'elf elves grid map robot guard path wall floor tile beam mirror report level safe unsafe '
+    'instruction register program output input line number list left right distance similarity score '
+    'antenna antinode frequency region garden plot perimeter area fence side machine button prize '
+    'keypad code sequence maze reindeer step turn cost cheat track race wire gate signal network computer '
+    'lock key schematic pin height stone blink rule page order update middle equation operator calibration '
+    'disk file block checksum trail head hike warehouse box move lanternfish cycle loop position obstacle'
+).split()
+
+
+def make_description(rng: random.Random, words: int) -> str:
+    topic = rng.sample(VOCABULARY, 12)
+    # Половина слов из темы задачи, остальные из всего словаря: задачи одной темы похожи
+    return ' '.join(rng.choice(topic) if rng.random() < 0.5 else rng.choice(VOCABULARY) for _ in range(words))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--entries', type=int, default=300, help='Задач в библиотеке')
+    arg_parser.add_argument('--words', type=int, default=600, help='Слов в условии задачи')
+    arg_parser.add_argument('--top-k', type=int, default=2)
+    arg_parser.add_argument('--number', type=int, default=20, help='Количество повторов на замер')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as dirpath:
+        library = SolutionLibrary(Path(dirpath) / 'solution_library.jsonl')
+        for index in range(args.entries):
+            library.add(LibraryEntry(
+                day_url=f'https://adventofcode.com/{2015 + index // 50}/day/{index % 25 + 1}',
+                name=f'--- Day {index % 25 + 1}: Synthetic {index} ---',
+                level=index // 25 % 2 + 1,
+                description=make_description(rng, args.words),
+                code=f'print({index})',
+            ))
+        query = make_description(rng, args.words)
+
+        load_time = timeit.timeit(lambda: SolutionLibrary(library.filepath).entries, number=args.number)
+        first_build_time = timeit.timeit(lambda: SolutionLibrary(library.filepath).build_index(), number=args.number)
+        # После добавления задачи частоты термов остальных задач берутся из памяти
+        reloaded = SolutionLibrary(library.filepath)
+        reloaded.build_index()
+        build_time = timeit.timeit(reloaded.build_index, number=args.number)
+        search_time = timeit.timeit(lambda: reloaded.search(query, args.top_k, min_similarity=0.0),
+                                    number=args.number)
+        results = reloaded.search(query, args.top_k, min_similarity=0.0)
+
+    print(f'Библиотека из {args.entries} задач по {args.words} слов')
+    print(f'{"чтение файла":<40} {load_time / args.number * 1000:8.2f} мс')
+    print(f'{"чтение и первое построение индекса":<40} {first_build_time / args.number * 1000:8.2f} мс')
+    print(f'{"перестроение после добавления задачи":<40} {build_time / args.number * 1000:8.2f} мс')
+    print(f'{f"поиск top-{args.top_k}":<40} {search_time / args.number * 1000:8.2f} мс')
+    for similarity, entry in results:
+        print(f'  {similarity:.3f} {entry.name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Микробенчмарк разбора страниц Advent of Code.
+
+Сравнивает исходный способ (полное дерево через html.parser) с частичным разбором
+через SoupStrainer на каждом доступном парсере (lxml и html.parser).
+Проверяет, что результаты всех вариантов совпадают.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parse_html
+"""
+import argparse
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from aoc_coding_companion.utils.parser import AdventOfCodeParser, ParserConfig
+from aoc_coding_companion.utils.html import (
+    make_soup,
+    PARSER_BACKEND,
+    PUZZLE_STRAINER,
+    CALENDAR_STRAINER,
+    LEADERBOARD_STRAINER,
+    SUBMISSION_STRAINER,
+)
+
+
+FIXTURES_DIRPATH = Path(__file__).resolve().parent.parent / 'data' / 'fixtures'
+DAY_URL = 'https://adventofcode.com/2024/day/6'
+
+
+def make_cases(parser: AdventOfCodeParser):
+    """Страница, ее фильтр и извлечение из дерева BeautifulSoup"""
+    return [
+        ('calendar.html', CALENDAR_STRAINER, parser._extract_calendar),
+        ('day.html', PUZZLE_STRAINER, lambda soup: parser._extract_puzzle_details(soup, DAY_URL)),
+        ('leaderboard.html', LEADERBOARD_STRAINER, parser._extract_leaderboard),
+        ('answer.html', SUBMISSION_STRAINER, lambda soup: soup.find('article').get_text(strip=True)),
+    ]
+
+
+def dump(result) -> str:
+    return result.model_dump_json() if hasattr(result, 'model_dump_json') else str(result)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--number', type=int, default=20, help='Количество повторов на замер')
+    args = arg_parser.parse_args()
+
+    parser = AdventOfCodeParser(ParserConfig(headers={}, cookies={}), year=2024)
+    backends = sorted({'html.parser', PARSER_BACKEND})
+    print(f'Парсер по умолчанию: {PARSER_BACKEND}')
+
+    for filename, strainer, extract in make_cases(parser):
+        html = (FIXTURES_DIRPATH / filename).read_text(encoding='utf-8')
+        baseline = dump(extract(BeautifulSoup(html, 'html.parser')))
+        baseline_time = timeit.timeit(lambda: extract(BeautifulSoup(html, 'html.parser')), number=args.number)
+        print(f'\n{filename} ({len(html) // 1024} KiB)')
+        print(f'  {"html.parser, полное дерево":<32} {baseline_time / args.number * 1000:8.2f} мс')
+
+        variants = [
+            (f'{backend}, фильтр', lambda backend=backend: extract(make_soup(html, strainer, backend=backend)))
+            for backend in backends
+        ]
+
+        for title, run in variants:
+            if dump(run()) != baseline:
+                raise AssertionError(f'{filename}: результат варианта "{title}" отличается от исходного')
+            variant_time = timeit.timeit(run, number=args.number)
+            print(
+                f'  {title:<32} {variant_time / args.number * 1000:8.2f} мс '
+                f'(x{baseline_time / variant_time:.1f}, результат совпадает)'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Детерминированная модель для бенчмарков: воспроизводит записанные вызовы инструментов.
+
+Запись - словарь "день.часть" -> список ходов, ход - список вызовов инструментов
+({"name": ..., "args": ...}). День и часть определяются по условию задачи в запросе,
+номер хода - по количеству ответов модели в истории. Место INPUT_FILEPATH_PLACEHOLDER
+в аргументах заменяется путем к входным данным из запроса. В потоковом режиме аргументы
+вызовов отдаются фрагментами, а задержка ответа делится между ними поровну.
+
+Подключение к графу через реестр моделей:
+    register_model('replay', lambda: ReplayChatModel(recordings=load_recordings(path)))
+"""
+import re
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from aoc_coding_companion.utils.compaction import count_tokens
+
+from benchmarks.aoc_server import INPUT_FILEPATH_PLACEHOLDER
+
+
+DAY_PATTERN = re.compile(r'--- Day (\d+):')
+PART_TWO_MARK = '--- Part Two ---'
+# Совпадает с текстом developer_prompt
+INPUT_FILEPATH_PATTERN = re.compile(r'The input file is located at: "([^"]+)"')
+
+# На сколько фрагментов делятся аргументы каждого вызова в потоковом режиме
+STREAM_CHUNKS = 8
+
+Recordings = Dict[str, List[List[dict]]]
+
+
+def load_recordings(path: Path) -> Recordings:
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def save_recordings(recordings: Recordings, path: Path) -> None:
+    Path(path).write_text(json.dumps(recordings, ensure_ascii=False, indent=1), encoding='utf-8')
+
+
+def _content_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+def _substitute(value: Any, input_filepath: str) -> Any:
+    if isinstance(value, str):
+        return value.replace(INPUT_FILEPATH_PLACEHOLDER, input_filepath)
+    if isinstance(value, dict):
+        return {key: _substitute(item, input_filepath) for key, item in value.items()}
+    return value
+
+
+class ReplayChatModel(BaseChatModel):
+    recordings: Recordings
+    # Имитация времени ответа модели, секунды
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'replay'
+
+    def bind_tools(self, tools, **kwargs):
+        # Набор инструментов задан записью, параметры вызова (tool_choice) не влияют на ответ
+        return self
+
+    def _replay(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = '\n'.join(_content_text(message) for message in messages)
+        day_match = DAY_PATTERN.search(prompt)
+        filepath_match = INPUT_FILEPATH_PATTERN.search(prompt)
+        if day_match is None or filepath_match is None:
+            raise ValueError('В запросе не найдены номер дня или путь к входным данным')
+        key = f'{int(day_match.group(1))}.{2 if PART_TWO_MARK in prompt else 1}'
+        turn = sum(isinstance(message, AIMessage) for message in messages)
+        turns = self.recordings.get(key, [])
+        if turn >= len(turns):
+            raise ValueError(f'Нет записанного хода {turn} для задачи {key}')
+
+        tool_calls = [
+            {'name': call['name'], 'args': _substitute(call['args'], filepath_match.group(1)),
+             'id': f'call_{key}_{turn}_{index}'}
+            for index, call in enumerate(turns[turn])
+        ]
+        input_tokens = count_tokens(prompt)
+        output_tokens = count_tokens(json.dumps([call['args'] for call in tool_calls]))
+        message = AIMessage(
+            content='',
+            tool_calls=tool_calls,
+            usage_metadata={'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                            'total_tokens': input_tokens + output_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._replay(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._replay(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._replay(messages).generations[0].message
+        chunks = []
+        for index, tool_call in enumerate(message.tool_calls):
+            args = json.dumps(tool_call['args'], ensure_ascii=False)
+            size = max(1, -(-len(args) // STREAM_CHUNKS))
+            for offset in range(0, len(args), size):
+                first = offset == 0
+                chunks.append(AIMessageChunk(content='', tool_call_chunks=[{
+                    'name': tool_call['name'] if first else None,
+                    'id': tool_call['id'] if first else None,
+                    'args': args[offset:offset + size],
+                    'index': index,
+                }]))
+        # Последний фрагмент без содержимого с расходом токенов, как у провайдеров
+        chunks.append(AIMessageChunk(content='', usage_metadata=message.usage_metadata))
+        for chunk in chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            yield ChatGenerationChunk(message=chunk)
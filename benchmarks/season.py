@@ -0,0 +1,310 @@
+"""Сквозной бенчмарк графа на сезоне задач без настоящего сайта и платной модели.
+
+Поднимает локальный стенд Advent of Code (benchmarks.aoc_server) и направляет на него граф
+через base_url, а вместо модели регистрирует ReplayChatModel с записью решений сезона.
+Часть ответов в записи намеренно неверные, чтобы проходили и ветки повторных попыток.
+Печатает пропускную способность (задач в час), p50/p95 времени и прироста памяти по узлам
+по трассам запуска и пиковую память процесса и песочницы. С --baseline сравнивает
+с сохраненным результатом и завершается с ошибкой при регрессии (для CI).
+
+Кэши (HTTP, результатов запуска кода, блокировок отправки) на время бенчмарка переносятся
+во временную папку, если AOC_CACHE_DIR не задан, иначе повторный запуск брал бы их из кэша.
+
+Запуск из корня репозитория:
+    python -m benchmarks.season --days 25 --output season.json
+    python -m benchmarks.season --baseline season.json --tolerance 0.25
+    python -m benchmarks.season --days 5 --model-latency 2 --repeat 2
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+if 'AOC_CACHE_DIR' not in os.environ:
+    os.environ['AOC_CACHE_DIR'] = tempfile.mkdtemp(prefix='aoc-season-cache-')
+    atexit.register(shutil.rmtree, os.environ['AOC_CACHE_DIR'], True)
+
+from pydantic import BaseModel
+from langgraph.errors import GraphRecursionError
+
+from aoc_coding_companion.utils import submission
+from aoc_coding_companion.utils.utils import register_model
+from aoc_coding_companion.utils.library import get_solution_library
+from aoc_coding_companion.utils.constants import TRACES_DIRPATH, EXEC_CACHE_DIRPATH, SOLUTION_LIBRARY_FILEPATH
+from aoc_coding_companion.utils.http_pool import close_parser_pool
+from aoc_coding_companion.utils.notifier import close_telegram_notifiers
+from aoc_coding_companion.utils.tracing import RunTrace, get_rss_kb
+from aoc_coding_companion.utils.models import PythonREPL, TaskAnswer
+from aoc_coding_companion.agent import make_graph, make_concurrent_graph
+
+from benchmarks.aoc_server import AdventOfCodeStandIn, Season, make_season
+from benchmarks.replay_model import ReplayChatModel, Recordings
+
+
+REPLAY_MODEL_NAME = 'replay'
+
+
+class NodeStats(BaseModel):
+    count: int
+    p50: float
+    p95: float
+    rss_delta_p50_kb: int
+    rss_delta_p95_kb: int
+
+
+class SeasonReport(BaseModel):
+    graph: str
+    days: int
+    stars: int
+    elapsed: float
+    puzzles_per_hour: float
+    submissions: int
+    wrong_answers: int
+    prompt_tokens: int
+    completion_tokens: int
+    # Ответы модели из кэша (повторный прогон с --repeat)
+    llm_cache_hits: int = 0
+    # Только с --streaming: время до первого фрагмента ответа модели и до готового вызова инструмента
+    time_to_first_token_p50: Optional[float] = None
+    time_to_first_token_p95: Optional[float] = None
+    time_to_tool_call_p50: Optional[float] = None
+    time_to_tool_call_p95: Optional[float] = None
+    process_max_rss_kb: int
+    sandbox_max_rss_kb: int
+    nodes: Dict[str, NodeStats]
+    error: Optional[str] = None
+
+
+def make_recordings(season: Season, mistake_rate: float = 0.2, seed: int = 0) -> Recordings:
+    """Запись решений сезона: код, затем ответ. В доле задач первый ответ неверный"""
+    rng = random.Random(seed)
+    recordings = {}
+    for season_day in season.days:
+        for level in (1, 2):
+            answer = season_day.answers[level - 1]
+            turns = [[{'name': PythonREPL.__name__, 'args': {'query': season_day.solutions[level - 1]}}]]
+            if rng.random() < mistake_rate:
+                turns.append([{'name': TaskAnswer.__name__, 'args': {'answer': str(int(answer) + 1)}}])
+            turns.append([{'name': TaskAnswer.__name__, 'args': {'answer': answer}}])
+            recordings[f'{season_day.day}.{level}'] = turns
+    return recordings
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def load_traces(thread_id: str) -> List[RunTrace]:
+    paths = TRACES_DIRPATH.glob(f'*-{thread_id}-*.json')
+    return [RunTrace(**json.loads(path.read_text(encoding='utf-8'))) for path in paths]
+
+
+async def run_season(args) -> SeasonReport:
+    season = make_season(args.year, args.days, args.rows, args.seed)
+    recordings = make_recordings(season, args.mistake_rate, args.seed)
+    register_model(REPLAY_MODEL_NAME, lambda: ReplayChatModel(recordings=recordings, latency=args.model_latency))
+
+    stand_in = AdventOfCodeStandIn(season, cooldown=args.cooldown, latency=args.latency)
+    base_url = await stand_in.start()
+    # Интервал между отправками настоящего сайта не нужен стенду и сделал бы замер временем ожидания
+    submission._schedulers[id(asyncio.get_running_loop())] = submission.SubmissionScheduler(
+        min_interval=args.submit_interval
+    )
+
+    thread_id = f'season-{uuid.uuid4().hex[:8]}'
+    config = {
+        'configurable': {
+            'thread_id': thread_id,
+            'model': REPLAY_MODEL_NAME,
+            'base_url': base_url,
+            'session_token': f'benchmark-{thread_id}',
+            'leaderboard_id': stand_in.leaderboard_id,
+            'chat_id': None,
+            'working_dir': str(Path(os.environ['AOC_CACHE_DIR']) / 'work'),
+            'max_concurrent_puzzles': args.concurrency,
+            'streaming': args.streaming,
+            'llm_cache': not args.no_llm_cache,
+        },
+        'recursion_limit': 40 * args.days,
+    }
+    graph = make_concurrent_graph() if args.graph == 'concurrent' else make_graph()
+
+    error = None
+    start = time.perf_counter()
+    try:
+        await graph.ainvoke({'messages': []}, config)
+    except GraphRecursionError as e:
+        error = f'Граф не решил сезон за {config["recursion_limit"]} шагов: {e}'
+    finally:
+        elapsed = time.perf_counter() - start
+        await stand_in.close()
+        await close_telegram_notifiers()
+        await close_parser_pool()
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    rss_deltas: Dict[str, List[float]] = defaultdict(list)
+    first_token: List[float] = []
+    tool_call: List[float] = []
+    prompt_tokens = completion_tokens = llm_cache_hits = sandbox_max_rss_kb = 0
+    process_max_rss_kb = get_rss_kb()
+    for trace in load_traces(thread_id):
+        for span in trace.spans:
+            prompt_tokens += span.prompt_tokens
+            completion_tokens += span.completion_tokens
+            llm_cache_hits += span.llm_cache_hits
+            sandbox_max_rss_kb = max(sandbox_max_rss_kb, span.exec_max_rss_kb)
+            process_max_rss_kb = max(process_max_rss_kb, span.rss_kb)
+            if span.time_to_first_token is not None:
+                first_token.append(span.time_to_first_token)
+            if span.time_to_tool_call is not None:
+                tool_call.append(span.time_to_tool_call)
+            if span.kind == 'node':
+                durations[span.name].append(span.duration)
+                rss_deltas[span.name].append(span.rss_delta_kb)
+
+    nodes = {
+        name: NodeStats(
+            count=len(values),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            rss_delta_p50_kb=int(percentile(rss_deltas[name], 50)),
+            rss_delta_p95_kb=int(percentile(rss_deltas[name], 95)),
+        )
+        for name, values in durations.items()
+    }
+    return SeasonReport(
+        graph=args.graph,
+        days=args.days,
+        stars=stand_in.stars,
+        elapsed=elapsed,
+        puzzles_per_hour=stand_in.stars / elapsed * 3600,
+        submissions=stand_in.stats.submissions,
+        wrong_answers=stand_in.stats.wrong_answers,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        llm_cache_hits=llm_cache_hits,
+        time_to_first_token_p50=percentile(first_token, 50) if first_token else None,
+        time_to_first_token_p95=percentile(first_token, 95) if first_token else None,
+        time_to_tool_call_p50=percentile(tool_call, 50) if tool_call else None,
+        time_to_tool_call_p95=percentile(tool_call, 95) if tool_call else None,
+        process_max_rss_kb=process_max_rss_kb,
+        sandbox_max_rss_kb=sandbox_max_rss_kb,
+        nodes=nodes,
+        error=error,
+    )
+
+
+def print_report(report: SeasonReport) -> None:
+    print(f'Граф {report.graph}: {report.stars} из {2 * report.days} звезд за {report.elapsed:.1f} с, '
+          f'{report.puzzles_per_hour:.0f} задач в час')
+    print(f'Отправок {report.submissions} (неверных {report.wrong_answers}), '
+          f'токены {report.prompt_tokens}+{report.completion_tokens}, ответов модели из кэша {report.llm_cache_hits}')
+    if report.time_to_first_token_p50 is not None:
+        print(f'Модель: первый фрагмент p50/p95 {report.time_to_first_token_p50 * 1000:.0f}/'
+              f'{report.time_to_first_token_p95 * 1000:.0f} мс, вызов инструмента p50/p95 '
+              f'{(report.time_to_tool_call_p50 or 0) * 1000:.0f}/{(report.time_to_tool_call_p95 or 0) * 1000:.0f} мс')
+    print(f'Пиковая память: процесс {report.process_max_rss_kb / 1024:.1f} МиБ, '
+          f'песочница {report.sandbox_max_rss_kb / 1024:.1f} МиБ')
+    print(f'\n{"узел":<40} {"вызовов":>8} {"p50, мс":>9} {"p95, мс":>9} {"Δ RSS p50/p95, КиБ":>20}')
+    for name, stats in sorted(report.nodes.items(), key=lambda item: -item[1].p95):
+        print(f'{name:<40} {stats.count:>8} {stats.p50 * 1000:>9.1f} {stats.p95 * 1000:>9.1f} '
+              f'{stats.rss_delta_p50_kb:>10}/{stats.rss_delta_p95_kb:<9}')
+    if report.error:
+        print(f'\nОШИБКА: {report.error}')
+
+
+def compare_with_baseline(report: SeasonReport, baseline: SeasonReport, tolerance: float,
+                          min_slack: float) -> List[str]:
+    """Регрессии относительно сохраненного результата. Для коротких узлов допуск не меньше min_slack секунд"""
+    if (report.graph, report.days) != (baseline.graph, baseline.days):
+        return [f'результат {baseline.graph} на {baseline.days} днях не сравним с {report.graph} на {report.days}']
+    regressions = []
+    if report.stars < baseline.stars:
+        regressions.append(f'решено {report.stars} звезд вместо {baseline.stars}')
+    if report.puzzles_per_hour < baseline.puzzles_per_hour * (1 - tolerance):
+        regressions.append(
+            f'пропускная способность {report.puzzles_per_hour:.0f} задач в час, было {baseline.puzzles_per_hour:.0f}'
+        )
+    for name, stats in report.nodes.items():
+        before = baseline.nodes.get(name)
+        if before is not None and stats.p95 > max(before.p95 * (1 + tolerance), before.p95 + min_slack):
+            regressions.append(f'p95 узла "{name}" {stats.p95 * 1000:.1f} мс, было {before.p95 * 1000:.1f} мс')
+    if report.process_max_rss_kb > baseline.process_max_rss_kb * (1 + tolerance):
+        regressions.append(
+            f'пиковая память процесса {report.process_max_rss_kb} КиБ, было {baseline.process_max_rss_kb} КиБ'
+        )
+    return regressions
+
+
+def reset_run_caches() -> None:
+    """Сброс кэша запусков кода и библиотеки решений: иначе отметка кэша в выводе программ
+    и похожие решения изменили бы запросы к модели, и повторный прогон не совпал бы с первым"""
+    shutil.rmtree(EXEC_CACHE_DIRPATH, ignore_errors=True)
+    SOLUTION_LIBRARY_FILEPATH.unlink(missing_ok=True)
+    get_solution_library.cache_clear()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--graph', choices=('sequential', 'concurrent'), default='sequential',
+                            help='make_graph или make_concurrent_graph')
+    arg_parser.add_argument('--year', type=int, default=datetime.now().year,
+                            help='Год сезона (парсер запрашивает текущий год)')
+    arg_parser.add_argument('--days', type=int, default=25, help='Количество задач в сезоне')
+    arg_parser.add_argument('--rows', type=int, default=1000, help='Строк во входных данных каждой задачи')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--mistake-rate', type=float, default=0.2, help='Доля задач с неверным первым ответом')
+    arg_parser.add_argument('--cooldown', type=float, default=0.0, help='Блокировка стенда после неверного ответа')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответов стенда, секунды')
+    arg_parser.add_argument('--model-latency', type=float, default=0.0, help='Задержка ответа модели, секунды')
+    arg_parser.add_argument('--streaming', action='store_true', help='Потоковый ответ модели (streaming)')
+    arg_parser.add_argument('--no-llm-cache', action='store_true', help='Без кэша ответов модели (llm_cache)')
+    arg_parser.add_argument('--repeat', type=int, default=1,
+                            help='Прогонов сезона: повторные отвечаются из кэша ответов модели')
+    arg_parser.add_argument('--submit-interval', type=float, default=0.0, help='Интервал между отправками ответов')
+    arg_parser.add_argument('--concurrency', type=int, default=3, help='max_concurrent_puzzles для concurrent')
+    arg_parser.add_argument('--output', help='Сохранить результат в JSON')
+    arg_parser.add_argument('--baseline', help='JSON прошлого результата для поиска регрессий')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25, help='Допустимое ухудшение, доля')
+    arg_parser.add_argument('--min-slack', type=float, default=0.05, help='Минимальный допуск p95 узла, секунды')
+    args = arg_parser.parse_args()
+
+    reports = []
+    for index in range(max(1, args.repeat)):
+        if index:
+            print(f'\nПовторный прогон {index}')
+            reset_run_caches()
+        reports.append(asyncio.run(run_season(args)))
+        print_report(reports[-1])
+    # Результат для сравнения - первый прогон, повторные зависят от кэша ответов модели
+    report = reports[0]
+    if args.output:
+        Path(args.output).write_text(report.model_dump_json(indent=1), encoding='utf-8')
+
+    failed = any(item.error is not None or item.stars < 2 * item.days for item in reports)
+    if args.baseline:
+        baseline = SeasonReport.model_validate_json(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare_with_baseline(report, baseline, args.tolerance, args.min_slack)
+        for regression in regressions:
+            print(f'РЕГРЕССИЯ: {regression}')
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()